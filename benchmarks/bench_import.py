@@ -0,0 +1,137 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+
+Benchmarks of the fixed costs of using UPTransportZenoh in a process:
+
+- import: time to import up_transport_zenoh.uptransportzenoh in a fresh interpreter, median of the runs
+- transports: time to create and then close one transport per uEntity, each opening its own session and all
+  sharing one session (``UPTransportZenoh.new(..., share_session=True)``)
+- publish: time per publish of a 64 KB payload to a local subscriber, with debug logging off (the default) and on
+
+Run with the package installed.
+
+Usage: python benchmarks/bench_import.py [--quick] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict
+
+import zenoh
+from benchutils import environment, time_per_call, write_results
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.v1.umessage_pb2 import UMessage
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+IMPORT_SCRIPT = (
+    "import time; start = time.perf_counter(); import up_transport_zenoh.uptransportzenoh; "
+    "print(time.perf_counter() - start)"
+)
+
+TOPIC = UUri(authority_name="vehicle1", ue_id=0x18, ue_version_major=1, resource_id=0x8001)
+
+
+class NullListener(UListener):
+    async def on_receive(self, umsg: UMessage) -> None:
+        pass
+
+
+def create_config() -> zenoh.Config:
+    config = zenoh.Config()
+    config.insert_json5("scouting/multicast/enabled", "false")
+    return config
+
+
+def bench_import(runs: int) -> Dict:
+    samples = [float(subprocess.check_output([sys.executable, "-c", IMPORT_SCRIPT], text=True)) for _ in range(runs)]
+    return {"runs": runs, "median_ms": statistics.median(samples) * 1e3, "max_ms": max(samples) * 1e3}
+
+
+def bench_transports(count: int, share_session: bool) -> Dict:
+    start = time.perf_counter()
+    transports = [
+        UPTransportZenoh.new(
+            create_config(),
+            UUri(authority_name="vehicle1", ue_id=0x100 + index, ue_version_major=1),
+            share_session=share_session,
+        )
+        for index in range(count)
+    ]
+    created = time.perf_counter() - start
+    sessions = len({id(transport.session) for transport in transports})
+    start = time.perf_counter()
+    for transport in transports:
+        transport.close()
+    return {
+        "transports": count,
+        "sessions": sessions,
+        "create_ms": created * 1e3,
+        "close_ms": (time.perf_counter() - start) * 1e3,
+    }
+
+
+async def bench_publish(iterations: int, debug: bool) -> Dict:
+    root = logging.getLogger()
+    level, handlers = root.level, root.handlers
+    if debug:
+        # Records are formatted but go nowhere
+        root.handlers = [logging.NullHandler()]
+        root.setLevel(logging.DEBUG)
+    transport = UPTransportZenoh.new(create_config(), TOPIC)
+    try:
+        await transport.register_listener(TOPIC, NullListener())
+        message = UMessageBuilder.publish(TOPIC).build()
+        message.payload = bytes(64 * 1024)
+        return time_per_call(
+            lambda: transport.send_publish_notification("up/bench", message.payload, message.attributes), iterations
+        )
+    finally:
+        transport.close()
+        root.setLevel(level)
+        root.handlers = handlers
+
+
+async def run(args) -> Dict:
+    results = {"benchmark": "import", "environment": environment(), "quick": args.quick}
+    results["import"] = bench_import(3 if args.quick else 10)
+    count = 5 if args.quick else 20
+    results["transports"] = {
+        "own_session": bench_transports(count, share_session=False),
+        "shared_session": bench_transports(count, share_session=True),
+    }
+    iterations = 200 if args.quick else 2000
+    results["publish"] = {
+        "debug_off": await bench_publish(iterations, debug=False),
+        "debug_on": await bench_publish(iterations, debug=True),
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Run fewer iterations")
+    parser.add_argument("--output", help="Write the results to this JSON file instead of stdout")
+    args = parser.parse_args()
+    write_results(asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+
+Startup benchmark: time-to-ready of a gateway registering its filters, one register_listener call per filter
+against a single register_listeners call, for each kind of listener:
+
+- publish: two listeners per topic
+- request: one request listener per method
+- response: one response listener per method called
+
+Each kind runs on a transport of its own: in zenoh, declaring a queryable costs time for every subscriber whose
+key intersects its key, and conversely, which would dominate a mixed run. Most of the time of the publish and
+request kinds goes into the zenoh declarations, which the bulk registration merges per key but can't avoid.
+The transports are closed outside of the measurements.
+
+Usage: python benchmarks/bench_startup.py [--registrations N] [--quick] [--only KIND ...] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List
+
+from benchutils import environment, loopback_configs, write_results
+from uprotocol.transport.ulistener import UListener
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.umessage_pb2 import UMessage
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+KINDS = ["publish", "request", "response"]
+
+GATEWAY = UUri(authority_name="gateway", ue_id=0x30, ue_version_major=1)
+
+
+class NullListener(UListener):
+    async def on_receive(self, umsg: UMessage) -> None:
+        pass
+
+
+def gateway_entries(kind: str, registrations: int) -> List[tuple]:
+    entries = []
+    if kind == "publish":
+        first, second = NullListener(), NullListener()
+        for index in range(registrations // 2):
+            topic = UUri(
+                authority_name="vehicle1",
+                ue_id=0x1000 + index // 100,
+                ue_version_major=1,
+                resource_id=0x8000 + index % 100,
+            )
+            entries += [(topic, first), (topic, second)]
+    elif kind == "request":
+        server = NullListener()
+        for index in range(registrations):
+            method = UUri(
+                authority_name="gateway", ue_id=0x30 + index // 100, ue_version_major=1, resource_id=1 + index % 100
+            )
+            entries.append((UriFactory.ANY, server, method))
+    else:
+        client = NullListener()
+        for index in range(registrations):
+            method = UUri(
+                authority_name="vehicle2", ue_id=0x2000 + index // 100, ue_version_major=1, resource_id=1 + index % 100
+            )
+            entries.append((method, client, GATEWAY))
+    return entries
+
+
+async def time_to_ready(entries: List[tuple], bulk: bool) -> Dict:
+    transport = UPTransportZenoh.new(loopback_configs()[0], GATEWAY)
+    try:
+        start = time.perf_counter()
+        if bulk:
+            statuses = await transport.register_listeners(entries)
+        else:
+            statuses = [await transport.register_listener(*entry) for entry in entries]
+        elapsed = time.perf_counter() - start
+        return {
+            "registrations": len(entries),
+            "failures": sum(1 for status in statuses if status.code != 0),
+            "time_to_ready_s": elapsed,
+            "registrations_per_s": len(entries) / elapsed,
+            "subscribers": len(transport.subscriptions),
+            "queryables": len(transport.queryable_map),
+        }
+    finally:
+        transport.close()
+
+
+async def run(args) -> Dict:
+    registrations = args.registrations // 10 if args.quick else args.registrations
+    results = {"benchmark": "startup", "environment": environment(), "quick": args.quick}
+    for kind in args.only or KINDS:
+        entries = gateway_entries(kind, registrations)
+        sequential = await time_to_ready(entries, bulk=False)
+        bulk = await time_to_ready(entries, bulk=True)
+        results[kind] = {
+            "sequential": sequential,
+            "bulk": bulk,
+            "speedup": sequential["time_to_ready_s"] / bulk["time_to_ready_s"],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--registrations", type=int, default=10000, help="The number of registrations")
+    parser.add_argument("--quick", action="store_true", help="Run a tenth of the registrations")
+    parser.add_argument("--only", nargs="+", choices=KINDS, help="Run only these kinds of listeners")
+    parser.add_argument("--output", help="Write the results to this JSON file instead of stdout")
+    args = parser.parse_args()
+    # The transport logs every registration at debug level, which would dominate the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+    write_results(asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
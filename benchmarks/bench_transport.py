@@ -0,0 +1,245 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+
+Benchmarks of UPTransportZenoh between two peer sessions connected over loopback, with scouting disabled:
+
+- codec: uattributes_to_attachment, attachment_to_uattributes and to_zenoh_key_string (cache hit and miss)
+- decode: subscriber-side cost of turning an attachment and payload into a UMessage, per payload size
+- publish: publish throughput per payload size, as sent and as received by a subscriber on the other peer
+- rpc: round-trip latency of sequential requests through send_request and send_response
+- large: publish throughput of 64 KB to 8 MB payloads, over the default path and with the zenoh shared-memory
+  transport enabled on both peers (``UPTransportZenoh.new(..., shared_memory=True)``)
+
+Compare two result files with ``python benchmarks/compare.py baseline.json results.json``.
+
+Run with the package installed.
+
+Usage: python benchmarks/bench_transport.py [--quick] [--only SECTION ...] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Dict, List
+
+from benchutils import environment, latency_summary, loopback_configs, time_per_call, write_results
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.umessage_pb2 import UMessage
+from uprotocol.v1.uri_pb2 import UUri
+from zenoh import ZBytes
+
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+from up_transport_zenoh.zenohutils import ZenohUtils
+
+SECTIONS = ["codec", "decode", "publish", "rpc", "large"]
+PAYLOAD_SIZES = [0, 64, 1024, 16 * 1024, 64 * 1024, 1024 * 1024]
+LARGE_PAYLOAD_SIZES = [64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 8 * 1024 * 1024]
+
+TOPIC = UUri(authority_name="vehicle1", ue_id=0x18, ue_version_major=1, resource_id=0x8001)
+CLIENT = UUri(authority_name="vehicle1", ue_id=0x19, ue_version_major=1)
+SERVER = UUri(authority_name="vehicle2", ue_id=0x20, ue_version_major=1)
+METHOD = UUri(authority_name="vehicle2", ue_id=0x20, ue_version_major=1, resource_id=3)
+
+# Time given to the peers to exchange their declarations
+DECLARATION_DELAY = 0.5
+
+
+class CountingListener(UListener):
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.count = 0
+        self.done = asyncio.Event()
+        self.last_received = 0.0
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        self.count += 1
+        self.last_received = time.perf_counter()
+        if self.count >= self.expected:
+            self.done.set()
+
+
+class EchoServer(UListener):
+    def __init__(self, transport: UPTransportZenoh):
+        self.transport = transport
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        response = UMessageBuilder.response_for_request(umsg.attributes).build()
+        response.payload = umsg.payload
+        await self.transport.send(response)
+
+
+class ResponseWaiter(UListener):
+    def __init__(self):
+        self.waiting: Dict[bytes, asyncio.Future] = {}
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        future = self.waiting.pop(umsg.attributes.reqid.SerializeToString(), None)
+        if future is not None and not future.done():
+            future.set_result(umsg)
+
+
+def bench_codec(iterations: int) -> Dict:
+    attributes = UMessageBuilder.publish(TOPIC).build().attributes
+    attachment = ZBytes(ZenohUtils.uattributes_to_attachment(attributes))
+    results = {
+        "uattributes_to_attachment": time_per_call(
+            lambda: ZenohUtils.uattributes_to_attachment(attributes), iterations
+        ),
+        "attachment_to_uattributes": time_per_call(
+            lambda: ZenohUtils.attachment_to_uattributes(attachment), iterations
+        ),
+        "to_zenoh_key_string_hit": time_per_call(
+            lambda: ZenohUtils.to_zenoh_key_string("vehicle1", METHOD, CLIENT), iterations
+        ),
+    }
+    maxsize = ZenohUtils.key_cache_info().maxsize
+    ZenohUtils.set_key_cache_size(0)
+    try:
+        results["to_zenoh_key_string_miss"] = time_per_call(
+            lambda: ZenohUtils.to_zenoh_key_string("vehicle1", METHOD, CLIENT), iterations
+        )
+    finally:
+        ZenohUtils.set_key_cache_size(maxsize)
+    return results
+
+
+def bench_decode(iterations: int, sizes: List[int]) -> Dict:
+    attachment = ZBytes(ZenohUtils.uattributes_to_attachment(UMessageBuilder.publish(TOPIC).build().attributes))
+
+    def decode(payload: ZBytes) -> UMessage:
+        # Same work as the subscriber callback of the transport
+        message = UMessage()
+        ZenohUtils.attachment_to_uattributes(attachment, message.attributes)
+        if payload:
+            message.payload = bytes(payload)
+        return message
+
+    results = {}
+    for size in sizes:
+        payload = ZBytes(b"\x00" * size)
+        results[str(size)] = time_per_call(lambda: decode(payload), max(10, iterations // max(1, size // 1024)))
+    return results
+
+
+async def bench_publish(publisher: UPTransportZenoh, subscriber: UPTransportZenoh, messages: int, sizes: List[int]):
+    results = {}
+    for size in sizes:
+        listener = CountingListener(messages)
+        await subscriber.register_listener(TOPIC, listener)
+        await asyncio.sleep(DECLARATION_DELAY)
+
+        message = UMessageBuilder.publish(TOPIC).build()
+        message.payload = b"\x00" * size
+        start = time.perf_counter()
+        for _ in range(messages):
+            await publisher.send(message)
+        sent = time.perf_counter() - start
+        try:
+            await asyncio.wait_for(listener.done.wait(), 10)
+        except asyncio.TimeoutError:
+            pass
+        received = (listener.last_received or time.perf_counter()) - start
+        await subscriber.unregister_listener(TOPIC, listener)
+
+        results[str(size)] = {
+            "messages": messages,
+            "received": listener.count,
+            "sent_msgs_per_s": messages / sent,
+            "received_msgs_per_s": listener.count / received if listener.count else 0.0,
+            "received_mb_per_s": listener.count * size / received / 1e6 if listener.count else 0.0,
+        }
+    return results
+
+
+async def bench_rpc(client: UPTransportZenoh, server: UPTransportZenoh, requests: int, payload_size: int) -> Dict:
+    await server.register_listener(UriFactory.ANY, EchoServer(server), METHOD)
+    waiter = ResponseWaiter()
+    await client.register_listener(METHOD, waiter, CLIENT)
+    await asyncio.sleep(DECLARATION_DELAY)
+
+    loop = asyncio.get_running_loop()
+    payload = b"\x00" * payload_size
+    samples = []
+    failures = 0
+    for index in range(requests):
+        request = UMessageBuilder.request(CLIENT, METHOD, 5000).build()
+        request.payload = payload
+        future = loop.create_future()
+        waiter.waiting[request.attributes.id.SerializeToString()] = future
+        start = time.perf_counter()
+        await client.send(request)
+        try:
+            await asyncio.wait_for(future, 5)
+        except asyncio.TimeoutError:
+            failures += 1
+            continue
+        # The first round trips set up the routes
+        if index >= requests // 10:
+            samples.append(time.perf_counter() - start)
+    return {"requests": requests, "payload_size": payload_size, "failures": failures, **latency_summary(samples)}
+
+
+async def run(args) -> Dict:
+    sections = args.only or SECTIONS
+    scale = 10 if args.quick else 1
+    sizes = PAYLOAD_SIZES[:4] if args.quick else PAYLOAD_SIZES
+    results = {"benchmark": "transport", "environment": environment(), "quick": args.quick}
+
+    if "codec" in sections:
+        results["codec"] = bench_codec(100000 // scale)
+    if "decode" in sections:
+        results["decode"] = bench_decode(50000 // scale, sizes)
+
+    if "publish" in sections or "rpc" in sections:
+        listen_config, connect_config = loopback_configs()
+        server = UPTransportZenoh.new(listen_config, SERVER)
+        client = UPTransportZenoh.new(connect_config, CLIENT)
+        try:
+            if "publish" in sections:
+                results["publish"] = await bench_publish(client, server, 10000 // scale, sizes)
+            if "rpc" in sections:
+                results["rpc"] = await bench_rpc(client, server, 2000 // scale, 64)
+        finally:
+            for transport in (client, server):
+                transport.close()
+
+    if "large" in sections:
+        results["large"] = {}
+        for name, shared_memory in (("default", False), ("shared_memory", True)):
+            listen_config, connect_config = loopback_configs()
+            server = UPTransportZenoh.new(listen_config, SERVER, shared_memory=shared_memory)
+            client = UPTransportZenoh.new(connect_config, CLIENT, shared_memory=shared_memory)
+            try:
+                results["large"][name] = await bench_publish(client, server, 200 // scale, LARGE_PAYLOAD_SIZES)
+            finally:
+                for transport in (client, server):
+                    transport.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Run a tenth of the iterations and smaller payloads")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, help="Run only these sections")
+    parser.add_argument("--output", help="Write the results to this JSON file instead of stdout")
+    args = parser.parse_args()
+    # The transport logs every message at debug level, which would dominate the measurements
+    logging.getLogger().setLevel(logging.WARNING)
+    write_results(asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
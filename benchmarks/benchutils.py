@@ -0,0 +1,99 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+
+Helpers shared by the benchmarks.
+"""
+
+import json
+import platform
+import socket
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import zenoh
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def loopback_configs() -> Tuple[zenoh.Config, zenoh.Config]:
+    """
+    :return: The configs of two peers connected over loopback TCP, with scouting disabled so that nothing leaves
+             the host.
+    """
+    endpoint = f'["tcp/127.0.0.1:{free_port()}"]'
+    listener = zenoh.Config()
+    listener.insert_json5("scouting/multicast/enabled", "false")
+    listener.insert_json5("listen/endpoints", endpoint)
+    connector = zenoh.Config()
+    connector.insert_json5("scouting/multicast/enabled", "false")
+    connector.insert_json5("connect/endpoints", endpoint)
+    return listener, connector
+
+
+def percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """
+    :param samples: Latencies in seconds.
+    :return: Count, mean, p50, p99 and max in microseconds.
+    """
+    return {
+        "count": len(samples),
+        "mean_us": sum(samples) / len(samples) * 1e6,
+        "p50_us": percentile(samples, 0.5) * 1e6,
+        "p99_us": percentile(samples, 0.99) * 1e6,
+        "max_us": max(samples) * 1e6,
+    }
+
+
+def time_per_call(function: Callable[[], object], iterations: int) -> Dict[str, float]:
+    """
+    Time ``function`` in a tight loop, after a short warm up.
+
+    :return: The mean time per call in microseconds.
+    """
+    for _ in range(min(iterations, 1000)):
+        function()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    elapsed = time.perf_counter() - start
+    return {"iterations": iterations, "us_per_call": elapsed / iterations * 1e6}
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "zenoh": getattr(zenoh, "__version__", "unknown"),
+    }
+
+
+def write_results(results: Dict, output: Optional[str]) -> None:
+    """
+    Print the results as JSON, or write them to ``output``.
+    """
+    text = json.dumps(results, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
@@ -0,0 +1,79 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+
+Compare two benchmark result files and report the metrics that regressed by more than a threshold. Times
+(``*_us``, ``us_per_call``) regress when they grow, rates (``*_per_s``) when they shrink.
+
+Exits with status 1 if a metric regressed.
+
+Usage: python benchmarks/compare.py baseline.json results.json [--threshold 0.1]
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, Iterator, Tuple
+
+
+def flatten(results: Dict, prefix: str = "") -> Iterator[Tuple[str, float]]:
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, float(value)
+
+
+def direction(path: str) -> int:
+    """
+    :return: 1 if a higher value is better, -1 if a lower value is better, 0 if the metric isn't compared.
+    """
+    name = path.rsplit(".", 1)[-1]
+    if name.endswith("_per_s"):
+        return 1
+    if name.endswith("_us") or name == "us_per_call":
+        return -1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("results")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Tolerated relative change (default 0.1)")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = dict(flatten(json.load(f)))
+    with open(args.results) as f:
+        results = dict(flatten(json.load(f)))
+
+    regressed = False
+    for path, value in results.items():
+        better = direction(path)
+        old = baseline.get(path)
+        if not better or not old:
+            continue
+        change = (value - old) / old
+        status = "ok"
+        if change * better < -args.threshold:
+            status = "REGRESSED"
+            regressed = True
+        elif change * better > args.threshold:
+            status = "improved"
+        print(f"{status:>9} {path}: {old:.2f} -> {value:.2f} ({change:+.1%})")
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
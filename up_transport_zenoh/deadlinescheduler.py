@@ -0,0 +1,106 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+
+class DeadlineTimer:
+    """
+    Handle of a callback scheduled with :class:`DeadlineScheduler`.
+    """
+
+    __slots__ = ("deadline", "callback", "cancelled")
+
+    def __init__(self, deadline: float, callback: Callable[[], None]):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class DeadlineScheduler:
+    """
+    Runs callbacks once their deadline has passed, using a single thread and a heap ordered by deadline.
+    Cancelled timers are dropped lazily when they reach the top of the heap.
+    """
+
+    def __init__(self, name: str = "up-zenoh-deadlines"):
+        self._name = name
+        self._heap: List[Tuple[float, int, DeadlineTimer]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def schedule(self, timeout: float, callback: Callable[[], None]) -> DeadlineTimer:
+        """
+        Schedule a callback.
+
+        :param timeout: Seconds from now after which the callback is run.
+        :param callback: The callback, invoked from the scheduler thread.
+        :return: A timer that can be cancelled.
+        """
+        timer = DeadlineTimer(time.monotonic() + timeout, callback)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("DeadlineScheduler is closed")
+            heapq.heappush(self._heap, (timer.deadline, next(self._counter), timer))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+            elif self._heap[0][2] is timer:
+                # The new timer expires first, wake the thread up to wait for it instead
+                self._condition.notify()
+        return timer
+
+    def close(self) -> None:
+        """
+        Stop the scheduler thread. Timers that are still pending are discarded.
+        """
+        with self._condition:
+            self._closed = True
+            self._heap.clear()
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        return
+                    while self._heap and self._heap[0][2].cancelled:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    delay = self._heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        timer = heapq.heappop(self._heap)[2]
+                        break
+                    self._condition.wait(delay)
+
+            try:
+                timer.callback()
+            except Exception as e:
+                logging.debug(f"Deadline callback failed: {e}")
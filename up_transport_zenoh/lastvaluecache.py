@@ -0,0 +1,147 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import logging
+from collections import OrderedDict, deque
+from functools import partial
+from threading import Lock
+from typing import Callable, List, Optional, Tuple
+
+from zenoh import Query, Queryable
+
+# Maximum number of keys cached by a transport, the least recently published key is evicted beyond it
+DEFAULT_MAX_CACHED_KEYS: int = 1024
+
+# Time a subscriber waits for the cached samples, in seconds
+LAST_VALUE_QUERY_TIMEOUT: float = 1.0
+
+# The cache queryables are declared under this prefix, apart from the uProtocol keys, so that the subscribers
+# and request queryables of the transport never see the cache queries
+LAST_VALUE_KEY_PREFIX: str = "lvc"
+
+
+def last_value_key(zenoh_key: str) -> str:
+    """
+    :param zenoh_key: The zenoh key of a topic, or a key expression matching topics.
+    :return: The key expression of the cache of the topics.
+    """
+    return f"{LAST_VALUE_KEY_PREFIX}/{zenoh_key}"
+
+
+class CachedKey:
+    """
+    The last samples published on a key and the queryable serving them.
+    """
+
+    __slots__ = ("key_expr", "samples", "queryable")
+
+    def __init__(self, key_expr: str, depth: int):
+        self.key_expr = key_expr
+        # (payload, attachment) pairs, oldest first
+        self.samples: deque = deque(maxlen=depth)
+        self.queryable: Optional[Queryable] = None
+
+
+class LastValueCache:
+    """
+    Keeps the last ``depth`` samples published on each key, as put on the wire with their attachment, and serves
+    them through a zenoh queryable per key, so that a subscriber registered late gets the current state of a
+    topic without waiting for its next publication.
+
+    The queryable of a key is declared on the first publication of the key. Beyond ``max_keys`` keys, the least
+    recently published key is evicted along with its queryable.
+
+    :param depth: The number of samples kept per key.
+    :param declare: Declares a zenoh queryable on a key expression with a query callback.
+    :param max_keys: The maximum number of keys cached.
+    """
+
+    def __init__(
+        self,
+        depth: int,
+        declare: Callable[[str, Callable[[Query], None]], Queryable],
+        max_keys: int = DEFAULT_MAX_CACHED_KEYS,
+    ):
+        if depth < 1:
+            raise ValueError("depth should be at least 1")
+        self.depth = depth
+        self.max_keys = max_keys
+        self._declare = declare
+        self._keys: "OrderedDict[str, CachedKey]" = OrderedDict()
+        self._lock = Lock()
+
+    def put(self, zenoh_key: str, payload: bytes, attachment: list) -> bool:
+        """
+        Cache a published sample, declaring the queryable of its key if it is the first one.
+
+        :param zenoh_key: The zenoh key the sample was published on.
+        :param payload: The payload, as sent.
+        :param attachment: The attachment, as sent.
+        :return: False if the queryable of the key couldn't be declared, in which case the sample isn't cached.
+        """
+        evicted = []
+        with self._lock:
+            cached = self._keys.get(zenoh_key)
+            if cached is None:
+                cached = CachedKey(last_value_key(zenoh_key), self.depth)
+                try:
+                    cached.queryable = self._declare(cached.key_expr, partial(self._on_query, cached))
+                except Exception as e:
+                    logging.debug(f"Unable to declare the last value queryable of {zenoh_key}: {e}")
+                    return False
+                self._keys[zenoh_key] = cached
+                while len(self._keys) > self.max_keys:
+                    evicted.append(self._keys.popitem(last=False)[1])
+            else:
+                self._keys.move_to_end(zenoh_key)
+            cached.samples.append((payload, attachment))
+        for key in evicted:
+            _undeclare(key)
+        return True
+
+    def get(self, zenoh_key: str) -> List[Tuple[bytes, list]]:
+        """
+        :param zenoh_key: The zenoh key of a topic.
+        :return: The cached ``(payload, attachment)`` of the key, oldest first.
+        """
+        cached = self._keys.get(zenoh_key)
+        return list(cached.samples) if cached is not None else []
+
+    def close(self) -> None:
+        """
+        Undeclare the queryables and drop the cached samples.
+        """
+        with self._lock:
+            keys = list(self._keys.values())
+            self._keys.clear()
+        for cached in keys:
+            _undeclare(cached)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _on_query(self, cached: CachedKey, query: Query) -> None:
+        for payload, attachment in tuple(cached.samples):
+            try:
+                query.reply(cached.key_expr, payload, attachment=attachment)
+            except Exception as e:
+                logging.debug(f"Unable to reply with the last value of {cached.key_expr}: {e}")
+                return
+
+
+def _undeclare(cached: CachedKey) -> None:
+    try:
+        cached.queryable.undeclare()
+    except Exception as e:
+        logging.debug(f"Unable to undeclare the last value queryable of {cached.key_expr}: {e}")
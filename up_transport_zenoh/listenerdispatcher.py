@@ -0,0 +1,241 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Coroutine, List, Optional
+
+from uprotocol.transport.ulistener import UListener
+from uprotocol.v1.umessage_pb2 import UMessage
+
+from up_transport_zenoh.metrics import DISPATCH_QUEUE_WAIT, LISTENER_ON_RECEIVE, TransportMetrics
+from up_transport_zenoh.queuedlistener import QueuedListener
+
+
+class ListenerDispatcher:
+    """
+    Runs ``UListener.on_receive`` coroutines on long-lived event loops.
+
+    Zenoh invokes the transport callbacks on its own threads. Rather than creating and tearing down an event
+    loop for every message, the dispatcher submits the coroutines thread-safely to a loop that outlives them.
+
+    - Default: the listeners run on a loop of the dispatcher, in a daemon thread, so they keep running while
+      the application blocks its own loop.
+    - Attached mode (``attach=True``, or a ``loop`` passed to the constructor): a listener runs on the given
+      loop or, if there is none, on the loop that was running when the listener was registered. A listener of
+      an attached dispatcher never runs while that loop is blocked.
+    - Owned mode (see :meth:`owned`): the dispatcher runs ``num_loops`` loops in daemon threads and pins every
+      listener to one of them, so the messages of one listener are always handled in order.
+
+    The response listeners of the RPC requests run on the loop the request was sent from instead, see
+    :meth:`dispatch_to`, so that they can complete the futures of that loop.
+
+    With ``metrics``, the time a coroutine waits for its loop and the time it runs are recorded.
+    """
+
+    def __init__(
+        self,
+        loop: Optional[asyncio.AbstractEventLoop] = None,
+        num_loops: int = 0,
+        metrics: Optional[TransportMetrics] = None,
+        attach: bool = False,
+    ):
+        if num_loops < 0:
+            raise ValueError("num_loops shouldn't be negative")
+        self._loop = loop
+        self._attach = attach
+        self._num_loops = num_loops
+        self._owned_loops: List[asyncio.AbstractEventLoop] = []
+        self._threads: List[threading.Thread] = []
+        self._fallback_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Listener -> loop it runs on
+        self._bindings = weakref.WeakKeyDictionary()
+        self._next_loop = 0
+        self._lock = threading.Lock()
+        self.metrics = metrics
+
+    @classmethod
+    def owned(cls, num_loops: int = 1, metrics: Optional[TransportMetrics] = None) -> "ListenerDispatcher":
+        """
+        Create a dispatcher that owns its event loops.
+
+        :param num_loops: The number of loops (and threads) to run listeners on.
+        :param metrics: Optional metrics hook.
+        :return: The dispatcher.
+        """
+        if num_loops < 1:
+            raise ValueError("An owned dispatcher needs at least one event loop")
+        return cls(num_loops=num_loops, metrics=metrics)
+
+    @property
+    def owns_loops(self) -> bool:
+        return self._num_loops > 0
+
+    def bind(self, listener: UListener) -> asyncio.AbstractEventLoop:
+        """
+        Select the loop the listener will run on. Called from the registration path, so that attached mode can
+        pick up the application's running loop.
+
+        :param listener: The listener being registered.
+        :return: The loop bound to the listener.
+        """
+        with self._lock:
+            loop = self._bindings.get(listener)
+            if loop is None or loop.is_closed():
+                loop = self._select_loop()
+                self._bindings[listener] = loop
+        if isinstance(listener, QueuedListener):
+            listener.start(loop)
+        return loop
+
+    def dispatch(self, listener: UListener, message: UMessage) -> Optional[Future]:
+        """
+        Submit ``listener.on_receive(message)`` to the loop bound to the listener. Safe to call from any thread.
+
+        :param listener: The listener to invoke.
+        :param message: The received message.
+        :return: A future completed with the result of ``on_receive``, or None if the message was handed to the
+                 queue of a :class:`QueuedListener` or couldn't be dispatched.
+        """
+        if isinstance(listener, QueuedListener):
+            listener.offer(message)
+            return None
+        return self.submit(listener, listener.on_receive(message), message)
+
+    def dispatch_to(
+        self, listener: UListener, message: UMessage, loop: Optional[asyncio.AbstractEventLoop]
+    ) -> Optional[Future]:
+        """
+        Submit ``listener.on_receive(message)`` to the given loop rather than to the loop bound to the listener,
+        e.g. the loop an RPC request was sent from for its response. Falls back to :meth:`dispatch` without a
+        loop, once the loop is closed, and for a :class:`QueuedListener`. Safe to call from any thread.
+
+        :param listener: The listener to invoke.
+        :param message: The received message.
+        :param loop: The loop to run the listener on.
+        :return: A future completed with the result of ``on_receive``, or None if it couldn't be dispatched.
+        """
+        if loop is None or loop.is_closed() or isinstance(listener, QueuedListener):
+            return self.dispatch(listener, message)
+        return self._schedule(self._instrument(listener.on_receive(message)), loop)
+
+    def submit(self, listener: UListener, coroutine: Coroutine, message: Optional[UMessage] = None) -> Optional[Future]:
+        """
+        Submit a coroutine of the listener to the loop bound to the listener. Safe to call from any thread.
+
+        :param listener: The listener the coroutine belongs to.
+        :param coroutine: The coroutine to run.
+        :param message: The message the coroutine handles, if any. Unused here, dispatchers sharding the messages
+                        rather than the listeners, like :class:`ShardedDispatcher`, select the loop from it.
+        :return: A future completed with the result of the coroutine, or None if it couldn't be submitted.
+        """
+        loop = self._bindings.get(listener)
+        if loop is None or loop.is_closed():
+            loop = self.bind(listener)
+        return self._schedule(self._instrument(coroutine), loop)
+
+    def close(self) -> None:
+        """
+        Stop and close the loops owned by the dispatcher. Loops of the application are left untouched.
+        """
+        with self._lock:
+            loops = list(self._owned_loops)
+            threads = list(self._threads)
+            self._owned_loops.clear()
+            self._threads.clear()
+            self._fallback_loop = None
+            self._bindings.clear()
+
+        for loop in loops:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(loop.stop)
+        for thread in threads:
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def _instrument(self, coroutine: Coroutine) -> Coroutine:
+        metrics = self.metrics
+        if metrics is not None:
+            return _timed(coroutine, metrics, time.perf_counter())
+        return coroutine
+
+    def _schedule(self, coroutine: Coroutine, loop: asyncio.AbstractEventLoop) -> Optional[Future]:
+        try:
+            future = asyncio.run_coroutine_threadsafe(coroutine, loop)
+        except RuntimeError as e:
+            coroutine.close()
+            logging.debug(f"Unable to dispatch message to listener: {e}")
+            return None
+        future.add_done_callback(_log_listener_failure)
+        return future
+
+    def _select_loop(self) -> asyncio.AbstractEventLoop:
+        if self._num_loops:
+            while len(self._owned_loops) < self._num_loops:
+                self._owned_loops.append(self._spawn_loop())
+            loop = self._owned_loops[self._next_loop % self._num_loops]
+            self._next_loop += 1
+            return loop
+
+        if self._loop is not None:
+            return self._loop
+
+        if self._attach:
+            try:
+                return asyncio.get_running_loop()
+            except RuntimeError:
+                # No application loop to attach to
+                pass
+        if self._fallback_loop is None:
+            self._fallback_loop = self._spawn_loop()
+            self._owned_loops.append(self._fallback_loop)
+        return self._fallback_loop
+
+    def _spawn_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=_run_loop, args=(loop,), name="up-zenoh-dispatcher", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return loop
+
+
+def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_forever()
+    finally:
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+
+
+async def _timed(coroutine: Coroutine, metrics: TransportMetrics, submitted: float):
+    started = time.perf_counter()
+    metrics.record(DISPATCH_QUEUE_WAIT, started - submitted)
+    try:
+        return await coroutine
+    finally:
+        metrics.record(LISTENER_ON_RECEIVE, time.perf_counter() - started)
+
+
+def _log_listener_failure(future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        logging.debug(f"Listener raised an exception: {future.exception()}")
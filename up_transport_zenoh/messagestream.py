@@ -0,0 +1,231 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.umessage_pb2 import UMessage
+from zenoh import Handler, Queryable, Subscriber
+
+# Default number of messages buffered by a stream
+DEFAULT_STREAM_CAPACITY: int = 256
+
+
+class MessageStream:
+    """
+    Async iterator over the messages received by a zenoh subscriber or queryable declared with a channel
+    handler (``FifoChannel`` or ``RingChannel``) instead of a callback.
+
+    Zenoh buffers the samples in the channel, at most its capacity, until the stream pulls them: the consumer
+    reads at its own pace, and :meth:`recv_batch` drains whatever is buffered in one call. Buffered items are
+    taken without blocking; when the channel is empty, the stream waits for the next one on a thread of its own,
+    so the event loop is never blocked.
+
+    The iteration ends once the stream is closed. Use ``UPTransportZenoh.subscribe`` or
+    ``UPTransportZenoh.requests`` to create a stream.
+
+    :param receiver: The zenoh subscriber or queryable, declared with a channel handler, or the channel handler
+                     returned by a zenoh get.
+    :param decode: Turns a sample or query into a UMessage, or returns None to skip it.
+    :param on_close: Optional callback invoked once the stream is closed.
+    """
+
+    def __init__(
+        self,
+        receiver: Union[Subscriber, Queryable, Handler],
+        decode: Callable[[Any], Optional[UMessage]],
+        on_close: Optional[Callable[["MessageStream"], None]] = None,
+    ):
+        self._receiver = receiver
+        # Receive through the handler: a receive blocked on the receiver itself would keep it from being undeclared
+        self._handler = getattr(receiver, "handler", receiver)
+        self._decode = decode
+        self._on_close = on_close
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="up-zenoh-stream")
+        # Blocking receive still running, e.g. because the consumer was cancelled while waiting
+        self._pending_recv: Optional[asyncio.Future] = None
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __aiter__(self) -> "MessageStream":
+        return self
+
+    async def __anext__(self) -> UMessage:
+        message = await self.recv()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+    async def recv(self) -> Optional[UMessage]:
+        """
+        Wait for the next message.
+
+        :return: The message, or None once the stream is closed.
+        """
+        while not self._closed:
+            item = self._try_recv()
+            if item is None:
+                item = await self._recv_blocking()
+                if item is None:
+                    return None
+            message = self._decode(item)
+            if message is not None:
+                return message
+        return None
+
+    async def recv_batch(self, max_messages: int = DEFAULT_STREAM_CAPACITY) -> List[UMessage]:
+        """
+        Wait for at least one message and return it along with the messages already buffered.
+
+        :param max_messages: The maximum number of messages returned.
+        :return: The messages, empty once the stream is closed.
+        """
+        message = await self.recv()
+        if message is None:
+            return []
+        messages = [message]
+        while len(messages) < max_messages:
+            item = self._try_recv()
+            if item is None:
+                break
+            message = self._decode(item)
+            if message is not None:
+                messages.append(message)
+        return messages
+
+    def close(self) -> None:
+        """
+        Undeclare the subscriber or queryable. Buffered messages are discarded and the iteration ends.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        undeclare = getattr(self._receiver, "undeclare", None)
+        try:
+            # Also wakes the pending blocking receive up
+            if undeclare is not None:
+                undeclare()
+        except Exception as e:
+            logging.debug(f"Unable to undeclare the stream receiver: {e}")
+        self._executor.shutdown(wait=False)
+        if self._on_close is not None:
+            self._on_close(self)
+
+    async def __aenter__(self) -> "MessageStream":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.close()
+
+    def _try_recv(self):
+        if self._pending_recv is not None:
+            # Keep the order: the blocking receive may already hold the next item
+            return None
+        try:
+            return self._handler.try_recv()
+        except Exception:
+            # The channel is closed
+            return None
+
+    async def _recv_blocking(self):
+        if self._pending_recv is None:
+            try:
+                self._pending_recv = asyncio.get_running_loop().run_in_executor(self._executor, self._recv)
+            except RuntimeError:
+                # The executor was shut down by close()
+                return None
+        item = await asyncio.shield(self._pending_recv)
+        self._pending_recv = None
+        return item
+
+    def _recv(self):
+        try:
+            return self._handler.recv()
+        except Exception:
+            # The receiver was undeclared
+            return None
+
+
+class ResponseStream(MessageStream):
+    """
+    Async iterator over the chunks of a streamed RPC response, see ``UPTransportZenoh.invoke_stream``. The
+    iteration ends after the last chunk, or after the response if the server answered with a single message.
+
+    Zenoh holds at most the capacity of the channel rather than buffering the whole response. While the channel
+    is full, zenoh waits for the consumer on the receive thread of the client session, which stalls every other
+    subscription and reply of that session as well as the server: a consumer that stops reading must close the
+    stream.
+
+    :param replies: The channel handler returned by the zenoh get.
+    :param decode: Turns a reply into a UMessage and whether it is the last one, or returns None to skip it.
+    :param on_close: Optional callback invoked once the stream is closed.
+    """
+
+    def __init__(
+        self,
+        replies: Handler,
+        decode: Callable[[Any], Optional[Tuple[UMessage, bool]]],
+        on_close: Optional[Callable[["MessageStream"], None]] = None,
+    ):
+        super().__init__(replies, self._decode_chunk, on_close)
+        self._decode_reply = decode
+        self._received = False
+        self._ended = False
+
+    @property
+    def ended(self) -> bool:
+        """
+        Whether the last chunk was received.
+        """
+        return self._ended
+
+    async def recv(self) -> Optional[UMessage]:
+        """
+        Wait for the next chunk.
+
+        :return: The chunk, or None after the last chunk or once the stream is closed.
+        :raises UStatusError: If the response carries an error commstatus, or the query ended before the last
+                              chunk, e.g. because the request ttl expired.
+        """
+        if self._ended:
+            self.close()
+            return None
+        message = await super().recv()
+        if message is None and not self._closed:
+            self.close()
+            msg = "Response stream ended before its last chunk" if self._received else "No response received"
+            raise UStatusError.from_code_message(code=UCode.UNAVAILABLE, message=msg)
+        return message
+
+    def _decode_chunk(self, reply) -> Optional[UMessage]:
+        if self._ended:
+            return None
+        decoded = self._decode_reply(reply)
+        if decoded is None:
+            return None
+        message, last = decoded
+        self._received = True
+        self._ended = last
+        code = message.attributes.commstatus
+        if code != UCode.OK:
+            self._ended = True
+            raise UStatusError.from_code_message(code=code, message=f"Communication error [{UCode.Name(code)}]")
+        return message
@@ -0,0 +1,208 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import bisect
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Tuple
+
+from uprotocol.v1.ucode_pb2 import UCode
+
+# Latencies, recorded in seconds
+ATTACHMENT_ENCODE = "up.attachment.encode"
+ATTACHMENT_DECODE = "up.attachment.decode"
+KEY_RESOLUTION = "up.key.resolution"
+ZENOH_PUT = "up.zenoh.put"
+ZENOH_GET = "up.zenoh.get"
+ZENOH_REPLY = "up.zenoh.reply"
+DISPATCH_QUEUE_WAIT = "up.dispatch.queue_wait"
+LISTENER_ON_RECEIVE = "up.listener.on_receive"
+RPC_LATENCY = "up.rpc.latency"
+# Per priority class, e.g. "up.dispatch.queue_wait.cs6", recorded by the PriorityDispatcher
+PRIORITY_QUEUE_WAIT = DISPATCH_QUEUE_WAIT + ".{}"
+
+# Counters
+ATTACHMENT_DECODE_ERRORS = "up.attachment.decode.errors"
+MESSAGES_SENT = "up.messages.sent"
+MESSAGES_RECEIVED = "up.messages.received"
+QUERIES_EXPIRED = "up.queries.expired"
+QUERIES_OVERFLOWED = "up.queries.overflowed"
+RPC_HEDGED = "up.rpc.hedged"
+DISPATCH_AGED = "up.dispatch.aged"
+
+
+class TransportMetrics:
+    """
+    Instrumentation hook of the transport. Every method is a no-op, subclasses override what they collect.
+
+    Hooks are called from zenoh and event loop threads and must be thread-safe. When no hook is installed the hot
+    paths only pay for a ``None`` check.
+    """
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        Add to a counter.
+        """
+        pass
+
+    def record(self, name: str, seconds: float) -> None:
+        """
+        Record a latency sample.
+        """
+        pass
+
+    def rpc_completed(self, request_id: str, start: float, end: float, code: UCode) -> None:
+        """
+        Report the end-to-end latency of an RPC request, from ``send_request`` until its response or failure.
+
+        :param request_id: The serialized request id.
+        :param start: ``time.time()`` when the request was sent.
+        :param end: ``time.time()`` when the request completed.
+        :param code: The commstatus of the response.
+        """
+        self.record(RPC_LATENCY, end - start)
+
+
+class LatencyHistogram:
+    """
+    Latency histogram with fixed, roughly logarithmic buckets from 1 µs to 10 s.
+    """
+
+    BOUNDS: List[float] = [m * 10**e for e in range(-6, 1) for m in (1, 2, 5)] + [10.0]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """
+        :return: The upper bound of the bucket holding the q-quantile, ``max`` for the overflow bucket.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.BOUNDS[index] if index < len(self.BOUNDS) else self.max
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class InMemoryMetrics(TransportMetrics):
+    """
+    Collects counters and latency histograms in process, plus the latency of the last ``max_rpc_requests`` RPC
+    requests keyed by request id.
+    """
+
+    def __init__(self, max_rpc_requests: int = 1024):
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.rpc_latencies: "OrderedDict[str, Tuple[float, UCode]]" = OrderedDict()
+        self.max_rpc_requests = max_rpc_requests
+        self._lock = Lock()
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def rpc_completed(self, request_id: str, start: float, end: float, code: UCode) -> None:
+        super().rpc_completed(request_id, start, end, code)
+        with self._lock:
+            self.rpc_latencies[request_id] = (end - start, code)
+            while len(self.rpc_latencies) > self.max_rpc_requests:
+                self.rpc_latencies.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        :return: The counters and a summary of each histogram.
+        """
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "latencies": {name: histogram.summary() for name, histogram in self.histograms.items()},
+            }
+
+
+class OpenTelemetryMetrics(TransportMetrics):
+    """
+    Exports to OpenTelemetry, or anything with the same API. Latencies go to histograms (in seconds) and counters
+    to counters created from ``meter``. With a ``tracer``, each RPC request is also reported as a span carrying
+    its request id and status, which keeps the request ids out of the metric attributes.
+
+    :param meter: An ``opentelemetry.metrics.Meter``.
+    :param tracer: Optional ``opentelemetry.trace.Tracer``.
+    """
+
+    def __init__(self, meter, tracer=None):
+        self.meter = meter
+        self.tracer = tracer
+        self._counters = {}
+        self._histograms = {}
+        self._lock = Lock()
+
+    def increment(self, name: str, value: int = 1) -> None:
+        counter = self._counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self._counters.get(name)
+                if counter is None:
+                    counter = self._counters[name] = self.meter.create_counter(name)
+        counter.add(value)
+
+    def record(self, name: str, seconds: float, attributes: Dict[str, str] = None) -> None:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.get(name)
+                if histogram is None:
+                    histogram = self._histograms[name] = self.meter.create_histogram(name, unit="s")
+        histogram.record(seconds, attributes=attributes)
+
+    def rpc_completed(self, request_id: str, start: float, end: float, code: UCode) -> None:
+        self.record(RPC_LATENCY, end - start, attributes={"up.commstatus": UCode.Name(code)})
+        if self.tracer is not None:
+            span = self.tracer.start_span(
+                "up.rpc",
+                start_time=int(start * 1e9),
+                attributes={"up.request_id": request_id, "up.commstatus": UCode.Name(code)},
+            )
+            span.end(end_time=int(end * 1e9))
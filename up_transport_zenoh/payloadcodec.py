@@ -0,0 +1,146 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Tuple
+
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.v1.ucode_pb2 import UCode
+
+# Payloads smaller than this are sent as they are
+DEFAULT_COMPRESSION_THRESHOLD: int = 1024
+
+
+class PayloadCodec(ABC):
+    """
+    Compresses the payloads sent by the transport. The name of the codec travels in the attachment of every
+    compressed message, so the receivers must register a codec with the same name, see :func:`register_codec`.
+    """
+
+    # Identifies the codec on the wire
+    name: str = ""
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        pass
+
+
+class ZlibCodec(PayloadCodec):
+    """
+    zlib, from the standard library. Available on every peer of this transport.
+
+    :param level: The compression level, from 1 (fastest) to 9 (smallest).
+    """
+
+    name = "zlib"
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+_codecs: Dict[str, PayloadCodec] = {ZlibCodec.name: ZlibCodec()}
+_codecs_lock = threading.Lock()
+
+
+def register_codec(codec: PayloadCodec) -> None:
+    """
+    Register a codec, process-wide, for decompressing the received payloads. A codec with the same name is
+    replaced.
+
+    :param codec: The codec.
+    """
+    if not codec.name:
+        raise ValueError("A codec needs a name")
+    with _codecs_lock:
+        _codecs[codec.name] = codec
+
+
+def get_codec(name: str) -> Optional[PayloadCodec]:
+    """
+    :param name: The name of a codec.
+    :return: The registered codec, or None if there is no codec with this name.
+    """
+    return _codecs.get(name)
+
+
+def decompress_payload(data: bytes, codec_name: Optional[str]) -> bytes:
+    """
+    Restore a received payload.
+
+    :param data: The payload as received.
+    :param codec_name: The codec named in the attachment, None if the payload wasn't compressed.
+    :return: The original payload.
+    :raises UStatusError: If the codec is unknown or the payload can't be decompressed.
+    """
+    if codec_name is None or not data:
+        return data
+    codec = _codecs.get(codec_name)
+    if codec is None:
+        raise UStatusError.from_code_message(
+            code=UCode.UNIMPLEMENTED, message=f"Payload compressed with an unknown codec: {codec_name}"
+        )
+    try:
+        return codec.decompress(data)
+    except Exception as e:
+        raise UStatusError.from_code_message(code=UCode.INVALID_ARGUMENT, message=f"Unable to decompress payload: {e}")
+
+
+class PayloadCompression:
+    """
+    Opt-in compression of the payloads sent by a transport, see the ``compression`` argument of
+    ``UPTransportZenoh``.
+
+    Payloads of at least ``threshold`` bytes are compressed with ``codec`` and sent along with its name, unless
+    the compressed payload isn't smaller. The receivers decompress them automatically, whatever their own
+    compression settings.
+
+    Peers running a version of the transport that predates compression ignore the codec name and hand the
+    compressed payload to their listeners: only enable compression once every receiver supports it. Payloads
+    below the threshold are sent unchanged, readable by any peer.
+
+    :param codec: The codec, zlib by default. It is registered with :func:`register_codec`, so that the
+                  transport can decompress its own messages.
+    :param threshold: The minimum size of the compressed payloads, in bytes.
+    """
+
+    def __init__(self, codec: Optional[PayloadCodec] = None, threshold: int = DEFAULT_COMPRESSION_THRESHOLD):
+        if threshold < 0:
+            raise ValueError("threshold shouldn't be negative")
+        self.codec = codec if codec is not None else ZlibCodec()
+        self.threshold = threshold
+        register_codec(self.codec)
+
+    def compress(self, payload: bytes) -> Tuple[bytes, Optional[str]]:
+        """
+        :param payload: The payload to send.
+        :return: The payload to put on the wire and the name of its codec, None if it wasn't compressed.
+        """
+        if len(payload) < self.threshold:
+            return payload, None
+        compressed = self.codec.compress(payload)
+        if len(compressed) >= len(payload):
+            return payload, None
+        return compressed, self.codec.name
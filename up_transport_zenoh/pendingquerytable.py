@@ -0,0 +1,188 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import bisect
+import logging
+import time
+from collections import OrderedDict, namedtuple
+from enum import Enum
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+
+from zenoh import Query
+
+from up_transport_zenoh.deadlinescheduler import DeadlineScheduler, DeadlineTimer
+from up_transport_zenoh.metrics import QUERIES_EXPIRED, QUERIES_OVERFLOWED, LatencyHistogram, TransportMetrics
+
+DEFAULT_MAX_PENDING_QUERIES: int = 10000
+
+# Upper bounds in seconds of the age buckets of the pending queries, see PendingQueryTable.stats
+AGE_BOUNDS: List[float] = [0.01, 0.1, 1.0, 10.0]
+
+PendingQueryStats = namedtuple("PendingQueryStats", ["size", "oldest_age", "ages", "expired", "overflowed", "held"])
+
+
+class EvictionReason(Enum):
+    # The ttl of the request passed before it was answered
+    EXPIRED = "expired"
+    # The table was full and the query was the oldest one
+    OVERFLOW = "overflow"
+
+
+class PendingQueryTable:
+    """
+    The zenoh queries of the RPC requests waiting for their response, keyed by serialized request id.
+
+    Each query is kept until it is answered or its request ttl expires, and at most ``max_size`` queries are kept:
+    when the table is full, the oldest query is evicted. Evicted queries are dropped, which finalizes them in zenoh
+    so the client sees the request end without a response instead of waiting for it. Evictions are counted and
+    reported to ``on_evict`` with the request id and the :class:`EvictionReason`, from the thread that evicted.
+
+    :param max_size: The maximum number of pending queries.
+    :param on_evict: Optional callback invoked for every evicted query.
+    :param metrics: Optional metrics hook counting the evictions.
+    :param track_held_time: Keep a histogram of the time the answered queries were held until their response,
+                            see :meth:`stats`.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_PENDING_QUERIES,
+        on_evict: Optional[Callable[[bytes, EvictionReason], None]] = None,
+        metrics: Optional[TransportMetrics] = None,
+        track_held_time: bool = False,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size should be at least 1")
+        self.max_size = max_size
+        self.on_evict = on_evict
+        self.metrics = metrics
+        self.expired = 0
+        self.overflowed = 0
+        self.held: Optional[LatencyHistogram] = LatencyHistogram() if track_held_time else None
+        # Oldest first: (query, expiry timer, time.monotonic() when received)
+        self._queries: "OrderedDict[bytes, Tuple[Query, DeadlineTimer, float]]" = OrderedDict()
+        self._lock = Lock()
+        self._scheduler = DeadlineScheduler(name="up-zenoh-query-expiry")
+        self._closed = False
+
+    @property
+    def evictions(self) -> int:
+        return self.expired + self.overflowed
+
+    def put(self, reqid: bytes, query: Query, ttl_ms: int) -> bool:
+        """
+        Keep a query until its response is sent or ``ttl_ms`` passed.
+
+        :param reqid: The serialized request id.
+        :param query: The query to answer.
+        :param ttl_ms: The ttl of the request in milliseconds.
+        :return: False if the table is closed and the query wasn't kept.
+        """
+        with self._lock:
+            if self._closed:
+                return False
+            timer = self._scheduler.schedule(ttl_ms / 1000, lambda: self._expire(reqid))
+            previous = self._queries.pop(reqid, None)
+            if previous is not None:
+                previous[1].cancel()
+            self._queries[reqid] = (query, timer, time.monotonic())
+            overflow = len(self._queries) > self.max_size
+            if overflow:
+                oldest, (_, oldest_timer, _) = self._queries.popitem(last=False)
+                oldest_timer.cancel()
+                self.overflowed += 1
+
+        if overflow:
+            self._report(oldest, EvictionReason.OVERFLOW)
+        return True
+
+    def pop(self, reqid: bytes) -> Optional[Query]:
+        """
+        Remove the query of a request.
+
+        :param reqid: The serialized request id.
+        :return: The query, or None if it was answered or evicted already.
+        """
+        with self._lock:
+            entry = self._queries.pop(reqid, None)
+            if entry is not None and self.held is not None:
+                self.held.add(time.monotonic() - entry[2])
+        if entry is None:
+            return None
+        entry[1].cancel()
+        return entry[0]
+
+    def stats(self) -> PendingQueryStats:
+        """
+        :return: The number of pending queries, the age of the oldest one in seconds, the number of pending
+                 queries per age bucket, the eviction counts, and ``held``: a summary of the time the *answered*
+                 queries were held until their response if tracked, None otherwise. ``ages`` maps the upper bound
+                 in seconds of each bucket of :data:`AGE_BOUNDS`, and "inf" for the older queries, to the number
+                 of pending queries older than the previous bound.
+        """
+        now = time.monotonic()
+        counts = [0] * (len(AGE_BOUNDS) + 1)
+        with self._lock:
+            for _, _, received in self._queries.values():
+                counts[bisect.bisect_left(AGE_BOUNDS, now - received)] += 1
+            oldest = next(iter(self._queries.values()), None)
+            oldest_age = now - oldest[2] if oldest is not None else 0.0
+            held: Optional[Dict[str, float]] = self.held.summary() if self.held is not None else None
+            size = len(self._queries)
+        ages = dict(zip([str(bound) for bound in AGE_BOUNDS] + ["inf"], counts))
+        return PendingQueryStats(size, oldest_age, ages, self.expired, self.overflowed, held)
+
+    def clear(self) -> None:
+        """
+        Drop every pending query, without reporting evictions.
+        """
+        with self._lock:
+            entries = list(self._queries.values())
+            self._queries.clear()
+        for _, timer, _ in entries:
+            timer.cancel()
+
+    def close(self) -> None:
+        """
+        Drop every pending query and stop the expiry thread. Queries received afterwards aren't kept.
+        """
+        with self._lock:
+            self._closed = True
+        self._scheduler.close()
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+    def __contains__(self, reqid: bytes) -> bool:
+        return reqid in self._queries
+
+    def _expire(self, reqid: bytes) -> None:
+        with self._lock:
+            entry = self._queries.pop(reqid, None)
+            if entry is not None:
+                self.expired += 1
+        if entry is not None:
+            self._report(reqid, EvictionReason.EXPIRED)
+
+    def _report(self, reqid: bytes, reason: EvictionReason) -> None:
+        logging.debug(f"Pending query evicted ({reason.value})")
+        if self.metrics is not None:
+            self.metrics.increment(QUERIES_EXPIRED if reason is EvictionReason.EXPIRED else QUERIES_OVERFLOWED)
+        if self.on_evict is not None:
+            try:
+                self.on_evict(reqid, reason)
+            except Exception as e:
+                logging.debug(f"Eviction callback failed: {e}")
@@ -0,0 +1,132 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import logging
+import time
+from typing import Optional
+
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.transport.validator.uattributesvalidator import Validators
+from uprotocol.uuid.factory.uuidfactory import Factories
+from uprotocol.v1.uattributes_pb2 import UAttributes, UMessageType, UPayloadFormat, UPriority
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.uri_pb2 import UUri
+from uprotocol.v1.ustatus_pb2 import UStatus
+from zenoh import Publisher
+
+from up_transport_zenoh.lastvaluecache import LastValueCache
+from up_transport_zenoh.metrics import MESSAGES_SENT, ZENOH_PUT, TransportMetrics
+from up_transport_zenoh.payloadcodec import PayloadCompression
+from up_transport_zenoh.zenohutils import UATTRIBUTE_VERSION
+
+_VERSION_BYTES = UATTRIBUTE_VERSION.to_bytes(1, byteorder='little')
+
+
+class PreparedPublisher:
+    """
+    Publishes messages with fixed source, sink and priority through a zenoh ``Publisher``.
+
+    The key expression, zenoh priority and validation are resolved when the handle is declared, and the static
+    UAttributes fields are serialized once. Each message only serializes its id and ttl, appended to the static
+    fields: protobuf merges concatenated messages, so receivers decode the same UAttributes as for
+    ``UPTransportZenoh.send``.
+
+    Use :meth:`UPTransportZenoh.declare_publisher` to create a handle.
+    """
+
+    def __init__(
+        self,
+        publisher: Publisher,
+        source: UUri,
+        sink: Optional[UUri] = None,
+        priority: UPriority = UPriority.UPRIORITY_CS1,
+        payload_format: UPayloadFormat = UPayloadFormat.UPAYLOAD_FORMAT_UNSPECIFIED,
+        metrics: Optional[TransportMetrics] = None,
+        compression: Optional[PayloadCompression] = None,
+        last_values: Optional[LastValueCache] = None,
+    ):
+        if sink is not None and sink != UUri():
+            msg_type = UMessageType.UMESSAGE_TYPE_NOTIFICATION
+            validator = Validators.NOTIFICATION.validator()
+        else:
+            msg_type = UMessageType.UMESSAGE_TYPE_PUBLISH
+            validator = Validators.PUBLISH.validator()
+            sink = None
+        template = UAttributes(
+            type=msg_type, source=source, sink=sink, priority=priority, payload_format=payload_format
+        )
+
+        # Validate once, with a generated id standing in for the per-message one
+        attributes = UAttributes()
+        attributes.CopyFrom(template)
+        attributes.id.CopyFrom(Factories.UPROTOCOL.create())
+        result = validator.validate(attributes)
+        if result.is_failure():
+            raise UStatusError.from_code_message(code=UCode.INVALID_ARGUMENT, message=result.get_message())
+
+        self._publisher = publisher
+        self._static_attributes = template.SerializeToString()
+        self.source = source
+        self.sink = sink
+        self.priority = priority
+        self.metrics = metrics
+        self.compression = compression
+        # Only the published messages are cached, not the notifications
+        self.last_values = last_values if msg_type == UMessageType.UMESSAGE_TYPE_PUBLISH else None
+
+    @property
+    def key_expr(self) -> str:
+        return str(self._publisher.key_expr)
+
+    def publish(self, payload: bytes = b'', ttl: Optional[int] = None) -> UStatus:
+        """
+        Publish a message.
+
+        :param payload: The payload of the message.
+        :param ttl: Optional time to live of the message in milliseconds.
+        :return: The status of the publication.
+        """
+        dynamic_attributes = UAttributes(id=Factories.UPROTOCOL.create(), ttl=ttl)
+        attachment = [_VERSION_BYTES, self._static_attributes + dynamic_attributes.SerializeToString()]
+        if self.compression is not None:
+            payload, codec = self.compression.compress(payload)
+            if codec is not None:
+                attachment.append(codec.encode())
+        metrics = self.metrics
+        if metrics is not None:
+            start = time.perf_counter()
+        try:
+            self._publisher.put(payload, attachment=attachment)
+        except Exception as e:
+            msg = f"Unable to send with Zenoh: {e}"
+            logging.debug(f"ERROR: {msg}")
+            return UStatus(code=UCode.INTERNAL, message=msg)
+        if metrics is not None:
+            metrics.record(ZENOH_PUT, time.perf_counter() - start)
+            metrics.increment(MESSAGES_SENT)
+        if self.last_values is not None:
+            self.last_values.put(self.key_expr, payload, attachment)
+        return UStatus(code=UCode.OK, message="Successfully sent data to Zenoh")
+
+    def close(self) -> None:
+        """
+        Undeclare the zenoh publisher.
+        """
+        self._publisher.undeclare()
+
+    def __enter__(self) -> "PreparedPublisher":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,259 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import Future
+from typing import Coroutine, Dict, List, Optional, Tuple
+
+from uprotocol.transport.ulistener import UListener
+from uprotocol.v1.uattributes_pb2 import UPriority
+from uprotocol.v1.umessage_pb2 import UMessage
+
+from up_transport_zenoh.listenerdispatcher import ListenerDispatcher
+from up_transport_zenoh.metrics import (
+    DISPATCH_AGED,
+    DISPATCH_QUEUE_WAIT,
+    LISTENER_ON_RECEIVE,
+    PRIORITY_QUEUE_WAIT,
+    TransportMetrics,
+)
+
+# Time a queued message waits before it moves up one priority class, in seconds
+DEFAULT_AGING_INTERVAL: float = 0.05
+
+# Listener coroutines a worker runs at once, the other messages wait in the queues
+DEFAULT_MAX_CONCURRENCY: int = 16
+
+# CS0 to CS6
+NUM_PRIORITY_CLASSES: int = UPriority.UPRIORITY_CS6 - UPriority.UPRIORITY_CS0 + 1
+
+PriorityClassStats = namedtuple("PriorityClassStats", ["depth", "dispatched", "aged"])
+
+_QUEUE_WAIT_METRICS = tuple(PRIORITY_QUEUE_WAIT.format(f"cs{index}") for index in range(NUM_PRIORITY_CLASSES))
+
+
+def priority_class(priority: int) -> int:
+    """
+    :param priority: The UPriority of a message.
+    :return: Its class, from 0 for CS0 to 6 for CS6. Messages without a priority get the default priority, CS1.
+    """
+    if UPriority.UPRIORITY_CS0 <= priority <= UPriority.UPRIORITY_CS6:
+        return priority - UPriority.UPRIORITY_CS0
+    return UPriority.UPRIORITY_CS1 - UPriority.UPRIORITY_CS0
+
+
+class QueuedCoroutine:
+    __slots__ = ("coroutine", "future", "submitted", "priority")
+
+    def __init__(self, coroutine: Coroutine, priority: int):
+        self.coroutine = coroutine
+        self.future = Future()
+        self.submitted = time.perf_counter()
+        self.priority = priority
+
+
+class PriorityDispatcher(ListenerDispatcher):
+    """
+    Hands the received messages to their listeners in priority order rather than in arrival order, so that
+    e.g. CS6 safety messages don't wait behind a backlog of CS0 bulk messages. ``UPriority`` otherwise only
+    orders the messages on the wire.
+
+    The messages are queued per priority class and ``num_workers`` workers, each running an event loop in a
+    thread of its own, take the message of the highest class first. To keep the lower classes from starving,
+    a queued message moves up one class every ``aging_interval`` seconds it waits, until it goes ahead of the
+    newer messages of the higher classes.
+
+    The priority orders the start of the listener coroutines: a worker starts them one at a time and runs up to
+    ``max_concurrency`` of them at once, interleaved at their ``await``, so that a listener waiting e.g. for the
+    response of a nested RPC doesn't hold the worker. Once a worker is at its limit, the messages wait in the
+    queues until a coroutine completes. A listener that is running isn't interrupted, more workers bound the wait
+    of an urgent message behind a listener that blocks its loop.
+
+    Pass it to the transport to dispatch the publish, notification and request listeners this way::
+
+        transport = UPTransportZenoh.new(config, source, dispatcher=PriorityDispatcher())
+
+    The responses to the RPC requests sent aren't prioritized: their listeners run right away on the loop each
+    request was sent from, see ``ListenerDispatcher.dispatch_to``.
+
+    With ``metrics``, the queue wait of each class is recorded as ``up.dispatch.queue_wait.cs0`` to ``cs6``,
+    on top of the metrics of ``ListenerDispatcher``. Coroutines submitted without a message, and the listeners
+    wrapped in a ``QueuedListener``, run on a worker bound to the listener as with ``ListenerDispatcher.owned``.
+
+    :param num_workers: The number of workers.
+    :param aging_interval: The time a queued message waits before it moves up one class, in seconds.
+    :param metrics: Optional metrics hook.
+    :param max_concurrency: The number of listener coroutines each worker runs at once.
+    """
+
+    def __init__(
+        self,
+        num_workers: int = 1,
+        aging_interval: float = DEFAULT_AGING_INTERVAL,
+        metrics: Optional[TransportMetrics] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ):
+        if num_workers < 1:
+            raise ValueError("A priority dispatcher needs at least one worker")
+        if aging_interval <= 0:
+            raise ValueError("aging_interval should be positive")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency should be positive")
+        super().__init__(num_loops=num_workers, metrics=metrics)
+        self.aging_interval = aging_interval
+        self.max_concurrency = max_concurrency
+        self._queues: List[deque] = [deque() for _ in range(NUM_PRIORITY_CLASSES)]
+        self._dispatched = [0] * NUM_PRIORITY_CLASSES
+        self._aged = [0] * NUM_PRIORITY_CLASSES
+        # The loop and wakeup event of the workers waiting for a message
+        self._idle: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+        self._queue_lock = threading.Lock()
+        self._started = False
+
+    @property
+    def num_workers(self) -> int:
+        return self._num_loops
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self._queues)
+
+    def stats(self) -> Dict[int, PriorityClassStats]:
+        """
+        :return: The number of queued, dispatched and aged messages of each class, by UPriority. A message is
+                 aged when it was dispatched ahead of a message of a higher class.
+        """
+        with self._queue_lock:
+            return {
+                UPriority.UPRIORITY_CS0 + index: PriorityClassStats(
+                    len(self._queues[index]), self._dispatched[index], self._aged[index]
+                )
+                for index in range(NUM_PRIORITY_CLASSES)
+            }
+
+    def submit(self, listener: UListener, coroutine: Coroutine, message: Optional[UMessage] = None) -> Optional[Future]:
+        if message is None:
+            return super().submit(listener, coroutine)
+        self._start_workers()
+        queued = QueuedCoroutine(coroutine, priority_class(message.attributes.priority))
+        with self._queue_lock:
+            self._queues[queued.priority].append(queued)
+            idle = self._idle.pop() if self._idle else None
+        if idle is not None:
+            loop, wakeup = idle
+            try:
+                loop.call_soon_threadsafe(wakeup.set)
+            except RuntimeError as e:
+                logging.debug(f"Unable to wake up the priority dispatcher: {e}")
+        return queued.future
+
+    def close(self) -> None:
+        with self._queue_lock:
+            queued = [coroutine for queue in self._queues for coroutine in queue]
+            for queue in self._queues:
+                queue.clear()
+            self._idle.clear()
+            self._started = False
+        super().close()
+        for coroutine in queued:
+            coroutine.coroutine.close()
+            coroutine.future.cancel()
+
+    def _start_workers(self) -> None:
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            while len(self._owned_loops) < self._num_loops:
+                self._owned_loops.append(self._spawn_loop())
+            for loop in self._owned_loops:
+                asyncio.run_coroutine_threadsafe(self._work(), loop)
+            self._started = True
+
+    def _take(self) -> Optional[QueuedCoroutine]:
+        # The head of each queue is its oldest message, the one aged the most
+        now = time.perf_counter()
+        selected = None
+        rank = -1
+        highest = None
+        for index in range(NUM_PRIORITY_CLASSES - 1, -1, -1):
+            queue = self._queues[index]
+            if not queue:
+                continue
+            if highest is None:
+                highest = index
+            # On a tie the higher class goes first
+            aged = index + int((now - queue[0].submitted) / self.aging_interval)
+            if aged > rank:
+                selected, rank = index, aged
+        if selected is None:
+            return None
+        self._dispatched[selected] += 1
+        if selected != highest:
+            self._aged[selected] += 1
+            if self.metrics is not None:
+                self.metrics.increment(DISPATCH_AGED)
+        return self._queues[selected].popleft()
+
+    async def _work(self) -> None:
+        loop = asyncio.get_running_loop()
+        wakeup = asyncio.Event()
+        slots = asyncio.Semaphore(self.max_concurrency)
+        running = set()
+        while True:
+            await slots.acquire()
+            with self._queue_lock:
+                queued = self._take()
+                if queued is None:
+                    wakeup.clear()
+                    self._idle.append((loop, wakeup))
+            if queued is None:
+                slots.release()
+                await wakeup.wait()
+                continue
+            # Started in priority order, the coroutines then run concurrently
+            task = loop.create_task(self._run(queued))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def _run(self, queued: QueuedCoroutine) -> None:
+        future = queued.future
+        if not future.set_running_or_notify_cancel():
+            queued.coroutine.close()
+            return
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.perf_counter()
+            metrics.record(DISPATCH_QUEUE_WAIT, started - queued.submitted)
+            metrics.record(_QUEUE_WAIT_METRICS[queued.priority], started - queued.submitted)
+        try:
+            result = await queued.coroutine
+        except asyncio.CancelledError as e:
+            # Closing the dispatcher, a running future can't be cancelled
+            future.set_exception(e)
+            raise
+        except Exception as e:
+            logging.debug(f"Listener raised an exception: {e}")
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            if metrics is not None:
+                metrics.record(LISTENER_ON_RECEIVE, time.perf_counter() - started)
@@ -0,0 +1,95 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict
+
+from uprotocol.v1.uattributes_pb2 import UPriority
+from zenoh import CongestionControl, Reliability
+
+
+@dataclass(frozen=True)
+class QosSettings:
+    """
+    Zenoh QoS of the messages of one priority.
+
+    :param congestion_control: Whether a sender blocks or the message is dropped when the network is congested.
+    :param express: Send the message immediately instead of batching it with other messages.
+    """
+
+    # Zenoh enums aren't hashable, hence the factories
+    congestion_control: CongestionControl = field(default_factory=lambda: CongestionControl.DEFAULT)
+    express: bool = False
+
+
+@dataclass(frozen=True)
+class QosPolicy:
+    """
+    Maps each UPriority to the zenoh QoS used by ``put``, ``get`` and query replies.
+
+    :param settings: QoS per priority, priorities missing from the table use ``default``.
+    :param default: QoS of the priorities missing from ``settings``.
+    :param reliability: Reliability requested by the subscribers. Zenoh sets reliability on the subscriber and
+                        not per message, so it applies to all the subscriptions of the transport.
+    """
+
+    DEFAULT = None
+    LOW_LATENCY = None
+    HIGH_THROUGHPUT = None
+
+    settings: Dict[int, QosSettings] = field(default_factory=dict)
+    default: QosSettings = QosSettings()
+    reliability: Reliability = field(default_factory=lambda: Reliability.DEFAULT)
+
+    def for_priority(self, priority: UPriority) -> QosSettings:
+        return self.settings.get(priority, self.default)
+
+
+_DROP = CongestionControl.DROP
+_BLOCK = CongestionControl.BLOCK
+
+# Zenoh defaults for every priority
+QosPolicy.DEFAULT = QosPolicy()
+
+# Nothing is batched. Control traffic (CS4 and above) is never dropped, lower classes are dropped rather than
+# blocking the sender under congestion.
+QosPolicy.LOW_LATENCY = QosPolicy(
+    settings={
+        UPriority.UPRIORITY_CS0: QosSettings(_DROP, express=True),
+        UPriority.UPRIORITY_CS1: QosSettings(_DROP, express=True),
+        UPriority.UPRIORITY_CS2: QosSettings(_DROP, express=True),
+        UPriority.UPRIORITY_CS3: QosSettings(_DROP, express=True),
+        UPriority.UPRIORITY_CS4: QosSettings(_BLOCK, express=True),
+        UPriority.UPRIORITY_CS5: QosSettings(_BLOCK, express=True),
+        UPriority.UPRIORITY_CS6: QosSettings(_BLOCK, express=True),
+    },
+    default=QosSettings(_DROP, express=True),
+    reliability=Reliability.BEST_EFFORT,
+)
+
+# Data is batched and not dropped, except bulk CS0 traffic which must not block the senders. CS5 and CS6 control
+# traffic bypasses the batches.
+QosPolicy.HIGH_THROUGHPUT = QosPolicy(
+    settings={
+        UPriority.UPRIORITY_CS0: QosSettings(_DROP, express=False),
+        UPriority.UPRIORITY_CS1: QosSettings(_BLOCK, express=False),
+        UPriority.UPRIORITY_CS2: QosSettings(_BLOCK, express=False),
+        UPriority.UPRIORITY_CS3: QosSettings(_BLOCK, express=False),
+        UPriority.UPRIORITY_CS4: QosSettings(_BLOCK, express=False),
+        UPriority.UPRIORITY_CS5: QosSettings(_BLOCK, express=True),
+        UPriority.UPRIORITY_CS6: QosSettings(_BLOCK, express=True),
+    },
+    default=QosSettings(_BLOCK, express=False),
+    reliability=Reliability.RELIABLE,
+)
@@ -0,0 +1,184 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import logging
+import threading
+from collections import deque, namedtuple
+from enum import Enum
+from typing import Optional
+
+from uprotocol.transport.ulistener import UListener
+from uprotocol.v1.umessage_pb2 import UMessage
+
+DEFAULT_QUEUE_CAPACITY: int = 1024
+
+ListenerQueueStats = namedtuple("ListenerQueueStats", ["depth", "high_water_mark", "dropped", "delivered"])
+
+
+class OverflowPolicy(Enum):
+    # The zenoh thread waits for room in the queue: this stalls every listener of the transport sharing that
+    # thread and the receive path of the session, not only this one
+    BLOCK = "block"
+    # The incoming message is dropped
+    DROP_NEWEST = "drop_newest"
+    # The oldest queued message is dropped to make room
+    DROP_OLDEST = "drop_oldest"
+    # Only the latest message is kept, whatever the capacity
+    KEEP_LATEST = "keep_latest"
+
+
+class QueuedListener(UListener):
+    """
+    Gives a listener its own bounded queue and worker, so that a slow consumer neither delays the other
+    listeners nor lets its backlog grow without bound. Register the wrapper in place of the listener::
+
+        queued = QueuedListener(listener, capacity=100, policy=OverflowPolicy.DROP_OLDEST)
+        await transport.register_listener(topic, queued)
+
+    The transport queues the messages from the zenoh thread, applying ``policy`` when the queue is full, and a
+    worker task on the event loop of the listener hands them to ``listener.on_receive`` one at a time, in order.
+
+    The default policy, ``DROP_OLDEST``, never holds up the zenoh thread. ``BLOCK`` has to be chosen explicitly:
+    while the queue is full it blocks the zenoh thread delivering the message, and with it the other listeners
+    and the receive path of the session, trading the head-of-line blocking for no loss. A message received on
+    the worker's own loop thread, e.g. published locally from a coroutine of that loop, is then queued beyond
+    the capacity rather than blocking the loop the worker runs on.
+
+    The worker keeps running once the listener is unregistered, as the same wrapper may be registered for several
+    keys: call :meth:`close` when it is no longer used.
+
+    :param listener: The wrapped listener.
+    :param capacity: The maximum number of queued messages.
+    :param policy: What happens to a message received while the queue is full.
+    """
+
+    def __init__(
+        self,
+        listener: UListener,
+        capacity: int = DEFAULT_QUEUE_CAPACITY,
+        policy: OverflowPolicy = OverflowPolicy.DROP_OLDEST,
+    ):
+        if capacity < 1:
+            raise ValueError("capacity should be at least 1")
+        self.listener = listener
+        self.capacity = 1 if policy is OverflowPolicy.KEEP_LATEST else capacity
+        self.policy = policy
+        self.high_water_mark = 0
+        self.dropped = 0
+        self.delivered = 0
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._worker = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # The worker is waiting for _wakeup to be set
+        self._idle = False
+        self._closed = False
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> ListenerQueueStats:
+        with self._lock:
+            return ListenerQueueStats(len(self._queue), self.high_water_mark, self.dropped, self.delivered)
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        # Called when not dispatched by the transport, e.g. directly by the application
+        await self.listener.on_receive(umsg)
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Start the worker on a loop, once. Called by the dispatcher when the listener is registered.
+        """
+        with self._lock:
+            if self._worker is not None and self._loop is loop and not loop.is_closed():
+                return
+            self._loop = loop
+            try:
+                # Registered from the loop itself (attached mode): known before the worker runs
+                if asyncio.get_running_loop() is loop:
+                    self._loop_thread = threading.get_ident()
+            except RuntimeError:
+                pass
+            self._worker = asyncio.run_coroutine_threadsafe(self._run(), loop)
+
+    def offer(self, message: UMessage) -> bool:
+        """
+        Queue a message, applying the overflow policy if the queue is full. Safe to call from any thread.
+
+        :param message: The received message.
+        :return: False if a message, this one or a queued one, was dropped.
+        """
+        accepted = True
+        with self._lock:
+            if self._closed:
+                return False
+            if len(self._queue) >= self.capacity:
+                if self.policy is OverflowPolicy.DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+                if self.policy is OverflowPolicy.BLOCK:
+                    if threading.get_ident() != self._loop_thread:
+                        while len(self._queue) >= self.capacity and not self._closed:
+                            self._not_full.wait()
+                else:
+                    # DROP_OLDEST and KEEP_LATEST
+                    self._queue.popleft()
+                    self.dropped += 1
+                    accepted = False
+            self._queue.append(message)
+            self.high_water_mark = max(self.high_water_mark, len(self._queue))
+            wake = self._idle
+            self._idle = False
+        if wake:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return accepted
+
+    def close(self) -> None:
+        """
+        Stop the worker and discard the queued messages.
+        """
+        with self._lock:
+            self._closed = True
+            worker = self._worker
+            self._worker = None
+            self._queue.clear()
+            self._not_full.notify_all()
+        if worker is not None:
+            worker.cancel()
+
+    async def _run(self) -> None:
+        self._loop_thread = threading.get_ident()
+        self._wakeup = asyncio.Event()
+        while True:
+            with self._lock:
+                if self._queue:
+                    message = self._queue.popleft()
+                    self._not_full.notify()
+                else:
+                    message = None
+                    self._idle = True
+                    self._wakeup.clear()
+            if message is None:
+                await self._wakeup.wait()
+                continue
+            try:
+                await self.listener.on_receive(message)
+            except Exception as e:
+                logging.debug(f"Listener raised an exception: {e}")
+            self.delivered += 1
@@ -0,0 +1,129 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import hashlib
+import time
+from collections import namedtuple
+from typing import Dict, Hashable, Optional, Tuple
+
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.umessage_pb2 import UMessage
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.lrucache import MISSING, LruCache
+
+# Maximum number of responses cached, the least recently used response is evicted beyond it
+DEFAULT_MAX_CACHED_RESPONSES: int = 1024
+
+ResponseCacheStats = namedtuple("ResponseCacheStats", ["hits", "misses", "coalesced", "size"])
+
+
+def method_key(method: UUri) -> Tuple[str, int, int, int]:
+    """
+    :param method: The UUri of an RPC method.
+    :return: A hashable key of the method.
+    """
+    return method.authority_name, method.ue_id, method.ue_version_major, method.resource_id
+
+
+class ResponseCache:
+    """
+    Client-side cache of the responses of idempotent RPC methods, e.g. configuration, VIN or capability queries.
+    Only the methods added with :meth:`add_method` are cached, each with its own ttl. Responses are keyed by
+    method and request payload, and only successful responses are cached.
+
+    Pass it to the transport, which also coalesces identical requests: while a request is in flight, the
+    identical requests sent meanwhile don't query the network but share its response, re-addressed to each of
+    them under its own request id::
+
+        cache = ResponseCache()
+        cache.add_method(GET_VIN, ttl_ms=60000)
+        transport = UPTransportZenoh.new(config, source, response_cache=cache)
+
+    :param max_entries: The maximum number of responses cached.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_CACHED_RESPONSES):
+        self._ttls: Dict[Tuple[str, int, int, int], float] = {}
+        self._responses = LruCache(max_entries)
+        self.hits = 0
+        self.misses = 0
+        # Requests that shared the response of an identical request in flight, updated by the RPC engine
+        self.coalesced = 0
+
+    def add_method(self, method: UUri, ttl_ms: int) -> None:
+        """
+        Cache the responses of a method.
+
+        :param method: The UUri of the method.
+        :param ttl_ms: How long a response is served from the cache, in milliseconds.
+        """
+        if ttl_ms <= 0:
+            raise ValueError("ttl_ms should be positive")
+        self._ttls[method_key(method)] = ttl_ms / 1000
+
+    def remove_method(self, method: UUri) -> None:
+        """
+        Stop caching the responses of a method.
+
+        :param method: The UUri of the method.
+        """
+        self._ttls.pop(method_key(method), None)
+
+    def key(self, method: UUri, payload: bytes, payload_format: int = 0) -> Optional[Hashable]:
+        """
+        :param method: The sink of the request.
+        :param payload: The payload of the request.
+        :param payload_format: The payload format of the request.
+        :return: The cache key of the request, None if the method isn't cached.
+        """
+        method = method_key(method)
+        if method not in self._ttls:
+            return None
+        return method, payload_format, hashlib.sha256(payload).digest()
+
+    def get(self, key: Hashable) -> Optional[UMessage]:
+        """
+        :param key: The cache key of a request.
+        :return: The cached response, None if there is none or it expired.
+        """
+        entry = self._responses.get(key)
+        if entry is MISSING or entry[1] <= time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, response: UMessage) -> None:
+        """
+        Cache a response if it is successful and its method still cached.
+
+        :param key: The cache key of the request.
+        :param response: The response. A copy is cached, so that the caller can keep using the message.
+        """
+        ttl = self._ttls.get(key[0])
+        if ttl is None or response.attributes.commstatus != UCode.OK:
+            return
+        cached = UMessage()
+        cached.CopyFrom(response)
+        self._responses.put(key, (cached, time.monotonic() + ttl))
+
+    def clear(self) -> None:
+        """
+        Drop the cached responses.
+        """
+        self._responses.clear()
+
+    def stats(self) -> ResponseCacheStats:
+        return ResponseCacheStats(self.hits, self.misses, self.coalesced, len(self._responses))
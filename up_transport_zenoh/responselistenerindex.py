@@ -0,0 +1,148 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from uprotocol.transport.ulistener import UListener
+from zenoh import KeyExpr
+
+from up_transport_zenoh.lrucache import MISSING, LruCache
+
+DEFAULT_CACHE_SIZE: int = 1024
+
+WILDCARD_CHUNK = "*"
+
+
+class _TrieNode:
+    __slots__ = ("children", "entry")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # (registration order, listener) of the key ending at this node
+        self.entry: Optional[Tuple[int, UListener]] = None
+
+
+class _Snapshot:
+    """
+    Immutable view of the registered response listeners. Keys without wildcards are looked up in a dict, keys
+    whose wildcards are single ``*`` chunks (the ``up/<auth>/<ue>/<ver>/<rid>/...`` layout) go into a trie of
+    key chunks, and anything else falls back to a ``KeyExpr`` intersection scan.
+    """
+
+    def __init__(self, listeners: Dict[str, UListener], cache_size: int):
+        self.listeners = listeners
+        self.exact: Dict[str, UListener] = {}
+        self.trie = _TrieNode()
+        self.complex: List[Tuple[int, KeyExpr, UListener]] = []
+        self.cache = LruCache(cache_size)
+
+        for order, (zenoh_key, listener) in enumerate(listeners.items()):
+            if WILDCARD_CHUNK not in zenoh_key and "$" not in zenoh_key:
+                self.exact[zenoh_key] = listener
+                continue
+            chunks = zenoh_key.split("/")
+            if any(chunk != WILDCARD_CHUNK and ("*" in chunk or "$" in chunk) for chunk in chunks):
+                self.complex.append((order, KeyExpr(zenoh_key), listener))
+                continue
+            node = self.trie
+            for chunk in chunks:
+                node = node.children.setdefault(chunk, _TrieNode())
+            node.entry = (order, listener)
+
+    def lookup(self, zenoh_key: str) -> Optional[UListener]:
+        listener = self.cache.get(zenoh_key)
+        if listener is not MISSING:
+            return listener
+
+        if WILDCARD_CHUNK in zenoh_key or "$" in zenoh_key:
+            listener = self._scan(zenoh_key)
+        else:
+            listener = self.exact.get(zenoh_key)
+            if listener is None:
+                listener = self._match(zenoh_key)
+
+        self.cache.put(zenoh_key, listener)
+        return listener
+
+    def _match(self, zenoh_key: str) -> Optional[UListener]:
+        best: Optional[Tuple[int, UListener]] = None
+        nodes = [self.trie]
+        for chunk in zenoh_key.split("/"):
+            next_nodes = []
+            for node in nodes:
+                child = node.children.get(chunk)
+                if child is not None:
+                    next_nodes.append(child)
+                child = node.children.get(WILDCARD_CHUNK)
+                if child is not None:
+                    next_nodes.append(child)
+            if not next_nodes:
+                break
+            nodes = next_nodes
+        else:
+            for node in nodes:
+                if node.entry is not None and (best is None or node.entry[0] < best[0]):
+                    best = node.entry
+
+        if self.complex:
+            keyexpr = KeyExpr(zenoh_key)
+            for order, saved_keyexpr, listener in self.complex:
+                if (best is None or order < best[0]) and keyexpr.intersects(saved_keyexpr):
+                    best = (order, listener)
+                    break
+        return best[1] if best is not None else None
+
+    def _scan(self, zenoh_key: str) -> Optional[UListener]:
+        # The key itself contains wildcards, intersect it with every registered key in registration order
+        keyexpr = KeyExpr(zenoh_key)
+        for saved_zenoh_key, listener in self.listeners.items():
+            if keyexpr.intersects(KeyExpr(saved_zenoh_key)):
+                return listener
+        return None
+
+
+class ResponseListenerIndex:
+    """
+    Resolves the zenoh key of an outgoing request to the response listener registered for it.
+
+    A listener registered for the exact key wins; otherwise the earliest registered listener whose key intersects
+    is returned. Resolved keys are kept in a bounded LRU cache.
+
+    The index is copy-on-write: :meth:`rebuild` publishes a new immutable snapshot (with an empty cache), so
+    :meth:`lookup` never takes the lock protecting the registrations. Calls to :meth:`rebuild` must be serialized
+    by the caller.
+    """
+
+    def __init__(self, cache_size: int = DEFAULT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._snapshot = _Snapshot({}, cache_size)
+
+    def rebuild(self, listeners: Dict[str, UListener]) -> None:
+        """
+        Replace the indexed listeners.
+
+        :param listeners: The response listeners keyed by zenoh key, in registration order. The dict is copied.
+        """
+        self._snapshot = _Snapshot(dict(listeners), self.cache_size)
+
+    def lookup(self, zenoh_key: str) -> Optional[UListener]:
+        """
+        :param zenoh_key: The zenoh key of the request.
+        :return: The response listener, or None if no registered key intersects.
+        """
+        return self._snapshot.lookup(zenoh_key)
+
+    @property
+    def cache(self) -> LruCache:
+        return self._snapshot.cache
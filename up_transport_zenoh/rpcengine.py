@@ -0,0 +1,425 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Future
+from functools import partial
+from threading import Lock
+from typing import Dict, Hashable, List, Optional, Tuple
+
+import zenoh
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.uuid.factory.uuidfactory import Factories
+from uprotocol.uuid.serializer.uuidserializer import UuidSerializer
+from uprotocol.v1.uattributes_pb2 import UAttributes
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.umessage_pb2 import UMessage
+from zenoh import Reply, Session
+
+from up_transport_zenoh.deadlinescheduler import DeadlineScheduler, DeadlineTimer
+from up_transport_zenoh.listenerdispatcher import ListenerDispatcher
+from up_transport_zenoh.metrics import RPC_HEDGED, ZENOH_GET, TransportMetrics
+from up_transport_zenoh.payloadcodec import decompress_payload
+from up_transport_zenoh.qospolicy import QosSettings
+from up_transport_zenoh.responsecache import ResponseCache, method_key
+from up_transport_zenoh.rpcpolicy import REPLIER_PARAMETER, ReplierSelection, ReplierSelector, RpcPolicy
+from up_transport_zenoh.zenohutils import ZenohUtils
+
+# Used when the request doesn't carry a ttl, same as the default of uprotocol's CallOptions
+DEFAULT_RPC_TTL_MS: int = 10000
+
+# Zenoh keeps the query open slightly longer than the request ttl, so that expiry is always reported by the
+# deadline scheduler and an early end of the query means that nobody replied
+QUERY_TIMEOUT_GRACE: float = 0.1
+
+
+class PendingRequest:
+    __slots__ = (
+        "attributes",
+        "listener",
+        "future",
+        "deadline",
+        "timer",
+        "sent_at",
+        "cache_key",
+        "policy",
+        "key",
+        "get",
+        "queries",
+        "replier",
+        "hedge_timer",
+        "loop",
+    )
+
+    def __init__(self, attributes: UAttributes, listener: Optional[UListener], deadline: float):
+        self.attributes = attributes
+        self.listener = listener
+        self.future: Future = Future()
+        self.deadline = deadline
+        self.timer: Optional[DeadlineTimer] = None
+        # Wall clock time the request was sent, only tracked with metrics
+        self.sent_at = 0.0
+        # Set for the requests of the methods cached by the response cache
+        self.cache_key: Optional[Hashable] = None
+        self.policy = RpcPolicy.DEFAULT
+        self.key = ""
+        # session.get with the arguments of the request bound, to send it again
+        self.get = None
+        # The number of queries of the request in flight, more than one once hedged
+        self.queries = 0
+        # The server selected for the first query
+        self.replier: Optional[str] = None
+        self.hedge_timer: Optional[DeadlineTimer] = None
+        # The loop the request was sent from, the response listener runs on it
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+class RpcEngine:
+    """
+    Correlates the RPC requests sent with ``session.get`` with their replies.
+
+    Replies are pushed by zenoh to a callback running on the zenoh runtime, so no thread is started per request.
+    Each request is completed exactly once, by the first OK reply, by the deadline scheduler when its ttl
+    expires (``DEADLINE_EXCEEDED``), or when zenoh ends the query without any reply (``UNAVAILABLE``). Errors are
+    reported as response messages carrying the code in ``attributes.commstatus``, like any other response.
+
+    With a response cache, the requests of the cached methods are answered from the cache when possible. Otherwise
+    the first request sends the query and the identical requests sent before it completes wait for its response,
+    each completed under its own request id, or by its own deadline if it expires first. If the first request
+    fails without a response, e.g. because its ttl is shorter, the next identical request sends the query.
+
+    The RPC policy of a request selects its zenoh target and server, and whether it is hedged, see
+    :class:`RpcPolicy`. The reply times of the servers are tracked by ``selector``.
+    """
+
+    def __init__(
+        self,
+        dispatcher: ListenerDispatcher,
+        default_ttl_ms: int = DEFAULT_RPC_TTL_MS,
+        metrics: Optional[TransportMetrics] = None,
+        response_cache: Optional[ResponseCache] = None,
+    ):
+        self.dispatcher = dispatcher
+        self.default_ttl_ms = default_ttl_ms
+        self.metrics = metrics
+        self.response_cache = response_cache
+        self.selector = ReplierSelector()
+        self._pending: Dict[bytes, PendingRequest] = {}
+        # Cache key -> the request querying the network, followed by the identical requests waiting for it
+        self._flights: Dict[Hashable, List[bytes]] = {}
+        self._lock = Lock()
+        self._scheduler = DeadlineScheduler(name="up-zenoh-rpc-deadlines")
+        self._closed = False
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def get_ttl_ms(self, attributes: UAttributes) -> int:
+        # ttl is an optional field, an unset ttl must not turn into a zero timeout
+        if attributes.HasField("ttl") and attributes.ttl > 0:
+            return attributes.ttl
+        return self.default_ttl_ms
+
+    def send_request(
+        self,
+        session: Session,
+        zenoh_key: str,
+        payload: bytes,
+        attachment,
+        attributes: UAttributes,
+        listener: Optional[UListener] = None,
+        qos: QosSettings = QosSettings(),
+        policy: RpcPolicy = RpcPolicy.DEFAULT,
+    ) -> Future:
+        """
+        Send the request and track it until it completes.
+
+        :param session: The zenoh session to query.
+        :param zenoh_key: The zenoh key of the request.
+        :param payload: The request payload.
+        :param attachment: The request attachment, carrying the UAttributes.
+        :param attributes: The request UAttributes.
+        :param listener: Optional listener the response is dispatched to, on the loop running this call if any.
+        :param qos: The zenoh QoS of the request.
+        :param policy: The RPC policy of the method.
+        :return: A future completed with the response UMessage.
+        """
+        reqid = attributes.id.SerializeToString()
+        ttl = self.get_ttl_ms(attributes) / 1000
+        pending = PendingRequest(attributes, listener, time.monotonic() + ttl)
+        pending.policy = policy
+        pending.key = zenoh_key
+        pending.get = partial(
+            session.get,
+            priority=ZenohUtils.map_zenoh_priority(attributes.priority),
+            congestion_control=qos.congestion_control,
+            express=qos.express,
+            attachment=attachment,
+            payload=payload,
+        )
+        if listener is not None:
+            try:
+                pending.loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Sent from a thread, the listener runs on its dispatcher loop
+                pass
+        cache = self.response_cache
+        if cache is not None:
+            pending.cache_key = cache.key(attributes.sink, payload, attributes.payload_format)
+        cached = None
+        coalesced = False
+        metrics = self.metrics
+        if metrics is not None:
+            pending.sent_at = time.time()
+        with self._lock:
+            if self._closed:
+                raise UStatusError.from_code_message(code=UCode.FAILED_PRECONDITION, message="The RPC engine is closed")
+            if reqid in self._pending:
+                raise UStatusError.from_code_message(code=UCode.ALREADY_EXISTS, message="Duplicated request found")
+            if pending.cache_key is not None:
+                cached = cache.get(pending.cache_key)
+            # Complete the request before publishing it, a follower may have to query as soon as it is in its
+            # flight. The scheduler isn't closed while the engine is open, and runs the timers without this lock
+            if cached is None:
+                pending.timer = self._scheduler.schedule(ttl, lambda: self._fail(reqid, UCode.DEADLINE_EXCEEDED))
+            self._pending[reqid] = pending
+            if pending.cache_key is not None and cached is None:
+                flight = self._flights.setdefault(pending.cache_key, [])
+                flight.append(reqid)
+                coalesced = len(flight) > 1
+                if coalesced:
+                    cache.coalesced += 1
+
+        if cached is not None:
+            self._complete(reqid, _response_for(attributes, cached))
+            return pending.future
+        if coalesced:
+            # Queries only if the request it waits for fails locally, see _hand_over
+            return pending.future
+
+        if policy.selection is not ReplierSelection.NONE:
+            pending.replier = self.selector.select(method_key(attributes.sink), policy.selection)
+        if metrics is not None:
+            start = time.perf_counter()
+        try:
+            self._query(reqid, pending, pending.replier)
+        except Exception as e:
+            self._hand_over(pending, reqid)
+            self._take(reqid)
+            self._end_flight(pending, reqid)
+            msg = f"Unable to send rpc request with Zenoh: {e}"
+            logging.debug(msg)
+            raise UStatusError.from_code_message(code=UCode.INTERNAL, message=msg)
+
+        if metrics is not None:
+            metrics.record(ZENOH_GET, time.perf_counter() - start)
+        if policy.hedge_delay is not None and policy.hedge_delay < ttl:
+            try:
+                pending.hedge_timer = self._scheduler.schedule(policy.hedge_delay, lambda: self._hedge(reqid))
+            except RuntimeError:
+                # Closed meanwhile, the request is cancelled
+                pass
+        return pending.future
+
+    def _query(self, reqid: bytes, pending: PendingRequest, replier: Optional[str]) -> None:
+        # Send one query of the request, to the selected server if any
+        policy = pending.policy
+        selector = pending.key
+        target = policy.target.query_target
+        observed = None
+        if policy.selection is not ReplierSelection.NONE:
+            # Every server gets the query, only the selected one, or all if none is, answers it
+            selector = f"{selector}?{REPLIER_PARAMETER}={replier or ''}"
+            target = zenoh.QueryTarget.ALL
+            observed = (method_key(pending.attributes.sink), time.monotonic())
+        with self._lock:
+            pending.queries += 1
+        try:
+            pending.get(
+                selector,
+                zenoh.handlers.Callback(
+                    lambda reply: self._on_reply(reqid, reply, observed), lambda: self._on_done(reqid, replier)
+                ),
+                target=target,
+                # The first reply completes the request, the others are only measured
+                consolidation=zenoh.ConsolidationMode.NONE,
+                timeout=max(pending.deadline - time.monotonic(), 0) + QUERY_TIMEOUT_GRACE,
+            )
+        except Exception:
+            with self._lock:
+                pending.queries -= 1
+            raise
+
+    def _hedge(self, reqid: bytes) -> None:
+        # No reply yet, send the request again, to another server if possible
+        pending = self._pending.get(reqid)
+        if pending is None:
+            return
+        replier = None
+        selection = pending.policy.selection
+        if selection is not ReplierSelection.NONE:
+            exclude = (pending.replier,) if pending.replier else ()
+            replier = self.selector.select(method_key(pending.attributes.sink), selection, exclude, discover=False)
+        try:
+            self._query(reqid, pending, replier)
+        except Exception as e:
+            logging.debug(f"Unable to send the hedged rpc request with Zenoh: {e}")
+            return
+        if self.metrics is not None:
+            self.metrics.increment(RPC_HEDGED)
+
+    def close(self) -> None:
+        """
+        Stop the deadline scheduler and complete every pending request with ``CANCELLED``.
+        """
+        with self._lock:
+            self._closed = True
+            reqids = list(self._pending)
+        self._scheduler.close()
+        for reqid in reqids:
+            self._fail(reqid, UCode.CANCELLED)
+
+    def _on_reply(self, reqid: bytes, reply: Reply, observed: Optional[Tuple[Hashable, float]] = None) -> None:
+        sample = reply.ok
+        if sample is None:
+            logging.debug(f"Error while parsing Zenoh reply: {reply.err}")
+            return
+
+        attachment = sample.attachment
+        if attachment is None:
+            logging.debug("Unable to get the attachment")
+            return
+        message = UMessage()
+        try:
+            info = ZenohUtils.decode_attachment(attachment, message.attributes)
+            payload = decompress_payload(bytes(sample.payload) if sample.payload else b'', info.codec)
+        except UStatusError as error:
+            logging.debug(error.get_message())
+            return
+        if observed is not None and info.replier is not None:
+            # Late replies are measured too, they tell how fast the other servers are
+            method, sent = observed
+            self.selector.record(method, info.replier, time.monotonic() - sent)
+
+        if payload:
+            message.payload = payload
+        self._complete(reqid, message)
+
+    def _on_done(self, reqid: bytes, replier: Optional[str] = None) -> None:
+        # A query ended before the request expired and no reply completed the request
+        pending = self._pending.get(reqid)
+        if pending is None:
+            return
+        with self._lock:
+            pending.queries -= 1
+            if pending.queries > 0:
+                # The hedged query may still get a reply
+                return
+        if replier:
+            # The selected server is gone, ask every server instead
+            self.selector.forget(method_key(pending.attributes.sink), replier)
+            try:
+                self._query(reqid, pending, None)
+                return
+            except Exception as e:
+                logging.debug(f"Unable to send rpc request with Zenoh: {e}")
+        # The server drops the queries it didn't answer within the ttl, ending them as the request expires
+        expired = time.monotonic() >= pending.deadline
+        self._fail(reqid, UCode.DEADLINE_EXCEEDED if expired else UCode.UNAVAILABLE)
+
+    def _fail(self, reqid: bytes, code: UCode) -> None:
+        pending = self._pending.get(reqid)
+        if pending is None:
+            return
+        logging.debug(f"RPC request failed with {UCode.Name(code)}")
+        self._hand_over(pending, reqid)
+        self._complete(reqid, UMessageBuilder.response_for_request(pending.attributes).with_commstatus(code).build())
+
+    def _hand_over(self, pending: PendingRequest, reqid: bytes) -> None:
+        # Only the replies of the servers are shared: when the request querying for its followers fails locally,
+        # e.g. its shorter ttl expired, the next follower queries instead, within its own ttl
+        if pending.cache_key is None:
+            return
+        with self._lock:
+            flight = self._flights.get(pending.cache_key)
+            if self._closed or flight is None or flight[0] != reqid:
+                return
+            followers = [follower for follower in flight[1:] if follower in self._pending]
+            if not followers:
+                return
+            self._flights[pending.cache_key] = followers
+            leader = self._pending[followers[0]]
+        if leader.policy.selection is not ReplierSelection.NONE:
+            leader.replier = self.selector.select(method_key(leader.attributes.sink), leader.policy.selection)
+        try:
+            self._query(followers[0], leader, leader.replier)
+        except Exception as e:
+            logging.debug(f"Unable to send rpc request with Zenoh: {e}")
+            self._fail(followers[0], UCode.INTERNAL)
+
+    def _complete(self, reqid: bytes, message: UMessage) -> None:
+        pending = self._take(reqid)
+        if pending is None:
+            # Already completed
+            return
+        followers = self._end_flight(pending, reqid)
+        if followers is not None:
+            self.response_cache.put(pending.cache_key, message)
+        metrics = self.metrics
+        if metrics is not None:
+            request_id = UuidSerializer.serialize(pending.attributes.id)
+            metrics.rpc_completed(request_id, pending.sent_at, time.time(), message.attributes.commstatus)
+        pending.future.set_result(message)
+        if pending.listener is not None:
+            self.dispatcher.dispatch_to(pending.listener, message, pending.loop)
+        for follower in followers or ():
+            waiting = self._pending.get(follower)
+            if waiting is not None:
+                self._complete(follower, _response_for(waiting.attributes, message))
+
+    def _end_flight(self, pending: PendingRequest, reqid: bytes) -> Optional[List[bytes]]:
+        # The identical requests waiting for this one, None if this one didn't query the network
+        if pending.cache_key is None:
+            return None
+        with self._lock:
+            flight = self._flights.get(pending.cache_key)
+            if flight is None or flight[0] != reqid:
+                return None
+            del self._flights[pending.cache_key]
+        return flight[1:]
+
+    def _take(self, reqid: bytes) -> Optional[PendingRequest]:
+        with self._lock:
+            pending = self._pending.pop(reqid, None)
+        if pending is not None:
+            if pending.timer is not None:
+                pending.timer.cancel()
+            if pending.hedge_timer is not None:
+                pending.hedge_timer.cancel()
+        return pending
+
+
+def _response_for(attributes: UAttributes, response: UMessage) -> UMessage:
+    # The response to an identical request, addressed to this one
+    message = UMessage()
+    message.CopyFrom(response)
+    message.attributes.id.CopyFrom(Factories.UPROTOCOL.create())
+    message.attributes.reqid.CopyFrom(attributes.id)
+    message.attributes.sink.CopyFrom(attributes.source)
+    return message
@@ -0,0 +1,183 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import itertools
+from dataclasses import dataclass
+from enum import Enum
+from threading import Lock
+from typing import Collection, Dict, Hashable, Optional
+
+import zenoh
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.responsecache import method_key
+
+# Query parameter asking the servers to identify themselves in their reply. When it names a server, the other
+# servers drop the query.
+REPLIER_PARAMETER: str = "up_replier"
+
+# With a replier selection, one request in this many goes to every server, so that new servers are found and
+# the reply times of the others stay current
+DISCOVERY_INTERVAL: int = 20
+
+
+class RpcTarget(Enum):
+    # The queryable zenoh finds best, e.g. the closest one
+    BEST_MATCHING = "best_matching"
+    # Every matching queryable
+    ALL = "all"
+    # Every matching queryable declared complete
+    ALL_COMPLETE = "all_complete"
+
+    @property
+    def query_target(self) -> zenoh.QueryTarget:
+        if self is RpcTarget.ALL:
+            return zenoh.QueryTarget.ALL
+        if self is RpcTarget.ALL_COMPLETE:
+            return zenoh.QueryTarget.ALL_COMPLETE
+        return zenoh.QueryTarget.BEST_MATCHING
+
+
+class ReplierSelection(Enum):
+    # Let zenoh route the requests according to the target
+    NONE = "none"
+    # Take turns between the servers that replied so far
+    ROUND_ROBIN = "round_robin"
+    # Pick the server with the lowest smoothed reply time
+    LEAST_LATENCY = "least_latency"
+
+
+@dataclass(frozen=True)
+class RpcPolicy:
+    """
+    How the requests of a method are sent.
+
+    With a replier selection, each request names the server that should answer it, chosen among the servers
+    that replied before, and goes to every instance of the method: the others drop it. The first requests, and
+    one in :data:`DISCOVERY_INTERVAL` afterwards, name no server so that every instance answers and its reply time
+    is measured. If the selected server doesn't reply, it is forgotten and the request is sent again to all.
+    Servers running a version of the transport without selection answer every request.
+
+    :param target: The zenoh queryables a request is sent to, when no replier is selected.
+    :param hedge_delay: Send the request a second time if no reply arrived after this many seconds, to another
+                        server when a replier is selected, and take whichever reply arrives first. None disables
+                        hedging. It needs a replier selection or a target reaching every server: with
+                        ``BEST_MATCHING`` the second query would go back to the same server. A server that gets
+                        both queries runs its handler twice, so only hedge idempotent methods.
+    :param selection: How a server is selected among the instances of the method.
+    """
+
+    DEFAULT = None
+
+    target: RpcTarget = RpcTarget.BEST_MATCHING
+    hedge_delay: Optional[float] = None
+    selection: ReplierSelection = ReplierSelection.NONE
+
+    def __post_init__(self):
+        if self.hedge_delay is not None and self.hedge_delay <= 0:
+            raise ValueError("hedge_delay should be positive")
+        if (
+            self.hedge_delay is not None
+            and self.selection is ReplierSelection.NONE
+            and self.target is RpcTarget.BEST_MATCHING
+        ):
+            raise ValueError("hedge_delay needs a replier selection or a target other than BEST_MATCHING")
+
+
+RpcPolicy.DEFAULT = RpcPolicy()
+
+
+class RpcPolicies:
+    """
+    The RPC policies of the methods called through a transport, see the ``rpc_policies`` argument of
+    ``UPTransportZenoh``. Methods without a policy of their own use ``default``.
+
+    :param default: The policy of the other methods.
+    """
+
+    def __init__(self, default: RpcPolicy = RpcPolicy.DEFAULT):
+        self.default = default
+        self._policies: Dict[Hashable, RpcPolicy] = {}
+
+    def set(self, method: UUri, policy: RpcPolicy) -> None:
+        self._policies[method_key(method)] = policy
+
+    def remove(self, method: UUri) -> None:
+        self._policies.pop(method_key(method), None)
+
+    def for_method(self, method: UUri) -> RpcPolicy:
+        if not self._policies:
+            return self.default
+        return self._policies.get(method_key(method), self.default)
+
+
+class ReplierSelector:
+    """
+    Tracks the reply time of each server of each method, smoothed exponentially, and selects the server of the
+    next request.
+
+    :param smoothing: The weight of a new reply time in the smoothed one, from 0 to 1.
+    """
+
+    def __init__(self, smoothing: float = 0.2):
+        self.smoothing = smoothing
+        # method -> replier -> smoothed reply time in seconds
+        self._latencies: Dict[Hashable, Dict[str, float]] = {}
+        self._requests: Dict[Hashable, "itertools.count"] = {}
+        self._lock = Lock()
+
+    def record(self, method: Hashable, replier: str, latency: float) -> None:
+        """
+        :param method: The key of the method, see ``method_key``.
+        :param replier: The id of the server that replied.
+        :param latency: Its reply time in seconds.
+        """
+        with self._lock:
+            latencies = self._latencies.setdefault(method, {})
+            previous = latencies.get(replier)
+            latencies[replier] = latency if previous is None else previous + self.smoothing * (latency - previous)
+
+    def forget(self, method: Hashable, replier: str) -> None:
+        with self._lock:
+            self._latencies.get(method, {}).pop(replier, None)
+
+    def latencies(self, method: Hashable) -> Dict[str, float]:
+        """
+        :return: The smoothed reply time of each known server of the method, in seconds.
+        """
+        with self._lock:
+            return dict(self._latencies.get(method, {}))
+
+    def select(
+        self, method: Hashable, selection: ReplierSelection, exclude: Collection[str] = (), discover: bool = True
+    ) -> Optional[str]:
+        """
+        :param method: The key of the method.
+        :param selection: How to select the server.
+        :param exclude: Servers not to select, e.g. the one a hedged request was sent to first.
+        :param discover: Whether the request may be one of the discovery requests sent to every server.
+        :return: The id of the selected server, or None to send the request to every server.
+        """
+        with self._lock:
+            counter = self._requests.setdefault(method, itertools.count())
+            index = next(counter)
+            if discover and index % DISCOVERY_INTERVAL == 0:
+                return None
+            candidates = sorted(replier for replier in self._latencies.get(method, {}) if replier not in exclude)
+            if not candidates:
+                return None
+            if selection is ReplierSelection.LEAST_LATENCY:
+                latencies = self._latencies[method]
+                return min(candidates, key=lambda replier: latencies[replier])
+            return candidates[index % len(candidates)]
@@ -0,0 +1,114 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import json
+import logging
+import threading
+from typing import Callable, Dict, Hashable, List, Optional
+
+import zenoh
+from zenoh import Config, Session
+
+
+def config_key(config: Config) -> str:
+    """
+    The default key of a session in a :class:`SessionRegistry`: the configuration as JSON, without the zenoh
+    id, which is random unless set explicitly.
+
+    :param config: A zenoh configuration.
+    :return: Equal keys for equal configurations.
+    """
+    settings = json.loads(str(config))
+    settings.pop("id", None)
+    return json.dumps(settings, sort_keys=True)
+
+
+class SessionRegistry:
+    """
+    Shares zenoh sessions between the transports of a process, e.g. one transport per uEntity, instead of opening
+    a session per transport. The sessions are reference counted: :meth:`acquire` opens a session for a
+    configuration the first time only, and :meth:`release` closes it once every transport released it.
+
+    The transports of one session reach each other without going through the network. Use
+    ``UPTransportZenoh.new(config, source, share_session=True)`` to get a session from :data:`SESSIONS`, the
+    registry of the process.
+
+    :param open_session: Opens a session for a configuration.
+    """
+
+    def __init__(self, open_session: Callable[[Config], Session] = zenoh.open):
+        self._open_session = open_session
+        self._lock = threading.Lock()
+        # key -> [session, number of holders]
+        self._sessions: Dict[Hashable, List] = {}
+        # id of the session -> key
+        self._keys: Dict[int, Hashable] = {}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def acquire(self, config: Config, key: Optional[Hashable] = None) -> Session:
+        """
+        Get the session of a configuration, opening it if needed. Release it with :meth:`release`.
+
+        :param config: The zenoh configuration of the session.
+        :param key: Identifies the session, defaults to :func:`config_key`.
+        :return: The session.
+        """
+        if key is None:
+            key = config_key(config)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                # Opened under the lock so that concurrent callers get the same session
+                entry = self._sessions[key] = [self._open_session(config), 0]
+                self._keys[id(entry[0])] = key
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, session: Session) -> bool:
+        """
+        Give a session back, closing it if it has no holder left.
+
+        :param session: A session returned by :meth:`acquire`.
+        :return: True if the session was closed.
+        """
+        with self._lock:
+            key = self._keys.get(id(session))
+            if key is None:
+                return False
+            entry = self._sessions[key]
+            entry[1] -= 1
+            if entry[1] > 0:
+                return False
+            del self._sessions[key]
+            del self._keys[id(session)]
+        try:
+            session.close()
+        except Exception as e:
+            logging.debug(f"Unable to close the Zenoh session: {e}")
+        return True
+
+    def holders(self, session: Session) -> int:
+        """
+        :param session: A session.
+        :return: The number of holders of the session, 0 if it isn't in the registry.
+        """
+        with self._lock:
+            key = self._keys.get(id(session))
+            return self._sessions[key][1] if key is not None else 0
+
+
+# The registry of the process
+SESSIONS = SessionRegistry()
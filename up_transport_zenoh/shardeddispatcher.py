@@ -0,0 +1,100 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import Future
+from typing import Callable, Coroutine, Hashable, Optional
+
+from uprotocol.transport.ulistener import UListener
+from uprotocol.v1.umessage_pb2 import UMessage
+
+from up_transport_zenoh.listenerdispatcher import ListenerDispatcher
+from up_transport_zenoh.metrics import TransportMetrics
+
+
+def source_shard_key(message: UMessage) -> Hashable:
+    """
+    The default shard key: the source UUri of the message.
+    """
+    source = message.attributes.source
+    return source.authority_name, source.ue_id, source.ue_version_major, source.resource_id
+
+
+class ShardedDispatcher(ListenerDispatcher):
+    """
+    Spreads the received messages over a pool of ``num_workers`` workers, each running an event loop in a
+    thread of its own. The worker of a message is picked by hashing its shard key, the source UUri by default:
+    the listener coroutines of one source are started in the order the messages were received, while
+    independent sources are handled in parallel.
+
+    The order holds up to the first ``await`` of a listener: the coroutines of a worker then run concurrently,
+    so that a listener waiting e.g. for the response of a nested RPC doesn't hold the worker. Listeners that
+    need the messages handled one at a time across ``await`` keep their own lock. The parallelism pays off for
+    listeners that release the GIL, waiting on I/O or running native code.
+
+    Pass it to the transport to dispatch the publish, notification and request listeners this way::
+
+        transport = UPTransportZenoh.new(config, source, dispatcher=ShardedDispatcher(4))
+
+    Coroutines submitted without a message, and the listeners wrapped in a ``QueuedListener``, run on a worker
+    bound to the listener as with ``ListenerDispatcher.owned``.
+
+    :param num_workers: The number of workers. Defaults to the number of CPUs.
+    :param shard_key: Returns the key of a message, messages with equal keys are handled in order.
+    :param metrics: Optional metrics hook.
+    """
+
+    def __init__(
+        self,
+        num_workers: Optional[int] = None,
+        shard_key: Callable[[UMessage], Hashable] = source_shard_key,
+        metrics: Optional[TransportMetrics] = None,
+    ):
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        if num_workers < 1:
+            raise ValueError("A sharded dispatcher needs at least one worker")
+        super().__init__(num_loops=num_workers, metrics=metrics)
+        self.shard_key = shard_key
+
+    @property
+    def num_workers(self) -> int:
+        return self._num_loops
+
+    def shard_of(self, message: UMessage) -> int:
+        """
+        :param message: A received message.
+        :return: The index of the worker handling the message.
+        """
+        return hash(self.shard_key(message)) % self._num_loops
+
+    def submit(self, listener: UListener, coroutine: Coroutine, message: Optional[UMessage] = None) -> Optional[Future]:
+        if message is None:
+            return super().submit(listener, coroutine)
+        try:
+            index = self.shard_of(message)
+        except Exception as e:
+            coroutine.close()
+            logging.debug(f"Unable to compute the shard key of the message: {e}")
+            return None
+        # The loop starts the coroutines submitted to it first-in first-out
+        return self._schedule(self._instrument(coroutine), self._worker_loop(index))
+
+    def _worker_loop(self, index: int) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            while len(self._owned_loops) < self._num_loops:
+                self._owned_loops.append(self._spawn_loop())
+            return self._owned_loops[index]
@@ -0,0 +1,193 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import logging
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Tuple, Union
+
+from uprotocol.transport.ulistener import UListener
+from zenoh import Sample, Subscriber
+
+
+class SharedSubscription:
+    """
+    One zenoh subscriber and the listeners of its key expression. ``listeners`` is replaced, never mutated, so
+    the subscriber callback reads it without locking.
+    """
+
+    __slots__ = ("key_expr", "subscriber", "listeners")
+
+    def __init__(self, key_expr: str):
+        self.key_expr = key_expr
+        self.subscriber = None
+        self.listeners: Tuple[UListener, ...] = ()
+
+
+class SubscriptionMultiplexer:
+    """
+    Keeps one zenoh subscriber per key expression, shared by all the listeners of that key.
+
+    Each sample is handed once to ``on_sample`` together with the listeners registered at that time, so that it
+    is decoded once and fanned out. The subscriber is reference counted by its listeners: it is declared with the
+    first listener and undeclared when the last one is removed.
+
+    :param declare: Declares a zenoh subscriber on a key expression with a sample callback.
+    :param on_sample: Handles the samples of a key expression for its listeners.
+    """
+
+    def __init__(
+        self,
+        declare: Callable[[str, Callable[[Sample], None]], Subscriber],
+        on_sample: Callable[[Tuple[UListener, ...], Sample], None],
+    ):
+        self._declare = declare
+        self._on_sample = on_sample
+        self._subscriptions: Dict[str, SharedSubscription] = {}
+        self._lock = Lock()
+
+    def add(self, key_expr: str, listener: UListener) -> bool:
+        """
+        Add a listener to a key expression, declaring its subscriber if it is the first listener.
+
+        :param key_expr: The zenoh key expression.
+        :param listener: The listener.
+        :return: False if the listener was registered already.
+        :raises Exception: If the subscriber couldn't be declared.
+        """
+        with self._lock:
+            subscription = self._subscriptions.get(key_expr)
+            if subscription is None:
+                subscription = self._subscribe(key_expr)
+            elif listener in subscription.listeners:
+                return False
+            subscription.listeners = subscription.listeners + (listener,)
+            return True
+
+    def add_many(self, entries: Iterable[Tuple[str, UListener]]) -> List[Union[bool, Exception]]:
+        """
+        Add listeners in bulk, under a single lock acquisition. The entries of a key expression are merged, so
+        that its subscriber is declared at most once and its listeners replaced once.
+
+        :param entries: The key expressions and their listeners.
+        :return: For each entry, in order: True if the listener was added, False if it was registered already,
+                 or the exception raised when declaring the subscriber of its key.
+        """
+        entries = list(entries)
+        results: List[Union[bool, Exception]] = [False] * len(entries)
+        by_key: Dict[str, List[int]] = {}
+        for index, (key_expr, _) in enumerate(entries):
+            by_key.setdefault(key_expr, []).append(index)
+
+        with self._lock:
+            for key_expr, indexes in by_key.items():
+                subscription = self._subscriptions.get(key_expr)
+                if subscription is None:
+                    try:
+                        subscription = self._subscribe(key_expr)
+                    except Exception as e:
+                        for index in indexes:
+                            results[index] = e
+                        continue
+                listeners = list(subscription.listeners)
+                for index in indexes:
+                    listener = entries[index][1]
+                    if listener not in listeners:
+                        listeners.append(listener)
+                        results[index] = True
+                subscription.listeners = tuple(listeners)
+        return results
+
+    def remove(self, key_expr: str, listener: UListener) -> bool:
+        """
+        Remove a listener from a key expression, undeclaring the subscriber if it was the last listener.
+
+        :param key_expr: The zenoh key expression.
+        :param listener: The listener.
+        :return: False if the listener wasn't registered.
+        """
+        with self._lock:
+            subscription = self._subscriptions.get(key_expr)
+            if subscription is None or listener not in subscription.listeners:
+                return False
+            subscription.listeners = tuple(other for other in subscription.listeners if other is not listener)
+            if subscription.listeners:
+                return True
+            del self._subscriptions[key_expr]
+        _undeclare(subscription)
+        return True
+
+    def remove_many(self, entries: Iterable[Tuple[str, UListener]]) -> List[bool]:
+        """
+        Remove listeners in bulk, under a single lock acquisition, undeclaring the subscribers left without
+        listeners.
+
+        :param entries: The key expressions and their listeners.
+        :return: For each entry, in order, False if the listener wasn't registered.
+        """
+        results = []
+        unused = []
+        with self._lock:
+            for key_expr, listener in entries:
+                subscription = self._subscriptions.get(key_expr)
+                if subscription is None or listener not in subscription.listeners:
+                    results.append(False)
+                    continue
+                subscription.listeners = tuple(other for other in subscription.listeners if other is not listener)
+                if not subscription.listeners:
+                    del self._subscriptions[key_expr]
+                    unused.append(subscription)
+                results.append(True)
+        for subscription in unused:
+            _undeclare(subscription)
+        return results
+
+    def listeners(self, key_expr: str) -> Tuple[UListener, ...]:
+        subscription = self._subscriptions.get(key_expr)
+        return subscription.listeners if subscription is not None else ()
+
+    def listener_counts(self) -> Dict[str, int]:
+        """
+        :return: The number of listeners of each subscribed key expression.
+        """
+        return {key_expr: len(subscription.listeners) for key_expr, subscription in list(self._subscriptions.items())}
+
+    def close(self) -> None:
+        """
+        Undeclare every subscriber.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.values())
+            self._subscriptions.clear()
+        for subscription in subscriptions:
+            subscription.listeners = ()
+            _undeclare(subscription)
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def _subscribe(self, key_expr: str) -> SharedSubscription:
+        # Called with the lock held
+        subscription = SharedSubscription(key_expr)
+        subscription.subscriber = self._declare(
+            key_expr, lambda sample: self._on_sample(subscription.listeners, sample)
+        )
+        self._subscriptions[key_expr] = subscription
+        return subscription
+
+
+def _undeclare(subscription: SharedSubscription) -> None:
+    try:
+        subscription.subscriber.undeclare()
+    except Exception as e:
+        logging.debug(f"Unable to undeclare the subscriber of {subscription.key_expr}: {e}")
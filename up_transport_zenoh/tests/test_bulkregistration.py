@@ -0,0 +1,97 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import unittest
+
+import pytest
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.tests.testutils import METHOD, SOURCE, Collector, EchoServer, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+from up_transport_zenoh.zenohutils import ZenohUtils
+
+
+def topic(index: int) -> UUri:
+    return UUri(authority_name="vehicle1", ue_id=0x18, ue_version_major=1, resource_id=0x8000 + index)
+
+
+def key(uri: UUri) -> str:
+    return ZenohUtils.to_zenoh_key_string(SOURCE.authority_name, uri, UriFactory.ANY)
+
+
+class TestBulkRegistration(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.transport = UPTransportZenoh.new(create_config(), SOURCE)
+
+    async def asyncTearDown(self):
+        self.transport.close()
+
+    @pytest.mark.asyncio
+    async def test_register_and_unregister(self):
+        first, second, responses = Collector(), Collector(), Collector()
+        server = EchoServer(self.transport)
+        entries = [(topic(index), first) for index in range(1, 51)]
+        entries += [(topic(1), second), (topic(1), second)]
+        entries += [(UriFactory.ANY, server, METHOD), (METHOD, responses, SOURCE)]
+        # Not a valid combination of filters
+        entries += [(UriFactory.ANY, first, UUri(resource_id=0x8001))]
+
+        statuses = await self.transport.register_listeners(entries)
+        assert [status.code for status in statuses[:-1]] == [UCode.OK] * (len(entries) - 1)
+        assert statuses[-1].code == UCode.INTERNAL
+        # The listeners of a key share its subscriber
+        assert len(self.transport.subscriptions) == 50
+        assert self.transport.subscriptions.listeners(key(topic(1))) == (first, second)
+
+        await self.transport.send(UMessageBuilder.publish(topic(1)).build())
+        await asyncio.wait_for(first.received.get(), 2)
+        await asyncio.wait_for(second.received.get(), 2)
+        await asyncio.sleep(0.1)
+        # Registered twice, notified once
+        assert second.received.empty()
+
+        await self.transport.send(UMessageBuilder.request(SOURCE, METHOD, 1000).build())
+        response = await asyncio.wait_for(responses.received.get(), 2)
+        assert response.attributes.commstatus == UCode.OK
+
+        statuses = await self.transport.unregister_listeners(entries[:-1])
+        codes = [status.code for status in statuses]
+        # The duplicate entry was removed by the first one
+        assert codes[:51] == [UCode.OK] * 51
+        assert codes[51] == UCode.NOT_FOUND
+        assert codes[52:] == [UCode.OK, UCode.OK]
+        assert len(self.transport.subscriptions) == 0
+        assert len(self.transport.queryable_map) == 0
+        assert len(self.transport.rpc_callback_map) == 0
+
+        statuses = await self.transport.unregister_listeners(entries[:1])
+        assert statuses[0].code == UCode.NOT_FOUND
+
+    @pytest.mark.asyncio
+    async def test_matches_single_registration(self):
+        listener = Collector()
+        await self.transport.register_listener(topic(1), listener)
+        # Already registered through register_listener
+        statuses = await self.transport.register_listeners([(topic(1), listener), (topic(2), listener)])
+        assert [status.code for status in statuses] == [UCode.OK, UCode.OK]
+        assert self.transport.subscriptions.listeners(key(topic(1))) == (listener,)
+        assert (await self.transport.unregister_listener(topic(2), listener)).code == UCode.OK
+
+
+if __name__ == "__main__":
+    unittest.main()
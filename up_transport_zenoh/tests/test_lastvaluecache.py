@@ -0,0 +1,120 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import unittest
+
+import pytest
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.lastvaluecache import LastValueCache, last_value_key
+from up_transport_zenoh.tests.testutils import SOURCE, Collector, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+GEAR = UUri(authority_name="vehicle1", ue_id=0x18, ue_version_major=1, resource_id=0x8001)
+DOORS = UUri(authority_name="vehicle1", ue_id=0x19, ue_version_major=1, resource_id=0x8001)
+# The topic 0x8001 of every uEntity
+ANY_ENTITY = UUri(authority_name="vehicle1", ue_id=0xFFFF, ue_version_major=1, resource_id=0x8001)
+
+
+class FakeQueryable:
+    def __init__(self):
+        self.undeclared = False
+
+    def undeclare(self):
+        self.undeclared = True
+
+
+class TestLastValueCache(unittest.IsolatedAsyncioTestCase):
+    def test_depth_and_eviction(self):
+        declared = {}
+
+        def declare(key_expr, callback):
+            declared[key_expr] = FakeQueryable()
+            return declared[key_expr]
+
+        cache = LastValueCache(2, declare, max_keys=2)
+        for index in range(3):
+            assert cache.put("a", b"%d" % index, [b"a"])
+        assert [payload for payload, _ in cache.get("a")] == [b"1", b"2"]
+        assert list(declared) == [last_value_key("a")]
+
+        cache.put("b", b"b", [])
+        cache.put("a", b"3", [])
+        cache.put("c", b"c", [])
+        # b was published least recently
+        assert cache.get("b") == []
+        assert declared[last_value_key("b")].undeclared
+        assert len(cache) == 2
+
+        cache.close()
+        assert len(cache) == 0
+        assert all(queryable.undeclared for queryable in declared.values())
+
+    def test_declare_failure(self):
+        def declare(key_expr, callback):
+            raise RuntimeError("declare failed")
+
+        cache = LastValueCache(1, declare)
+        assert not cache.put("a", b"a", [])
+        assert cache.get("a") == []
+
+    def test_invalid_depth(self):
+        with pytest.raises(ValueError):
+            LastValueCache(0, lambda key_expr, callback: FakeQueryable())
+
+    @pytest.mark.asyncio
+    async def test_late_subscriber(self):
+        transport = UPTransportZenoh.new(create_config(), SOURCE, last_value_depth=2)
+        try:
+            for payload in (b"P", b"R", b"D"):
+                message = UMessageBuilder.publish(GEAR).build()
+                message.payload = payload
+                await transport.send(message)
+            with transport.declare_publisher(DOORS) as doors:
+                doors.publish(b"closed")
+
+            gear = Collector()
+            await transport.register_listener(GEAR, gear, last_value=True)
+            assert await gear.payloads(2) == [b"R", b"D"]
+
+            everything = Collector()
+            await transport.register_listener(ANY_ENTITY, everything, last_value=True)
+            assert sorted(await everything.payloads(3)) == [b"D", b"R", b"closed"]
+
+            # Registered without the option, the listener only gets the next messages
+            live = Collector()
+            await transport.register_listener(GEAR, live)
+            await asyncio.sleep(0.2)
+            assert live.received.empty()
+        finally:
+            transport.close()
+
+    @pytest.mark.asyncio
+    async def test_disabled_by_default(self):
+        transport = UPTransportZenoh.new(create_config(), SOURCE)
+        try:
+            assert transport.last_values is None
+            await transport.send(UMessageBuilder.publish(GEAR).build())
+            listener = Collector()
+            await transport.register_listener(GEAR, listener, last_value=True)
+            await asyncio.sleep(0.2)
+            assert listener.received.empty()
+        finally:
+            transport.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import unittest
+
+import pytest
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.umessage_pb2 import UMessage
+
+from up_transport_zenoh.tests.testutils import METHOD, SOURCE, TOPIC, SilentServer, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+
+class CountingListener(UListener):
+    def __init__(self):
+        self.count = 0
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        self.count += 1
+
+
+class SlowEchoServer(UListener):
+    def __init__(self, transport, delay: float = 0.0):
+        self.transport = transport
+        self.delay = delay
+        self.count = 0
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        self.count += 1
+        await asyncio.sleep(self.delay)
+        await self.transport.send(UMessageBuilder.response_for_request(umsg.attributes).build())
+
+
+class TestUnregister(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.transport = UPTransportZenoh.new(create_config(), SOURCE)
+
+    async def asyncTearDown(self):
+        self.transport.close()
+
+    @pytest.mark.asyncio
+    async def test_no_message_after_unregister(self):
+        listener = CountingListener()
+        await self.transport.register_listener(TOPIC, listener)
+        await self.transport.send(UMessageBuilder.publish(TOPIC).build())
+        await asyncio.sleep(0.1)
+        assert listener.count == 1
+
+        await self.transport.unregister_listener(TOPIC, listener)
+        await self.transport.send(UMessageBuilder.publish(TOPIC).build())
+        await asyncio.sleep(0.2)
+        assert listener.count == 1
+
+    @pytest.mark.asyncio
+    async def test_no_request_after_unregister(self):
+        server = SlowEchoServer(self.transport)
+        await self.transport.register_listener(UriFactory.ANY, server, METHOD)
+        await self.transport.invoke(UMessageBuilder.request(SOURCE, METHOD, 1000).build())
+        assert server.count == 1
+
+        assert (await self.transport.unregister_listener(UriFactory.ANY, server, METHOD)).code == UCode.OK
+        with pytest.raises(UStatusError) as error:
+            await self.transport.invoke(UMessageBuilder.request(SOURCE, METHOD, 1000).build())
+        # Nobody answers the query anymore
+        assert error.value.get_code() == UCode.UNAVAILABLE
+        assert server.count == 1
+
+
+class TestClose(unittest.IsolatedAsyncioTestCase):
+    @pytest.mark.asyncio
+    async def test_close(self):
+        transport = UPTransportZenoh.new(create_config(), SOURCE)
+        listener = CountingListener()
+        await transport.register_listener(TOPIC, listener)
+        await transport.register_listener(UriFactory.ANY, SilentServer(), METHOD)
+        pending = asyncio.ensure_future(transport.invoke(UMessageBuilder.request(SOURCE, METHOD, 5000).build()))
+        await asyncio.sleep(0.1)
+
+        transport.close()
+        with pytest.raises(UStatusError) as error:
+            await asyncio.wait_for(pending, 1)
+        assert error.value.get_code() == UCode.CANCELLED
+        assert len(transport.subscriptions) == 0
+        assert len(transport.queryable_map) == 0
+        assert len(transport.query_map) == 0
+        with pytest.raises(Exception):
+            transport.session.put("up/closed", b"")
+        # Idempotent
+        transport.close()
+
+    @pytest.mark.asyncio
+    async def test_send_after_close(self):
+        transport = UPTransportZenoh.new(create_config(), SOURCE)
+        transport.close()
+        for message in (UMessageBuilder.request(SOURCE, METHOD, 1000).build(), UMessageBuilder.publish(TOPIC).build()):
+            status = await transport.send(message)
+            assert status.code == UCode.FAILED_PRECONDITION
+        assert transport.rpc_engine.pending_count == 0
+        with pytest.raises(UStatusError) as error:
+            await transport.invoke(UMessageBuilder.request(SOURCE, METHOD, 1000).build())
+        assert error.value.get_code() == UCode.FAILED_PRECONDITION
+        with pytest.raises(UStatusError) as error:
+            transport.invoke_stream(UMessageBuilder.request(SOURCE, METHOD, 1000).build())
+        assert error.value.get_code() == UCode.FAILED_PRECONDITION
+        assert transport.rpc_engine.pending_count == 0
+
+    @pytest.mark.asyncio
+    async def test_register_after_close(self):
+        transport = UPTransportZenoh.new(create_config(), SOURCE)
+        transport.close()
+        listener = CountingListener()
+        status = await transport.register_listener(TOPIC, listener)
+        assert status.code == UCode.FAILED_PRECONDITION
+        statuses = await transport.register_listeners([(TOPIC, listener), (UriFactory.ANY, listener, METHOD)])
+        assert [status.code for status in statuses] == [UCode.FAILED_PRECONDITION] * 2
+        with pytest.raises(UStatusError) as error:
+            transport.subscribe(TOPIC)
+        assert error.value.get_code() == UCode.FAILED_PRECONDITION
+        # No loop was started for the listener
+        assert transport.dispatcher._owned_loops == []
+
+    @pytest.mark.asyncio
+    async def test_async_context_manager_drains_requests(self):
+        async with UPTransportZenoh.new(create_config(), SOURCE) as transport:
+            await transport.register_listener(UriFactory.ANY, SlowEchoServer(transport, delay=0.2), METHOD)
+            pending = asyncio.ensure_future(transport.invoke(UMessageBuilder.request(SOURCE, METHOD, 5000).build()))
+            await asyncio.sleep(0.05)
+
+        # The request received before closing was answered
+        response = await asyncio.wait_for(pending, 1)
+        assert response.attributes.commstatus == UCode.OK
+        assert transport.rpc_engine.pending_count == 0
+
+    def test_context_manager(self):
+        with UPTransportZenoh.new(create_config(), SOURCE) as transport:
+            transport.session.put("up/open", b"")
+        with pytest.raises(Exception):
+            transport.session.put("up/closed", b"")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import threading
+import unittest
+
+import pytest
+from uprotocol.transport.ulistener import UListener
+from uprotocol.v1.umessage_pb2 import UMessage
+
+from up_transport_zenoh.listenerdispatcher import ListenerDispatcher
+
+
+class RecordingListener(UListener):
+    def __init__(self):
+        self.messages = []
+        self.loops = set()
+        self.threads = set()
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        self.messages.append(umsg.payload)
+        self.loops.add(asyncio.get_running_loop())
+        self.threads.add(threading.current_thread())
+
+
+def dispatch_from_thread(dispatcher, listener, payloads):
+    futures = []
+
+    def run():
+        for payload in payloads:
+            futures.append(dispatcher.dispatch(listener, UMessage(payload=payload)))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    return futures
+
+
+class TestListenerDispatcher(unittest.IsolatedAsyncioTestCase):
+    @pytest.mark.asyncio
+    async def test_attached_to_running_loop(self):
+        dispatcher = ListenerDispatcher(attach=True)
+        listener = RecordingListener()
+        assert dispatcher.bind(listener) is asyncio.get_running_loop()
+
+        futures = dispatch_from_thread(dispatcher, listener, [b"1", b"2", b"3"])
+        await asyncio.gather(*[asyncio.wrap_future(future) for future in futures])
+
+        assert listener.messages == [b"1", b"2", b"3"]
+        assert listener.loops == {asyncio.get_running_loop()}
+        assert not dispatcher.owns_loops
+        dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_owned_loops(self):
+        dispatcher = ListenerDispatcher.owned(num_loops=2)
+        first = RecordingListener()
+        second = RecordingListener()
+        first_loop = dispatcher.bind(first)
+        second_loop = dispatcher.bind(second)
+        assert first_loop is not second_loop
+        assert first_loop is not asyncio.get_running_loop()
+
+        payloads = [str(i).encode() for i in range(100)]
+        for future in dispatch_from_thread(dispatcher, first, payloads):
+            future.result(timeout=5)
+        dispatch_from_thread(dispatcher, second, [b"x"])[0].result(timeout=5)
+
+        # Messages of one listener are handled in order, on the same loop
+        assert first.messages == payloads
+        assert first.loops == {first_loop}
+        assert second.loops == {second_loop}
+        assert len(first.threads) == 1
+
+        dispatcher.close()
+        assert first_loop.is_closed()
+        assert dispatcher.dispatch(RecordingListener(), UMessage()) is not None
+        dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_default_runs_while_application_loop_blocked(self):
+        dispatcher = ListenerDispatcher()
+        listener = RecordingListener()
+        loop = dispatcher.bind(listener)
+        assert loop is not asyncio.get_running_loop()
+        # Blocks the application loop until the listener ran
+        future = dispatch_from_thread(dispatcher, listener, [b"1"])[0]
+        future.result(timeout=5)
+        assert listener.loops == {loop}
+        dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_dispatch_to(self):
+        dispatcher = ListenerDispatcher()
+        listener = RecordingListener()
+        dispatcher.bind(listener)
+        future = dispatcher.dispatch_to(listener, UMessage(payload=b"response"), asyncio.get_running_loop())
+        await asyncio.wrap_future(future)
+        assert listener.loops == {asyncio.get_running_loop()}
+        # Without a loop to run on, the listener runs on its own loop
+        await asyncio.wrap_future(dispatcher.dispatch_to(listener, UMessage(), None))
+        assert len(listener.loops) == 2
+        dispatcher.close()
+
+    def test_fallback_loop_without_running_loop(self):
+        dispatcher = ListenerDispatcher()
+        listener = RecordingListener()
+        loop = dispatcher.bind(listener)
+        dispatcher.dispatch(listener, UMessage(payload=b"a")).result(timeout=5)
+        assert listener.loops == {loop}
+        dispatcher.close()
+        assert loop.is_closed()
+
+    def test_pinned_loop(self):
+        loop = asyncio.new_event_loop()
+        dispatcher = ListenerDispatcher(loop)
+        assert dispatcher.bind(RecordingListener()) is loop
+        dispatcher.close()
+        assert not loop.is_closed()
+        loop.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
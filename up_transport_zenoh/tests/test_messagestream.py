@@ -0,0 +1,143 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import unittest
+
+import pytest
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.ucode_pb2 import UCode
+
+from up_transport_zenoh.tests.testutils import METHOD, SOURCE, TOPIC, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+
+class TestMessageStream(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.transport = UPTransportZenoh.new(create_config(), SOURCE)
+
+    async def asyncTearDown(self):
+        self.transport.close()
+
+    async def publish(self, *payloads: bytes):
+        for payload in payloads:
+            message = UMessageBuilder.publish(TOPIC).build()
+            message.payload = payload
+            await self.transport.send(message)
+
+    @pytest.mark.asyncio
+    async def test_iterate(self):
+        async with self.transport.subscribe(TOPIC) as stream:
+            await self.publish(b"1", b"2", b"3")
+            received = []
+            async for message in stream:
+                received.append(message.payload)
+                if len(received) == 3:
+                    break
+        assert received == [b"1", b"2", b"3"]
+        assert stream.closed
+
+    @pytest.mark.asyncio
+    async def test_batch(self):
+        stream = self.transport.subscribe(TOPIC)
+        await self.publish(b"1", b"2", b"3")
+        await asyncio.sleep(0.1)
+        batch = await asyncio.wait_for(stream.recv_batch(max_messages=2), 1)
+        assert [message.payload for message in batch] == [b"1", b"2"]
+        batch = await asyncio.wait_for(stream.recv_batch(), 1)
+        assert [message.payload for message in batch] == [b"3"]
+        stream.close()
+
+    @pytest.mark.asyncio
+    async def test_keep_latest(self):
+        stream = self.transport.subscribe(TOPIC, capacity=2, keep_latest=True)
+        await self.publish(b"1", b"2", b"3", b"4")
+        await asyncio.sleep(0.1)
+        batch = await asyncio.wait_for(stream.recv_batch(), 1)
+        assert [message.payload for message in batch] == [b"3", b"4"]
+        stream.close()
+
+    @pytest.mark.asyncio
+    async def test_publisher_on_consumer_loop(self):
+        # More messages than the buffer holds, sent from the loop of the consumer
+        count = 300
+        stream = self.transport.subscribe(TOPIC, capacity=1)
+
+        async def consume():
+            received = 0
+            async for _ in stream:
+                received += 1
+                if received == count:
+                    break
+            return received
+
+        consumer = asyncio.ensure_future(consume())
+        await asyncio.wait_for(self.publish(*(b"%d" % index for index in range(count))), 5)
+        stream.close()
+        assert 0 < await asyncio.wait_for(consumer, 1) <= count
+
+    @pytest.mark.asyncio
+    async def test_cancelled_receive_loses_nothing(self):
+        stream = self.transport.subscribe(TOPIC)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(stream.recv(), 0.1)
+        await self.publish(b"1", b"2")
+        assert (await asyncio.wait_for(stream.recv(), 1)).payload == b"1"
+        assert (await asyncio.wait_for(stream.recv(), 1)).payload == b"2"
+        stream.close()
+
+    @pytest.mark.asyncio
+    async def test_close_ends_iteration(self):
+        stream = self.transport.subscribe(TOPIC)
+
+        async def consume():
+            return [message async for message in stream]
+
+        consumer = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.1)
+        self.transport.close()
+        assert await asyncio.wait_for(consumer, 1) == []
+        assert stream.closed
+
+    @pytest.mark.asyncio
+    async def test_requests(self):
+        async def serve():
+            async for request in self.transport.requests(METHOD):
+                response = UMessageBuilder.response_for_request(request.attributes).build()
+                response.payload = request.payload + b" pong"
+                await self.transport.send(response)
+
+        server = asyncio.ensure_future(serve())
+        await asyncio.sleep(0.1)
+        for index in range(3):
+            request = UMessageBuilder.request(SOURCE, METHOD, 1000).build()
+            request.payload = b"ping %d" % index
+            response = await self.transport.invoke(request)
+            assert response.payload == b"ping %d pong" % index
+        self.transport.close()
+        await asyncio.wait_for(server, 1)
+
+    def test_invalid_filters(self):
+        with pytest.raises(UStatusError) as error:
+            self.transport.subscribe(UriFactory.ANY, METHOD)
+        assert error.value.get_code() == UCode.INVALID_ARGUMENT
+        with pytest.raises(UStatusError) as error:
+            self.transport.requests(SOURCE, source_filter=METHOD)
+        assert error.value.get_code() == UCode.INVALID_ARGUMENT
+
+
+if __name__ == "__main__":
+    unittest.main()
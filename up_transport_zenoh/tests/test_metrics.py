@@ -0,0 +1,143 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+
+import pytest
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.uuid.serializer.uuidserializer import UuidSerializer
+from uprotocol.v1.ucode_pb2 import UCode
+
+from up_transport_zenoh.metrics import (
+    ATTACHMENT_DECODE,
+    ATTACHMENT_DECODE_ERRORS,
+    ATTACHMENT_ENCODE,
+    DISPATCH_QUEUE_WAIT,
+    KEY_RESOLUTION,
+    LISTENER_ON_RECEIVE,
+    MESSAGES_RECEIVED,
+    MESSAGES_SENT,
+    RPC_LATENCY,
+    ZENOH_GET,
+    ZENOH_PUT,
+    ZENOH_REPLY,
+    InMemoryMetrics,
+    LatencyHistogram,
+    OpenTelemetryMetrics,
+)
+from up_transport_zenoh.tests.testutils import METHOD, SOURCE, TOPIC, Collector, EchoServer, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+from up_transport_zenoh.zenohutils import ZenohUtils
+
+
+class TestMetrics(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.metrics = InMemoryMetrics()
+        ZenohUtils.set_metrics(self.metrics)
+        self.transport = UPTransportZenoh.new(create_config(), SOURCE, metrics=self.metrics)
+
+    async def asyncTearDown(self):
+        ZenohUtils.set_metrics(None)
+        self.transport.close()
+
+    @pytest.mark.asyncio
+    async def test_publish(self):
+        listener = Collector()
+        await self.transport.register_listener(TOPIC, listener)
+        await self.transport.send(UMessageBuilder.publish(TOPIC).build())
+        await asyncio.wait_for(listener.received.get(), 2)
+        # The listener is still being timed when the message is received
+        await asyncio.sleep(0.05)
+
+        snapshot = self.metrics.snapshot()
+        assert snapshot["counters"][MESSAGES_SENT] == 1
+        assert snapshot["counters"][MESSAGES_RECEIVED] == 1
+        # Registering resolves the key as well
+        assert snapshot["latencies"][KEY_RESOLUTION]["count"] == 2
+        for name in (ATTACHMENT_ENCODE, ATTACHMENT_DECODE, ZENOH_PUT, DISPATCH_QUEUE_WAIT):
+            assert snapshot["latencies"][name]["count"] == 1, name
+        assert snapshot["latencies"][LISTENER_ON_RECEIVE]["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_rpc(self):
+        await self.transport.register_listener(UriFactory.ANY, EchoServer(self.transport), METHOD)
+        request = UMessageBuilder.request(SOURCE, METHOD, 1000).build()
+        await self.transport.invoke(request)
+        # The server records its reply once sent, on its dispatcher loop, possibly after the response arrived
+        for _ in range(100):
+            if ZENOH_REPLY in self.metrics.histograms:
+                break
+            await asyncio.sleep(0.01)
+
+        snapshot = self.metrics.snapshot()
+        assert snapshot["latencies"][ZENOH_GET]["count"] == 1
+        assert snapshot["latencies"][ZENOH_REPLY]["count"] == 1
+        assert snapshot["latencies"][RPC_LATENCY]["count"] == 1
+        latency, code = self.metrics.rpc_latencies[UuidSerializer.serialize(request.attributes.id)]
+        assert 0 < latency < 1
+        assert code == UCode.OK
+
+    def test_decode_error(self):
+        with pytest.raises(UStatusError):
+            ZenohUtils.attachment_to_uattributes(b"\x01\x02")
+        assert self.metrics.counters[ATTACHMENT_DECODE_ERRORS] == 1
+        assert self.metrics.histograms[ATTACHMENT_DECODE].count == 1
+
+
+class TestMetricsCollectors(unittest.TestCase):
+    def test_histogram(self):
+        histogram = LatencyHistogram()
+        for _ in range(99):
+            histogram.add(0.0004)
+        histogram.add(0.3)
+        summary = histogram.summary()
+        assert summary["count"] == 100
+        assert summary["p50"] == 0.0005
+        assert summary["p99"] == 0.0005
+        assert histogram.quantile(1.0) == 0.5
+        assert summary["max"] == 0.3
+
+    def test_rpc_latencies_bounded(self):
+        metrics = InMemoryMetrics(max_rpc_requests=2)
+        for index in range(3):
+            metrics.rpc_completed(str(index), 1.0, 1.5, UCode.OK)
+        assert list(metrics.rpc_latencies) == ["1", "2"]
+        assert metrics.histograms[RPC_LATENCY].count == 3
+
+    def test_opentelemetry(self):
+        meter = MagicMock()
+        tracer = MagicMock()
+        metrics = OpenTelemetryMetrics(meter, tracer)
+        metrics.increment(MESSAGES_SENT)
+        metrics.increment(MESSAGES_SENT)
+        metrics.record(ZENOH_PUT, 0.001)
+        metrics.rpc_completed("request", 1.0, 1.5, UCode.DEADLINE_EXCEEDED)
+
+        meter.create_counter.assert_called_once_with(MESSAGES_SENT)
+        assert meter.create_counter.return_value.add.call_count == 2
+        meter.create_histogram.return_value.record.assert_called_with(
+            0.5, attributes={"up.commstatus": "DEADLINE_EXCEEDED"}
+        )
+        kwargs = tracer.start_span.call_args.kwargs
+        assert kwargs["start_time"] == 1_000_000_000
+        assert kwargs["attributes"]["up.request_id"] == "request"
+        tracer.start_span.return_value.end.assert_called_once_with(end_time=1_500_000_000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import os
+import unittest
+
+import pytest
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.ucode_pb2 import UCode
+from zenoh import ZBytes
+
+from up_transport_zenoh.payloadcodec import (
+    PayloadCodec,
+    PayloadCompression,
+    ZlibCodec,
+    decompress_payload,
+    get_codec,
+    register_codec,
+)
+from up_transport_zenoh.tests.testutils import METHOD, SOURCE, TOPIC, Collector, EchoServer, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+from up_transport_zenoh.zenohutils import ZenohUtils
+
+COMPRESSIBLE = b"diagnostic trouble code P0420 " * 100
+
+
+class ReversingCodec(PayloadCodec):
+    name = "test-reverse"
+
+    def compress(self, data: bytes) -> bytes:
+        return data[::-1][: len(data) // 2]
+
+    def decompress(self, data: bytes) -> bytes:
+        return data[::-1] * 2
+
+
+class NamelessCodec(ZlibCodec):
+    name = ""
+
+
+class TestPayloadCompression(unittest.TestCase):
+    def test_threshold(self):
+        compression = PayloadCompression(threshold=100)
+        assert compression.compress(b"x" * 99) == (b"x" * 99, None)
+        compressed, codec = compression.compress(COMPRESSIBLE)
+        assert codec == "zlib"
+        assert len(compressed) < len(COMPRESSIBLE)
+        assert decompress_payload(compressed, codec) == COMPRESSIBLE
+
+    def test_incompressible_payload_sent_as_is(self):
+        payload = os.urandom(4096)
+        assert PayloadCompression(threshold=0).compress(payload) == (payload, None)
+
+    def test_custom_codec(self):
+        codec = ReversingCodec()
+        compressed, name = PayloadCompression(codec, threshold=0).compress(b"abab")
+        assert name == "test-reverse"
+        # Registered by the compression settings
+        assert get_codec(name) is codec
+        assert decompress_payload(compressed, name) == b"abab"
+
+    def test_unknown_codec(self):
+        with pytest.raises(UStatusError) as error:
+            decompress_payload(b"data", "unknown")
+        assert error.value.get_code() == UCode.UNIMPLEMENTED
+        with pytest.raises(UStatusError) as error:
+            decompress_payload(b"not zlib", "zlib")
+        assert error.value.get_code() == UCode.INVALID_ARGUMENT
+
+    def test_register_codec(self):
+        with pytest.raises(ValueError):
+            register_codec(NamelessCodec())
+        with pytest.raises(ValueError):
+            PayloadCompression(threshold=-1)
+
+    def test_attachment_codec(self):
+        attributes = UMessageBuilder.publish(TOPIC).build().attributes
+        attachment = ZBytes(ZenohUtils.uattributes_to_attachment(attributes, "zlib"))
+        assert ZenohUtils.decode_attachment(attachment) == (attributes, "zlib", None, None)
+        # Readers of the attributes only ignore the codec
+        assert ZenohUtils.attachment_to_uattributes(attachment) == attributes
+        plain = ZBytes(ZenohUtils.uattributes_to_attachment(attributes))
+        assert ZenohUtils.decode_attachment(plain) == (attributes, None, None, None)
+
+
+class TestTransportCompression(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.transport = UPTransportZenoh.new(create_config(), SOURCE, compression=PayloadCompression(threshold=1024))
+
+    async def asyncTearDown(self):
+        self.transport.close()
+
+    @pytest.mark.asyncio
+    async def test_publish(self):
+        wire = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        zenoh_key = ZenohUtils.to_zenoh_key_string(SOURCE.authority_name, TOPIC)
+        self.transport.session.declare_subscriber(
+            zenoh_key,
+            lambda sample: loop.call_soon_threadsafe(
+                wire.put_nowait, (bytes(sample.payload), bytes(sample.attachment))
+            ),
+        )
+        listener = Collector()
+        await self.transport.register_listener(TOPIC, listener)
+
+        for payload in (b"small", COMPRESSIBLE):
+            message = UMessageBuilder.publish(TOPIC).build()
+            message.payload = payload
+            await self.transport.send(message)
+            received = await asyncio.wait_for(listener.received.get(), 2)
+            assert received.payload == payload
+
+        small, _ = await asyncio.wait_for(wire.get(), 2)
+        assert small == b"small"
+        large, attachment = await asyncio.wait_for(wire.get(), 2)
+        assert len(large) < len(COMPRESSIBLE)
+        assert ZenohUtils.decode_attachment(attachment).codec == "zlib"
+
+    @pytest.mark.asyncio
+    async def test_rpc(self):
+        await self.transport.register_listener(UriFactory.ANY, EchoServer(self.transport), METHOD)
+        request = UMessageBuilder.request(SOURCE, METHOD, 1000).build()
+        request.payload = COMPRESSIBLE
+        response = await self.transport.invoke(request)
+        assert response.payload == COMPRESSIBLE
+
+    @pytest.mark.asyncio
+    async def test_prepared_publisher(self):
+        listener = Collector()
+        await self.transport.register_listener(TOPIC, listener)
+        with self.transport.declare_publisher(TOPIC) as publisher:
+            publisher.publish(COMPRESSIBLE)
+            received = await asyncio.wait_for(listener.received.get(), 2)
+        assert received.payload == COMPRESSIBLE
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+import pytest
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.pendingquerytable import EvictionReason, PendingQueryTable
+from up_transport_zenoh.tests.testutils import SOURCE, SilentServer, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+METHOD = UUri(authority_name="vehicle1", ue_id=0x20, ue_version_major=1, resource_id=4)
+
+
+class TestPendingQueryTable(unittest.TestCase):
+    def setUp(self):
+        self.evicted = []
+        self.table = PendingQueryTable(max_size=2, on_evict=lambda reqid, reason: self.evicted.append((reqid, reason)))
+
+    def tearDown(self):
+        self.table.close()
+
+    def test_pop(self):
+        query = MagicMock()
+        assert self.table.put(b"1", query, 50)
+        assert b"1" in self.table
+        assert self.table.pop(b"1") is query
+        assert self.table.pop(b"1") is None
+        time.sleep(0.1)
+        assert self.evicted == []
+
+    def test_expiry(self):
+        self.table.put(b"1", MagicMock(), 50)
+        self.table.put(b"2", MagicMock(), 5000)
+        time.sleep(0.2)
+        assert self.evicted == [(b"1", EvictionReason.EXPIRED)]
+        assert len(self.table) == 1
+        assert self.table.expired == 1
+
+    def test_overflow(self):
+        for reqid in (b"1", b"2", b"3"):
+            self.table.put(reqid, MagicMock(), 5000)
+        assert self.evicted == [(b"1", EvictionReason.OVERFLOW)]
+        assert self.table.pop(b"1") is None
+        assert len(self.table) == 2
+        assert self.table.evictions == 1
+
+    def test_stats(self):
+        table = PendingQueryTable(track_held_time=True)
+        try:
+            no_ages = {"0.01": 0, "0.1": 0, "1.0": 0, "10.0": 0, "inf": 0}
+            assert table.stats() == (0, 0.0, no_ages, 0, 0, table.held.summary())
+            table.put(b"1", MagicMock(), 5000)
+            table.put(b"2", MagicMock(), 5000)
+            time.sleep(0.05)
+            table.pop(b"2")
+            table.put(b"3", MagicMock(), 5000)
+            stats = table.stats()
+            assert stats.size == 2
+            assert stats.oldest_age >= 0.05
+            # The age of the pending queries, not of the answered one
+            assert stats.ages == {"0.01": 1, "0.1": 1, "1.0": 0, "10.0": 0, "inf": 0}
+            assert stats.held["count"] == 1
+            assert self.table.stats().held is None
+        finally:
+            table.close()
+
+    def test_closed(self):
+        self.table.put(b"1", MagicMock(), 5000)
+        self.table.close()
+        assert len(self.table) == 0
+        assert not self.table.put(b"2", MagicMock(), 5000)
+        assert self.evicted == []
+
+    def test_concurrent_access(self):
+        table = PendingQueryTable(max_size=100)
+        popped = []
+
+        def worker(prefix: int):
+            for index in range(1000):
+                reqid = bytes([prefix]) + index.to_bytes(2, "big")
+                table.put(reqid, MagicMock(), 5000)
+                if index % 2 and table.pop(reqid) is not None:
+                    popped.append(reqid)
+
+        threads = [threading.Thread(target=worker, args=(prefix,)) for prefix in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(table) <= 100
+        assert len(table) + table.overflowed + len(popped) == 4000
+        table.close()
+
+
+class TestPendingQueries(unittest.IsolatedAsyncioTestCase):
+    @pytest.mark.asyncio
+    async def test_unanswered_request_expires(self):
+        transport = UPTransportZenoh.new(create_config(), SOURCE)
+        await transport.register_listener(UriFactory.ANY, SilentServer(), METHOD)
+
+        with pytest.raises(UStatusError) as error:
+            await transport.invoke(UMessageBuilder.request(SOURCE, METHOD, 200).build())
+        assert error.value.get_code() == UCode.DEADLINE_EXCEEDED
+        time.sleep(0.05)
+        assert len(transport.query_map) == 0
+        assert transport.query_map.expired == 1
+
+        transport.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import unittest
+
+import pytest
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.v1.uattributes_pb2 import UMessageType, UPriority
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.tests.testutils import SOURCE, TOPIC, Collector, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+SINK = UUri(authority_name="vehicle2", ue_id=0x20, ue_version_major=1, resource_id=0)
+
+
+class TestPreparedPublisher(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.transport = UPTransportZenoh.new(create_config(), SOURCE)
+
+    async def asyncTearDown(self):
+        self.transport.close()
+
+    @pytest.mark.asyncio
+    async def test_publish(self):
+        listener = Collector()
+        await self.transport.register_listener(TOPIC, listener)
+
+        with self.transport.declare_publisher(TOPIC, priority=UPriority.UPRIORITY_CS3) as publisher:
+            assert publisher.key_expr == "up/vehicle1/18/1/8001/{}/{}/{}/{}"
+            assert publisher.publish(b"first", ttl=500).code == UCode.OK
+            assert publisher.publish(b"second").code == UCode.OK
+
+            first = await asyncio.wait_for(listener.received.get(), 2)
+            second = await asyncio.wait_for(listener.received.get(), 2)
+
+        assert first.payload == b"first"
+        assert first.attributes.type == UMessageType.UMESSAGE_TYPE_PUBLISH
+        assert first.attributes.source == TOPIC
+        assert not first.attributes.HasField("sink")
+        assert first.attributes.priority == UPriority.UPRIORITY_CS3
+        assert first.attributes.ttl == 500
+        assert second.payload == b"second"
+        assert not second.attributes.HasField("ttl")
+        assert first.attributes.id != second.attributes.id
+
+    @pytest.mark.asyncio
+    async def test_notification(self):
+        listener = Collector()
+        await self.transport.register_listener(TOPIC, listener, SINK)
+
+        publisher = self.transport.declare_publisher(TOPIC, SINK)
+        publisher.publish(b"notification")
+        message = await asyncio.wait_for(listener.received.get(), 2)
+        publisher.close()
+
+        assert message.attributes.type == UMessageType.UMESSAGE_TYPE_NOTIFICATION
+        assert message.attributes.sink == SINK
+
+    @pytest.mark.asyncio
+    async def test_invalid_attributes(self):
+        with pytest.raises(UStatusError) as error:
+            self.transport.declare_publisher(TOPIC, priority=UPriority.UPRIORITY_UNSPECIFIED)
+        assert error.value.get_code() == UCode.INVALID_ARGUMENT
+
+
+if __name__ == "__main__":
+    unittest.main()
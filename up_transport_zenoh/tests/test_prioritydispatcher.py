@@ -0,0 +1,191 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+
+import pytest
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.uattributes_pb2 import UPriority
+from uprotocol.v1.umessage_pb2 import UMessage
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.metrics import DISPATCH_AGED, InMemoryMetrics
+from up_transport_zenoh.prioritydispatcher import PriorityDispatcher, priority_class
+from up_transport_zenoh.tests.testutils import METHOD, SOURCE, TOPIC, EchoServer, NestedServer, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+NESTED_METHOD = UUri(authority_name="vehicle1", ue_id=0x20, ue_version_major=1, resource_id=4)
+
+
+def message(priority: UPriority, payload: bytes = b"") -> UMessage:
+    umsg = UMessageBuilder.publish(TOPIC).build()
+    # Set directly, the builder raises the priorities below CS1
+    umsg.attributes.priority = priority
+    umsg.payload = payload
+    return umsg
+
+
+class RecordingListener(UListener):
+    def __init__(self):
+        self.received = []
+        # The first message holds the worker until released
+        self.gate = threading.Event()
+        self.done = threading.Event()
+        self.expected = 0
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        if not self.received:
+            self.gate.wait(1)
+        self.received.append(umsg.payload)
+        if len(self.received) == self.expected:
+            self.done.set()
+
+
+class TestPriorityDispatcher(unittest.IsolatedAsyncioTestCase):
+    def test_priority_class(self):
+        assert priority_class(UPriority.UPRIORITY_CS0) == 0
+        assert priority_class(UPriority.UPRIORITY_CS6) == 6
+        assert priority_class(UPriority.UPRIORITY_UNSPECIFIED) == priority_class(UPriority.UPRIORITY_CS1)
+        with pytest.raises(ValueError):
+            PriorityDispatcher(num_workers=0)
+        with pytest.raises(ValueError):
+            PriorityDispatcher(aging_interval=0)
+        with pytest.raises(ValueError):
+            PriorityDispatcher(max_concurrency=0)
+
+    def test_strict_priority(self):
+        dispatcher = PriorityDispatcher(aging_interval=10)
+        listener = RecordingListener()
+        try:
+            listener.expected = 8
+            dispatcher.dispatch(listener, message(UPriority.UPRIORITY_CS0, b"first"))
+            time.sleep(0.05)
+            for priority in (UPriority.UPRIORITY_CS0, UPriority.UPRIORITY_CS2, UPriority.UPRIORITY_CS6):
+                for index in range(2):
+                    dispatcher.dispatch(listener, message(priority, b"%d-%d" % (priority, index)))
+            dispatcher.dispatch(listener, message(UPriority.UPRIORITY_CS4, b"cs4"))
+            assert dispatcher.depth == 7
+            listener.gate.set()
+            assert listener.done.wait(1)
+            assert listener.received == [b"first", b"7-0", b"7-1", b"cs4", b"3-0", b"3-1", b"1-0", b"1-1"]
+            stats = dispatcher.stats()
+            assert stats[UPriority.UPRIORITY_CS0].dispatched == 3
+            assert stats[UPriority.UPRIORITY_CS6] == (0, 2, 0)
+        finally:
+            dispatcher.close()
+
+    def test_aging(self):
+        metrics = InMemoryMetrics()
+        dispatcher = PriorityDispatcher(aging_interval=0.01, metrics=metrics)
+        listener = RecordingListener()
+        try:
+            listener.expected = 4
+            dispatcher.dispatch(listener, message(UPriority.UPRIORITY_CS6, b"first"))
+            time.sleep(0.02)
+            dispatcher.dispatch(listener, message(UPriority.UPRIORITY_CS0, b"old"))
+            # Well beyond the 6 classes between CS0 and CS6
+            time.sleep(0.15)
+            dispatcher.dispatch(listener, message(UPriority.UPRIORITY_CS6, b"new-0"))
+            dispatcher.dispatch(listener, message(UPriority.UPRIORITY_CS6, b"new-1"))
+            listener.gate.set()
+            assert listener.done.wait(1)
+            assert listener.received == [b"first", b"old", b"new-0", b"new-1"]
+            assert dispatcher.stats()[UPriority.UPRIORITY_CS0].aged == 1
+            assert metrics.snapshot()["counters"][DISPATCH_AGED] == 1
+        finally:
+            dispatcher.close()
+
+    def test_max_concurrency(self):
+        dispatcher = PriorityDispatcher(max_concurrency=2)
+        release = threading.Event()
+        running = []
+
+        class WaitingListener(UListener):
+            async def on_receive(self, umsg: UMessage) -> None:
+                running.append(umsg.payload)
+                await asyncio.to_thread(release.wait, 1)
+
+        listener = WaitingListener()
+        try:
+            futures = [dispatcher.dispatch(listener, message(UPriority.UPRIORITY_CS0, b"%d" % i)) for i in range(3)]
+            time.sleep(0.1)
+            # The third message waits for one of the first two to complete
+            assert running == [b"0", b"1"]
+            assert dispatcher.depth == 1
+            release.set()
+            for future in futures:
+                future.result(timeout=1)
+            assert running == [b"0", b"1", b"2"]
+        finally:
+            dispatcher.close()
+
+    def test_close_cancels_queued(self):
+        dispatcher = PriorityDispatcher()
+        listener = RecordingListener()
+        dispatcher.dispatch(listener, message(UPriority.UPRIORITY_CS0))
+        time.sleep(0.05)
+        queued = dispatcher.dispatch(listener, message(UPriority.UPRIORITY_CS0))
+        listener.gate.set()
+        dispatcher.close()
+        assert queued.done()
+        assert dispatcher.depth == 0
+
+    @pytest.mark.asyncio
+    async def test_transport_metrics(self):
+        metrics = InMemoryMetrics()
+        dispatcher = PriorityDispatcher(metrics=metrics)
+        transport = UPTransportZenoh.new(create_config(), SOURCE, dispatcher=dispatcher)
+        listener = RecordingListener()
+        listener.gate.set()
+        listener.expected = 2
+        try:
+            await transport.register_listener(TOPIC, listener)
+            await asyncio.sleep(0.1)
+            await transport.send(message(UPriority.UPRIORITY_CS6, b"alarm"))
+            await transport.send(message(UPriority.UPRIORITY_CS0, b"bulk"))
+            assert await asyncio.to_thread(listener.done.wait, 1)
+            assert sorted(listener.received) == [b"alarm", b"bulk"]
+            latencies = metrics.snapshot()["latencies"]
+            assert latencies["up.dispatch.queue_wait.cs6"]["count"] == 1
+            assert latencies["up.dispatch.queue_wait.cs0"]["count"] == 1
+        finally:
+            transport.close()
+            dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_nested_rpc(self):
+        # A request listener awaiting the response of another request doesn't hold the single worker
+        dispatcher = PriorityDispatcher()
+        transport = UPTransportZenoh.new(create_config(), SOURCE, dispatcher=dispatcher)
+        try:
+            await transport.register_listener(UriFactory.ANY, EchoServer(transport), NESTED_METHOD)
+            await transport.register_listener(UriFactory.ANY, NestedServer(transport, NESTED_METHOD), METHOD)
+            request = UMessageBuilder.request(SOURCE, METHOD, 2000).build()
+            request.payload = b"ping"
+            start = time.monotonic()
+            response = await transport.invoke(request)
+            assert response.payload == b"ping"
+            assert time.monotonic() - start < 1
+        finally:
+            transport.close()
+            dispatcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import unittest
+from unittest.mock import MagicMock
+
+import pytest
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.uattributes_pb2 import UPriority
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.umessage_pb2 import UMessage
+from uprotocol.v1.uri_pb2 import UUri
+from zenoh import CongestionControl, Priority, Reliability
+
+from up_transport_zenoh.qospolicy import QosPolicy, QosSettings
+from up_transport_zenoh.tests.testutils import SOURCE, TOPIC
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+METHOD = UUri(authority_name="vehicle2", ue_id=0x20, ue_version_major=1, resource_id=3)
+
+
+class NoopListener(UListener):
+    async def on_receive(self, umsg: UMessage) -> None:
+        pass
+
+
+class TestQosPolicy(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.session = MagicMock()
+
+    def tearDown(self):
+        self.transport.close()
+
+    @pytest.mark.asyncio
+    async def test_put(self):
+        self.transport = UPTransportZenoh(self.session, SOURCE, qos_policy=QosPolicy.LOW_LATENCY)
+        for priority, congestion_control in [
+            (UPriority.UPRIORITY_CS1, CongestionControl.DROP),
+            (UPriority.UPRIORITY_CS6, CongestionControl.BLOCK),
+        ]:
+            message = UMessageBuilder.publish(TOPIC).with_priority(priority).build()
+            assert (await self.transport.send(message)).code == UCode.OK
+            kwargs = self.session.put.call_args.kwargs
+            assert kwargs["congestion_control"] == congestion_control
+            assert kwargs["express"] is True
+
+    @pytest.mark.asyncio
+    async def test_get_and_reply(self):
+        self.transport = UPTransportZenoh(self.session, SOURCE, qos_policy=QosPolicy.HIGH_THROUGHPUT)
+        await self.transport.register_listener(METHOD, NoopListener(), SOURCE)
+        request = UMessageBuilder.request(SOURCE, METHOD, 1000).with_priority(UPriority.UPRIORITY_CS5).build()
+        assert (await self.transport.send(request)).code == UCode.OK
+        kwargs = self.session.get.call_args.kwargs
+        assert kwargs["congestion_control"] == CongestionControl.BLOCK
+        assert kwargs["express"] is True
+        assert kwargs["priority"] == Priority.INTERACTIVE_HIGH
+
+        query = MagicMock()
+        self.transport.query_map.put(request.attributes.id.SerializeToString(), query, 1000)
+        response = UMessageBuilder.response_for_request(request.attributes).build()
+        assert (await self.transport.send(response)).code == UCode.OK
+        kwargs = query.reply.call_args.kwargs
+        assert kwargs["congestion_control"] == CongestionControl.BLOCK
+        assert kwargs["express"] is True
+        assert kwargs["priority"] == Priority.INTERACTIVE_HIGH
+
+    @pytest.mark.asyncio
+    async def test_publisher_and_subscriber(self):
+        policy = QosPolicy(
+            settings={UPriority.UPRIORITY_CS2: QosSettings(CongestionControl.BLOCK, express=True)},
+            reliability=Reliability.RELIABLE,
+        )
+        self.transport = UPTransportZenoh(self.session, SOURCE, qos_policy=policy)
+        self.transport.declare_publisher(TOPIC, priority=UPriority.UPRIORITY_CS2)
+        kwargs = self.session.declare_publisher.call_args.kwargs
+        assert kwargs["congestion_control"] == CongestionControl.BLOCK
+        assert kwargs["express"] is True
+
+        await self.transport.register_listener(TOPIC, NoopListener(), UriFactory.ANY)
+        assert self.session.declare_subscriber.call_args.kwargs["reliability"] == Reliability.RELIABLE
+
+    def test_default_policy(self):
+        self.transport = UPTransportZenoh(self.session, SOURCE)
+        settings = self.transport.qos_policy.for_priority(UPriority.UPRIORITY_CS4)
+        assert settings.congestion_control == CongestionControl.DEFAULT
+        assert settings.express is False
+        assert QosPolicy.LOW_LATENCY.for_priority(UPriority.UPRIORITY_UNSPECIFIED).express is True
+
+
+if __name__ == "__main__":
+    unittest.main()
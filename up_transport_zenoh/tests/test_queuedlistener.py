@@ -0,0 +1,187 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+
+import pytest
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.v1.umessage_pb2 import UMessage
+
+from up_transport_zenoh.listenerdispatcher import ListenerDispatcher
+from up_transport_zenoh.queuedlistener import OverflowPolicy, QueuedListener
+from up_transport_zenoh.tests.testutils import SOURCE, TOPIC, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+
+def message(payload: bytes) -> UMessage:
+    umsg = UMessageBuilder.publish(TOPIC).build()
+    umsg.payload = payload
+    return umsg
+
+
+class GatedListener(UListener):
+    """Holds every message until the gate is opened."""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.received = []
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        await self.gate.wait()
+        self.received.append(umsg.payload)
+
+
+class RecordingListener(UListener):
+    def __init__(self):
+        self.received = asyncio.Queue()
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        self.received.put_nowait(umsg.payload)
+
+
+class TestQueuedListener(unittest.IsolatedAsyncioTestCase):
+    async def fill(self, policy: OverflowPolicy, capacity: int = 2) -> QueuedListener:
+        listener = GatedListener()
+        queued = QueuedListener(listener, capacity, policy)
+        queued.start(asyncio.get_running_loop())
+        # The worker takes the first message and waits on the gate with it
+        queued.offer(message(b"0"))
+        await asyncio.sleep(0.05)
+        return queued
+
+    async def drain(self, queued: QueuedListener):
+        queued.listener.gate.set()
+        while queued.depth:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+        queued.close()
+        return queued.listener.received
+
+    @pytest.mark.asyncio
+    async def test_drop_newest(self):
+        queued = await self.fill(OverflowPolicy.DROP_NEWEST)
+        assert queued.offer(message(b"1"))
+        assert queued.offer(message(b"2"))
+        assert not queued.offer(message(b"3"))
+        assert queued.stats() == (2, 2, 1, 0)
+        assert await self.drain(queued) == [b"0", b"1", b"2"]
+        assert queued.stats().delivered == 3
+
+    @pytest.mark.asyncio
+    async def test_drop_oldest(self):
+        queued = await self.fill(OverflowPolicy.DROP_OLDEST)
+        for payload in (b"1", b"2", b"3", b"4"):
+            queued.offer(message(payload))
+        assert queued.stats() == (2, 2, 2, 0)
+        assert await self.drain(queued) == [b"0", b"3", b"4"]
+
+    @pytest.mark.asyncio
+    async def test_keep_latest(self):
+        queued = await self.fill(OverflowPolicy.KEEP_LATEST, capacity=10)
+        for payload in (b"1", b"2", b"3"):
+            queued.offer(message(payload))
+        assert queued.depth == 1
+        assert queued.dropped == 2
+        assert await self.drain(queued) == [b"0", b"3"]
+
+    @pytest.mark.asyncio
+    async def test_block(self):
+        queued = await self.fill(OverflowPolicy.BLOCK, capacity=1)
+        queued.offer(message(b"1"))
+        offered = threading.Event()
+
+        def offer():
+            queued.offer(message(b"2"))
+            offered.set()
+
+        thread = threading.Thread(target=offer)
+        thread.start()
+        await asyncio.sleep(0.1)
+        # The sender waits for room in the queue
+        assert not offered.is_set()
+        assert await self.drain(queued) == [b"0", b"1", b"2"]
+        thread.join(1)
+        assert offered.is_set()
+        assert queued.dropped == 0
+
+    @pytest.mark.asyncio
+    async def test_block_on_worker_loop_does_not_deadlock(self):
+        queued = await self.fill(OverflowPolicy.BLOCK, capacity=1)
+        queued.offer(message(b"1"))
+        queued.offer(message(b"2"))
+        assert queued.stats().high_water_mark == 2
+        assert await self.drain(queued) == [b"0", b"1", b"2"]
+
+    @pytest.mark.asyncio
+    async def test_close_releases_blocked_sender(self):
+        queued = await self.fill(OverflowPolicy.BLOCK, capacity=1)
+        queued.offer(message(b"1"))
+        thread = threading.Thread(target=queued.offer, args=(message(b"2"),))
+        thread.start()
+        await asyncio.sleep(0.05)
+        queued.close()
+        thread.join(1)
+        assert not thread.is_alive()
+        assert not queued.offer(message(b"3"))
+
+    def test_default_policy_does_not_block(self):
+        assert QueuedListener(RecordingListener()).policy is OverflowPolicy.DROP_OLDEST
+
+    def test_invalid_capacity(self):
+        with pytest.raises(ValueError):
+            QueuedListener(RecordingListener(), capacity=0)
+
+
+class TestSlowConsumer(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # The listeners of the test use the primitives of the test loop
+        self.dispatcher = ListenerDispatcher(attach=True)
+        self.transport = UPTransportZenoh.new(create_config(), SOURCE, dispatcher=self.dispatcher)
+
+    async def asyncTearDown(self):
+        self.transport.close()
+        self.dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_slow_listener_does_not_delay_others(self):
+        slow = QueuedListener(GatedListener(), capacity=4, policy=OverflowPolicy.DROP_OLDEST)
+        fast = RecordingListener()
+        await self.transport.register_listener(TOPIC, slow)
+        await self.transport.register_listener(TOPIC, fast)
+
+        start = time.monotonic()
+        for index in range(20):
+            await self.transport.send(message(b"%d" % index))
+        for index in range(20):
+            assert await asyncio.wait_for(fast.received.get(), 1) == b"%d" % index
+        assert time.monotonic() - start < 1
+
+        stats = slow.stats()
+        assert stats.high_water_mark == 4
+        # One message is held by the worker, the others are queued or dropped
+        assert stats.depth + stats.dropped == 19
+        slow.listener.gate.set()
+        await asyncio.sleep(0.1)
+        assert len(slow.listener.received) == stats.depth + 1
+        assert slow.listener.received[-4:] == [b"16", b"17", b"18", b"19"]
+        assert slow.stats().delivered == len(slow.listener.received)
+        slow.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,180 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import time
+import unittest
+
+import pytest
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.umessage_pb2 import UMessage
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.responsecache import ResponseCache
+from up_transport_zenoh.tests.testutils import SOURCE, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+OTHER_CLIENT = UUri(authority_name="vehicle1", ue_id=0x19, ue_version_major=1)
+GET_VIN = UUri(authority_name="vehicle1", ue_id=0x20, ue_version_major=1, resource_id=3)
+SET_MODE = UUri(authority_name="vehicle1", ue_id=0x20, ue_version_major=1, resource_id=4)
+
+
+def response(code: UCode = UCode.OK, payload: bytes = b"") -> UMessage:
+    request = UMessageBuilder.request(SOURCE, GET_VIN, 1000).build()
+    message = UMessageBuilder.response_for_request(request.attributes).with_commstatus(code).build()
+    message.payload = payload
+    return message
+
+
+class SlowServer(UListener):
+    def __init__(self, transport: UPTransportZenoh, delay: float = 0.2):
+        self.transport = transport
+        self.delay = delay
+        self.calls = 0
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        message = UMessageBuilder.response_for_request(umsg.attributes).build()
+        message.payload = b"answer %d to " % self.calls + umsg.payload
+        await self.transport.send(message)
+
+
+class TestResponseCache(unittest.IsolatedAsyncioTestCase):
+    def test_keys(self):
+        cache = ResponseCache()
+        assert cache.key(GET_VIN, b"") is None
+        cache.add_method(GET_VIN, ttl_ms=1000)
+        assert cache.key(GET_VIN, b"a") == cache.key(GET_VIN, b"a")
+        assert cache.key(GET_VIN, b"a") != cache.key(GET_VIN, b"b")
+        assert cache.key(GET_VIN, b"a") != cache.key(GET_VIN, b"a", payload_format=2)
+        cache.remove_method(GET_VIN)
+        assert cache.key(GET_VIN, b"a") is None
+        with pytest.raises(ValueError):
+            cache.add_method(GET_VIN, ttl_ms=0)
+
+    def test_ttl_and_errors(self):
+        cache = ResponseCache()
+        cache.add_method(GET_VIN, ttl_ms=50)
+        key = cache.key(GET_VIN, b"")
+        cache.put(key, response(UCode.UNAVAILABLE))
+        assert cache.get(key) is None
+        cache.put(key, response(payload=b"VIN"))
+        assert cache.get(key).payload == b"VIN"
+        time.sleep(0.1)
+        assert cache.get(key) is None
+        assert cache.stats() == (1, 2, 0, 1)
+
+    def test_lru(self):
+        cache = ResponseCache(max_entries=2)
+        cache.add_method(GET_VIN, ttl_ms=1000)
+        keys = [cache.key(GET_VIN, b"%d" % index) for index in range(3)]
+        for key in keys:
+            cache.put(key, response())
+        assert cache.get(keys[0]) is None
+        assert cache.get(keys[2]) is not None
+
+    @pytest.mark.asyncio
+    async def test_single_flight(self):
+        cache = ResponseCache()
+        cache.add_method(GET_VIN, ttl_ms=500)
+        transport = UPTransportZenoh.new(create_config(), SOURCE, response_cache=cache)
+        server = SlowServer(transport)
+        try:
+            await transport.register_listener(UriFactory.ANY, server, GET_VIN)
+            await transport.register_listener(UriFactory.ANY, server, SET_MODE)
+            await asyncio.sleep(0.1)
+
+            requests = [UMessageBuilder.request(source, GET_VIN, 1000).build() for source in [SOURCE, OTHER_CLIENT] * 5]
+            for request in requests:
+                request.payload = b"vin"
+            responses = await asyncio.gather(*(transport.invoke(request) for request in requests))
+            assert server.calls == 1
+            for request, message in zip(requests, responses):
+                assert message.payload == b"answer 1 to vin"
+                assert message.attributes.reqid == request.attributes.id
+                assert message.attributes.sink == request.attributes.source
+            assert len({message.attributes.id.SerializeToString() for message in responses}) == len(requests)
+            assert cache.coalesced == len(requests) - 1
+
+            # Served from the cache
+            request = UMessageBuilder.request(SOURCE, GET_VIN, 1000).build()
+            request.payload = b"vin"
+            assert (await transport.invoke(request)).payload == b"answer 1 to vin"
+            assert server.calls == 1
+
+            # Another payload, an uncached method, and an expired response query the server
+            request = UMessageBuilder.request(SOURCE, GET_VIN, 1000).build()
+            request.payload = b"other"
+            assert (await transport.invoke(request)).payload == b"answer 2 to other"
+            mode = [UMessageBuilder.request(SOURCE, SET_MODE, 1000).build() for _ in range(2)]
+            await asyncio.gather(*(transport.invoke(request) for request in mode))
+            assert server.calls == 4
+            await asyncio.sleep(0.5)
+            request = UMessageBuilder.request(SOURCE, GET_VIN, 1000).build()
+            request.payload = b"vin"
+            assert (await transport.invoke(request)).payload == b"answer 5 to vin"
+        finally:
+            transport.close()
+
+    @pytest.mark.asyncio
+    async def test_leader_expiry_is_not_shared(self):
+        cache = ResponseCache()
+        cache.add_method(GET_VIN, ttl_ms=1000)
+        transport = UPTransportZenoh.new(create_config(), SOURCE, response_cache=cache)
+        server = SlowServer(transport, delay=0.5)
+        try:
+            await transport.register_listener(UriFactory.ANY, server, GET_VIN)
+            await asyncio.sleep(0.1)
+
+            requests = [UMessageBuilder.request(SOURCE, GET_VIN, ttl).build() for ttl in (200, 2000)]
+            start = time.monotonic()
+            leader, follower = await asyncio.gather(
+                *(transport.invoke(request) for request in requests), return_exceptions=True
+            )
+            assert isinstance(leader, UStatusError)
+            assert leader.get_code() == UCode.DEADLINE_EXCEEDED
+            # The follower queried the server in turn, within its own ttl
+            assert follower.attributes.reqid == requests[1].attributes.id
+            assert follower.payload.startswith(b"answer")
+            assert 0.5 < time.monotonic() - start < 2
+            assert server.calls == 2
+            assert cache.stats().size == 1
+            assert transport.rpc_engine.pending_count == 0
+        finally:
+            transport.close()
+
+    @pytest.mark.asyncio
+    async def test_failure_is_not_cached(self):
+        cache = ResponseCache()
+        cache.add_method(GET_VIN, ttl_ms=1000)
+        transport = UPTransportZenoh.new(create_config(), SOURCE, response_cache=cache)
+        try:
+            # Nobody serves the method
+            requests = [UMessageBuilder.request(SOURCE, GET_VIN, 1000).build() for _ in range(3)]
+            results = await asyncio.gather(*(transport.invoke(request) for request in requests), return_exceptions=True)
+            assert all(isinstance(result, UStatusError) for result in results)
+            assert {result.get_code() for result in results} == {UCode.UNAVAILABLE}
+            assert cache.stats().size == 0
+            assert transport.rpc_engine.pending_count == 0
+        finally:
+            transport.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import unittest
+
+from uprotocol.transport.ulistener import UListener
+from uprotocol.v1.umessage_pb2 import UMessage
+from zenoh import KeyExpr
+
+from up_transport_zenoh.lrucache import MISSING, LruCache
+from up_transport_zenoh.responselistenerindex import ResponseListenerIndex
+
+
+class NamedListener(UListener):
+    def __init__(self, name):
+        self.name = name
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        pass
+
+
+def linear_lookup(listeners, zenoh_key):
+    # The lookup the index replaces
+    for saved_zenoh_key, listener in listeners.items():
+        if KeyExpr(zenoh_key).intersects(KeyExpr(saved_zenoh_key)):
+            return listener
+    return None
+
+
+class TestResponseListenerIndex(unittest.TestCase):
+    def setUp(self):
+        self.listeners = {
+            "up/*/*/*/*/vehicle1/18/1/0": NamedListener("any-to-18"),
+            "up/vehicle2/20EF/4/B/vehicle1/18/1/0": NamedListener("exact"),
+            "up/vehicle2/*/4/*/vehicle1/19/1/0": NamedListener("partial"),
+            "up/vehicle2/20EF/4/B/*/*/*/*": NamedListener("any-from-method"),
+            "up/vehicle2/$*EF/4/C/vehicle1/19/1/0": NamedListener("sub-chunk"),
+        }
+        self.index = ResponseListenerIndex(cache_size=4)
+        self.index.rebuild(self.listeners)
+
+    def test_exact_key_first(self):
+        assert self.index.lookup("up/vehicle2/20EF/4/B/vehicle1/18/1/0").name == "exact"
+
+    def test_matches_linear_scan(self):
+        keys = [
+            "up/vehicle2/20EF/4/C/vehicle1/18/1/0",
+            "up/vehicle2/20EF/4/B/vehicle1/19/1/0",
+            "up/vehicle2/1/4/7/vehicle1/19/1/0",
+            "up/vehicle2/20EF/4/C/vehicle1/19/1/0",
+            "up/vehicle3/20EF/4/C/vehicle1/19/1/0",
+            "up/vehicle2/20EF/4/B/vehicle1/20/1/0",
+            "up/vehicle2/*/4/C/vehicle1/19/1/0",
+        ]
+        for key in keys:
+            assert self.index.lookup(key) is linear_lookup(self.listeners, key), key
+
+    def test_unknown_key(self):
+        assert self.index.lookup("up/vehicle3/1/1/1/vehicle4/1/1/0") is None
+
+    def test_cache_is_bounded_and_invalidated(self):
+        key = "up/vehicle2/1/4/7/vehicle1/19/1/0"
+        assert self.index.lookup(key).name == "partial"
+        assert self.index.lookup(key).name == "partial"
+        assert self.index.cache.hits == 1
+
+        for ue_id in range(10):
+            self.index.lookup(f"up/vehicle2/{ue_id}/4/7/vehicle1/19/1/0")
+        assert len(self.index.cache) == 4
+
+        listeners = dict(self.listeners)
+        del listeners["up/vehicle2/*/4/*/vehicle1/19/1/0"]
+        self.index.rebuild(listeners)
+        assert len(self.index.cache) == 0
+        assert self.index.lookup(key) is None
+
+    def test_rebuild_copies(self):
+        listeners = {"up/a/1/1/1/b/1/1/0": NamedListener("a")}
+        self.index.rebuild(listeners)
+        listeners.clear()
+        assert self.index.lookup("up/a/1/1/1/b/1/1/0").name == "a"
+
+
+class TestLruCache(unittest.TestCase):
+    def test_eviction_and_counters(self):
+        cache = LruCache(2)
+        cache.put("a", 1)
+        cache.put("b", None)
+        assert cache.get("a") == 1
+        cache.put("c", 3)
+        assert cache.get("b") is MISSING
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert (cache.hits, cache.misses) == (3, 1)
+
+        cache.resize(1)
+        assert len(cache) == 1
+        cache.clear()
+        assert (len(cache), cache.hits, cache.misses) == (0, 0, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import threading
+import unittest
+
+import pytest
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.umessage_pb2 import UMessage
+from zenoh import ZBytes
+
+from up_transport_zenoh.payloadcodec import PayloadCompression
+from up_transport_zenoh.tests.testutils import METHOD, SOURCE, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+from up_transport_zenoh.zenohutils import StreamFlag, ZenohUtils
+
+
+def request(ttl: int = 2000) -> UMessage:
+    return UMessageBuilder.request(SOURCE, METHOD, ttl).build()
+
+
+class StreamingServer(UListener):
+    def __init__(self, transport, produce):
+        self.transport = transport
+        self.produce = produce
+        self.status = None
+        # Set from the dispatcher loop of the transport
+        self.done = threading.Event()
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        self.status = await self.transport.send_response_stream(umsg.attributes, self.produce())
+        self.done.set()
+
+
+class SingleResponseServer(UListener):
+    def __init__(self, transport):
+        self.transport = transport
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        response = UMessageBuilder.response_for_request(umsg.attributes).build()
+        response.payload = b"whole"
+        await self.transport.send(response)
+
+
+class TestStreamAttachment(unittest.TestCase):
+    def test_stream_flag(self):
+        attributes = request().attributes
+        chunk = ZBytes(ZenohUtils.uattributes_to_attachment(attributes, stream=StreamFlag.CHUNK))
+        assert ZenohUtils.decode_attachment(chunk) == (attributes, None, StreamFlag.CHUNK, None)
+        end = ZBytes(ZenohUtils.uattributes_to_attachment(attributes, "zlib", StreamFlag.END))
+        assert ZenohUtils.decode_attachment(end) == (attributes, "zlib", StreamFlag.END, None)
+        assert ZenohUtils.attachment_to_uattributes(end) == attributes
+
+
+class TestResponseStream(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.transport = UPTransportZenoh.new(create_config(), SOURCE)
+
+    async def asyncTearDown(self):
+        self.transport.close()
+
+    async def serve(self, produce) -> StreamingServer:
+        server = StreamingServer(self.transport, produce)
+        await self.transport.register_listener(UriFactory.ANY, server, METHOD)
+        return server
+
+    @pytest.mark.asyncio
+    async def test_chunks(self):
+        server = await self.serve(lambda: [b"log line %d" % index for index in range(10)])
+        stream = self.transport.invoke_stream(request())
+        chunks = [chunk async for chunk in stream]
+        assert [chunk.payload for chunk in chunks] == [b"log line %d" % index for index in range(10)]
+        assert all(chunk.attributes.reqid == chunks[0].attributes.reqid for chunk in chunks)
+        assert stream.ended and stream.closed
+        assert await asyncio.to_thread(server.done.wait, 1)
+        assert server.status.code == UCode.OK
+        assert len(self.transport.query_map) == 0
+
+    @pytest.mark.asyncio
+    async def test_async_chunks(self):
+        async def produce():
+            for index in range(3):
+                await asyncio.sleep(0.01)
+                yield b"%d" % index
+
+        await self.serve(produce)
+        chunks = [chunk.payload async for chunk in self.transport.invoke_stream(request())]
+        assert chunks == [b"0", b"1", b"2"]
+
+    @pytest.mark.asyncio
+    async def test_empty_stream(self):
+        await self.serve(lambda: [])
+        chunks = [chunk.payload async for chunk in self.transport.invoke_stream(request())]
+        assert chunks == [b""]
+
+    @pytest.mark.asyncio
+    async def test_flow_control(self):
+        server = await self.serve(lambda: (b"%d" % index for index in range(50)))
+        stream = self.transport.invoke_stream(request(5000), capacity=2)
+        for index in range(3):
+            assert (await asyncio.wait_for(stream.recv(), 1)).payload == b"%d" % index
+        await asyncio.sleep(0.2)
+        # The server waits for the consumer
+        assert not server.done.is_set()
+        remaining = [chunk.payload async for chunk in stream]
+        assert remaining == [b"%d" % index for index in range(3, 50)]
+        assert await asyncio.to_thread(server.done.wait, 1)
+
+    @pytest.mark.asyncio
+    async def test_failing_producer(self):
+        def produce():
+            yield b"first"
+            raise RuntimeError("disk error")
+
+        server = await self.serve(produce)
+        stream = self.transport.invoke_stream(request())
+        with pytest.raises(UStatusError) as error:
+            async for _ in stream:
+                pass
+        assert error.value.get_code() == UCode.INTERNAL
+        assert await stream.recv() is None
+        assert await asyncio.to_thread(server.done.wait, 1)
+        assert server.status.code == UCode.INTERNAL
+
+    @pytest.mark.asyncio
+    async def test_single_response(self):
+        await self.transport.register_listener(UriFactory.ANY, SingleResponseServer(self.transport), METHOD)
+        chunks = [chunk.payload async for chunk in self.transport.invoke_stream(request())]
+        assert chunks == [b"whole"]
+
+    @pytest.mark.asyncio
+    async def test_no_server(self):
+        stream = self.transport.invoke_stream(request())
+        with pytest.raises(UStatusError) as error:
+            await asyncio.wait_for(stream.recv(), 1)
+        assert error.value.get_code() == UCode.UNAVAILABLE
+
+    @pytest.mark.asyncio
+    async def test_unknown_request(self):
+        status = await self.transport.send_response_stream(request().attributes, [b"orphan"])
+        assert status.code == UCode.INTERNAL
+
+    @pytest.mark.asyncio
+    async def test_compressed_chunks(self):
+        self.transport.compression = PayloadCompression(threshold=64)
+        chunk = b"map tile " * 100
+        await self.serve(lambda: [chunk, chunk])
+        chunks = [received.payload async for received in self.transport.invoke_stream(request())]
+        assert chunks == [chunk, chunk]
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,197 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+from uprotocol.communication.calloptions import CallOptions
+from uprotocol.communication.inmemoryrpcclient import InMemoryRpcClient
+from uprotocol.communication.upayload import UPayload
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.uattributes_pb2 import UMessageType, UPayloadFormat
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.umessage_pb2 import UMessage
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.deadlinescheduler import DeadlineScheduler
+from up_transport_zenoh.rpcengine import DEFAULT_RPC_TTL_MS, RpcEngine
+from up_transport_zenoh.tests.testutils import SOURCE, EchoServer, SilentServer, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+ECHO_METHOD = UUri(authority_name="vehicle1", ue_id=0x20, ue_version_major=1, resource_id=3)
+SILENT_METHOD = UUri(authority_name="vehicle1", ue_id=0x20, ue_version_major=1, resource_id=4)
+MISSING_METHOD = UUri(authority_name="vehicle1", ue_id=0x21, ue_version_major=1, resource_id=3)
+
+
+class ResponseCollector(UListener):
+    def __init__(self):
+        self.responses = asyncio.Queue()
+        self.loops = set()
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        self.loops.add(asyncio.get_running_loop())
+        self.responses.put_nowait(umsg)
+
+
+class TestRpcEngine(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.transport = UPTransportZenoh.new(create_config(), SOURCE)
+        await self.transport.register_listener(UriFactory.ANY, EchoServer(self.transport), ECHO_METHOD)
+        await self.transport.register_listener(UriFactory.ANY, SilentServer(), SILENT_METHOD)
+
+    async def asyncTearDown(self):
+        self.transport.close()
+
+    @pytest.mark.asyncio
+    async def test_invoke(self):
+        request = UMessageBuilder.request(SOURCE, ECHO_METHOD, 1000).build()
+        request.payload = b"ping"
+        response = await self.transport.invoke(request)
+        assert response.attributes.type == UMessageType.UMESSAGE_TYPE_RESPONSE
+        assert response.attributes.reqid == request.attributes.id
+        assert response.payload == b"ping"
+        assert self.transport.rpc_engine.pending_count == 0
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_use_no_thread_per_request(self):
+        threads_before = threading.active_count()
+        requests = [UMessageBuilder.request(SOURCE, ECHO_METHOD, 2000).build() for _ in range(200)]
+        responses = await asyncio.gather(*[self.transport.invoke(request) for request in requests])
+        assert [r.attributes.reqid for r in responses] == [r.attributes.id for r in requests]
+        # Only the expiry threads of the pending requests and of the pending queries (server side) are started
+        assert threading.active_count() <= threads_before + 2
+
+    @pytest.mark.asyncio
+    async def test_deadline_exceeded(self):
+        request = UMessageBuilder.request(SOURCE, SILENT_METHOD, 200).build()
+        start = time.monotonic()
+        with pytest.raises(UStatusError) as error:
+            await self.transport.invoke(request)
+        assert error.value.get_code() == UCode.DEADLINE_EXCEEDED
+        assert 0.15 < time.monotonic() - start < 1
+
+    @pytest.mark.asyncio
+    async def test_deadline_exceeded_when_server_drops_query(self):
+        # The server drops the unanswered query as the request expires, racing the deadline of the client
+        for _ in range(20):
+            requests = [UMessageBuilder.request(SOURCE, SILENT_METHOD, 50).build() for _ in range(5)]
+            results = await asyncio.gather(
+                *(self.transport.invoke(request) for request in requests), return_exceptions=True
+            )
+            assert [result.get_code() for result in results] == [UCode.DEADLINE_EXCEEDED] * 5
+
+    @pytest.mark.asyncio
+    async def test_unavailable_without_server(self):
+        request = UMessageBuilder.request(SOURCE, MISSING_METHOD, 5000).build()
+        start = time.monotonic()
+        with pytest.raises(UStatusError) as error:
+            await self.transport.invoke(request)
+        assert error.value.get_code() == UCode.UNAVAILABLE
+        assert time.monotonic() - start < 1
+
+    @pytest.mark.asyncio
+    async def test_response_listener_receives_deadline_exceeded(self):
+        collector = ResponseCollector()
+        await self.transport.register_listener(SILENT_METHOD, collector, SOURCE)
+        request = UMessageBuilder.request(SOURCE, SILENT_METHOD, 200).build()
+        status = await self.transport.send(request)
+        assert status.code == UCode.OK
+
+        response = await asyncio.wait_for(collector.responses.get(), 2)
+        assert response.attributes.commstatus == UCode.DEADLINE_EXCEEDED
+        assert response.attributes.reqid == request.attributes.id
+        # On the loop the request was sent from
+        assert collector.loops == {asyncio.get_running_loop()}
+
+    @pytest.mark.asyncio
+    async def test_invoke_method(self):
+        client = InMemoryRpcClient(self.transport)
+        payload = UPayload.pack_from_data_and_format(b"ping", UPayloadFormat.UPAYLOAD_FORMAT_RAW)
+        response = await client.invoke_method(ECHO_METHOD, payload, CallOptions(1000))
+        assert response.data == b"ping"
+
+    @pytest.mark.asyncio
+    async def test_server_answers_while_application_loop_blocked(self):
+        server = UPTransportZenoh.new(create_config(), SOURCE, share_session=True)
+        await server.register_listener(UriFactory.ANY, EchoServer(server), ECHO_METHOD)
+
+        async def call() -> UPayload:
+            with UPTransportZenoh.new(create_config(), SOURCE, share_session=True) as transport:
+                client = InMemoryRpcClient(transport)
+                payload = UPayload.pack_from_data_and_format(b"ping", UPayloadFormat.UPAYLOAD_FORMAT_RAW)
+                return await client.invoke_method(ECHO_METHOD, payload, CallOptions(2000))
+
+        with ThreadPoolExecutor(1) as executor:
+            # Blocks the loop the server was registered from until the client got its response
+            try:
+                response = executor.submit(asyncio.run, call()).result(timeout=5)
+            finally:
+                server.close()
+        assert response.data == b"ping"
+
+    @pytest.mark.asyncio
+    async def test_duplicated_request(self):
+        request = UMessageBuilder.request(SOURCE, SILENT_METHOD, 500).build()
+        task = asyncio.ensure_future(self.transport.invoke(request))
+        await asyncio.sleep(0.05)
+        with pytest.raises(UStatusError) as error:
+            await self.transport.invoke(request)
+        assert error.value.get_code() == UCode.ALREADY_EXISTS
+        with pytest.raises(UStatusError):
+            await task
+
+    def test_unset_ttl_uses_default(self):
+        engine = RpcEngine(dispatcher=None)
+        request = UMessageBuilder.request(SOURCE, ECHO_METHOD, 0).build()
+        request.attributes.ClearField("ttl")
+        assert engine.get_ttl_ms(request.attributes) == DEFAULT_RPC_TTL_MS
+        request.attributes.ttl = 250
+        assert engine.get_ttl_ms(request.attributes) == 250
+        engine.close()
+
+    def test_send_after_close(self):
+        engine = RpcEngine(dispatcher=None)
+        engine.close()
+        request = UMessageBuilder.request(SOURCE, ECHO_METHOD, 1000).build()
+        with pytest.raises(UStatusError) as error:
+            engine.send_request(MagicMock(), "up/key", b"", [], request.attributes)
+        assert error.value.get_code() == UCode.FAILED_PRECONDITION
+        assert engine.pending_count == 0
+
+
+class TestDeadlineScheduler(unittest.TestCase):
+    def test_callbacks_run_in_deadline_order(self):
+        scheduler = DeadlineScheduler()
+        fired = []
+        done = threading.Event()
+        scheduler.schedule(0.15, lambda: (fired.append("late"), done.set()))
+        scheduler.schedule(0.05, lambda: fired.append("early"))
+        scheduler.schedule(0.1, lambda: fired.append("cancelled")).cancel()
+        assert done.wait(2)
+        assert fired == ["early", "late"]
+        scheduler.close()
+        with pytest.raises(RuntimeError):
+            scheduler.schedule(0.1, lambda: None)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,161 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import unittest
+
+import pytest
+import zenoh
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.umessage_pb2 import UMessage
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.metrics import RPC_HEDGED, InMemoryMetrics
+from up_transport_zenoh.responsecache import method_key
+from up_transport_zenoh.rpcpolicy import (
+    DISCOVERY_INTERVAL,
+    ReplierSelection,
+    ReplierSelector,
+    RpcPolicies,
+    RpcPolicy,
+    RpcTarget,
+)
+from up_transport_zenoh.tests.testutils import METHOD, SOURCE, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+SERVER = UUri(authority_name="vehicle1", ue_id=0x20, ue_version_major=1)
+OTHER_METHOD = UUri(authority_name="vehicle1", ue_id=0x20, ue_version_major=1, resource_id=4)
+METHOD_KEY = method_key(METHOD)
+
+
+class Server(UListener):
+    def __init__(self, transport: UPTransportZenoh, name: bytes, delay: float = 0):
+        self.transport = transport
+        self.name = name
+        self.delay = delay
+        self.calls = 0
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        message = UMessageBuilder.response_for_request(umsg.attributes).build()
+        message.payload = self.name
+        await self.transport.send(message)
+
+
+class TestRpcPolicy(unittest.IsolatedAsyncioTestCase):
+    def test_policies(self):
+        with pytest.raises(ValueError):
+            RpcPolicy(hedge_delay=0)
+        # The second query would go back to the same server
+        with pytest.raises(ValueError):
+            RpcPolicy(hedge_delay=0.05)
+        hedged = RpcPolicy(target=RpcTarget.ALL, hedge_delay=0.05)
+        policies = RpcPolicies()
+        policies.set(METHOD, hedged)
+        assert policies.for_method(METHOD) is hedged
+        assert policies.for_method(OTHER_METHOD) is RpcPolicy.DEFAULT
+        policies.remove(METHOD)
+        assert policies.for_method(METHOD) is RpcPolicy.DEFAULT
+        assert RpcTarget.ALL.query_target == zenoh.QueryTarget.ALL
+
+    def test_selector(self):
+        selector = ReplierSelector(smoothing=0.5)
+        # Nothing known yet, every server is asked
+        assert selector.select(METHOD_KEY, ReplierSelection.LEAST_LATENCY) is None
+        selector.record(METHOD_KEY, "a", 0.1)
+        selector.record(METHOD_KEY, "b", 0.2)
+        selector.record(METHOD_KEY, "a", 0.5)
+        assert selector.latencies(METHOD_KEY) == pytest.approx({"a": 0.3, "b": 0.2})
+
+        assert selector.select(METHOD_KEY, ReplierSelection.LEAST_LATENCY) == "b"
+        assert selector.select(METHOD_KEY, ReplierSelection.LEAST_LATENCY, exclude=("b",)) == "a"
+        turns = [selector.select(METHOD_KEY, ReplierSelection.ROUND_ROBIN) for _ in range(DISCOVERY_INTERVAL)]
+        # One request in DISCOVERY_INTERVAL goes to every server, the others alternate
+        assert turns.count(None) == 1
+        assert turns.count("a") + turns.count("b") == DISCOVERY_INTERVAL - 1
+        assert abs(turns.count("a") - turns.count("b")) <= 1
+
+        selector.forget(METHOD_KEY, "b")
+        assert selector.latencies(METHOD_KEY).keys() == {"a"}
+        assert selector.select(METHOD_KEY, ReplierSelection.ROUND_ROBIN, exclude=("a",), discover=False) is None
+
+    @pytest.mark.asyncio
+    async def test_hedged_request(self):
+        metrics = InMemoryMetrics()
+        policies = RpcPolicies(RpcPolicy(target=RpcTarget.ALL, hedge_delay=0.1))
+        client = UPTransportZenoh.new(create_config(), SOURCE, metrics=metrics, rpc_policies=policies)
+        server = Server(client, b"server", delay=0.3)
+        try:
+            await client.register_listener(UriFactory.ANY, server, METHOD)
+            await asyncio.sleep(0.1)
+            request = UMessageBuilder.request(SOURCE, METHOD, 2000).build()
+            response = await client.invoke(request)
+            assert response.payload == b"server"
+            # The first reply completes the request, the second query is dropped
+            assert server.calls == 2
+            assert metrics.snapshot()["counters"][RPC_HEDGED] == 1
+
+            # Not hedged when the reply comes in time
+            server.delay = 0
+            await client.invoke(UMessageBuilder.request(SOURCE, METHOD, 2000).build())
+            assert metrics.snapshot()["counters"][RPC_HEDGED] == 1
+            await asyncio.sleep(0.4)
+            assert client.rpc_engine.pending_count == 0
+        finally:
+            client.close()
+
+    @pytest.mark.asyncio
+    async def test_least_latency_selection(self):
+        policy = RpcPolicy(selection=ReplierSelection.LEAST_LATENCY)
+        policies = RpcPolicies()
+        policies.set(METHOD, policy)
+        # Two instances of the server, on the session of the client
+        client = UPTransportZenoh.new(create_config(), SOURCE, share_session=True, rpc_policies=policies)
+        fast_transport = UPTransportZenoh.new(create_config(), SERVER, share_session=True)
+        slow_transport = UPTransportZenoh.new(create_config(), SERVER, share_session=True)
+        fast = Server(fast_transport, b"fast")
+        slow = Server(slow_transport, b"slow", delay=0.1)
+        try:
+            await fast_transport.register_listener(UriFactory.ANY, fast, METHOD)
+            await slow_transport.register_listener(UriFactory.ANY, slow, METHOD)
+            await asyncio.sleep(0.1)
+
+            # The first request is answered by both, and measures them
+            assert (await client.invoke(UMessageBuilder.request(SOURCE, METHOD, 2000).build())).payload == b"fast"
+            await asyncio.sleep(0.2)
+            latencies = client.rpc_engine.selector.latencies(METHOD_KEY)
+            assert latencies.keys() == {fast_transport.replier_id, slow_transport.replier_id}
+            assert latencies[fast_transport.replier_id] < latencies[slow_transport.replier_id]
+
+            for _ in range(5):
+                response = await client.invoke(UMessageBuilder.request(SOURCE, METHOD, 2000).build())
+                assert response.payload == b"fast"
+            assert (fast.calls, slow.calls) == (6, 1)
+
+            # The selected server is gone, the request falls back to every server
+            fast_transport.close()
+            response = await client.invoke(UMessageBuilder.request(SOURCE, METHOD, 2000).build())
+            assert response.payload == b"slow"
+            assert fast_transport.replier_id not in client.rpc_engine.selector.latencies(METHOD_KEY)
+        finally:
+            slow_transport.close()
+            fast_transport.close()
+            client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
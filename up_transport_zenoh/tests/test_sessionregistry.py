@@ -0,0 +1,100 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import unittest
+
+import pytest
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.sessionregistry import SESSIONS, SessionRegistry, config_key
+from up_transport_zenoh.tests.testutils import TOPIC, Collector, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+PUBLISHER = UUri(authority_name="vehicle1", ue_id=0x18, ue_version_major=1)
+SUBSCRIBER = UUri(authority_name="vehicle1", ue_id=0x19, ue_version_major=1)
+
+
+class FakeSession:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class TestSessionRegistry(unittest.IsolatedAsyncioTestCase):
+    def test_config_key(self):
+        assert config_key(create_config()) == config_key(create_config())
+        other = create_config()
+        other.insert_json5("listen/endpoints", '["tcp/127.0.0.1:0"]')
+        assert config_key(other) != config_key(create_config())
+
+    def test_reference_counting(self):
+        opened = []
+
+        def open_session(config):
+            opened.append(FakeSession())
+            return opened[-1]
+
+        registry = SessionRegistry(open_session)
+        first = registry.acquire(create_config())
+        second = registry.acquire(create_config())
+        assert first is second
+        assert len(opened) == 1
+        assert registry.holders(first) == 2
+        other = registry.acquire(create_config(), key="other")
+        assert other is not first
+        assert len(registry) == 2
+
+        assert not registry.release(first)
+        assert not first.closed
+        assert registry.release(second)
+        assert first.closed
+        assert registry.holders(first) == 0
+        # Not held anymore
+        assert not registry.release(first)
+        assert registry.release(other)
+        assert len(registry) == 0
+
+    @pytest.mark.asyncio
+    async def test_shared_session(self):
+        publisher = UPTransportZenoh.new(create_config(), PUBLISHER, share_session=True)
+        subscriber = UPTransportZenoh.new(create_config(), SUBSCRIBER, share_session=True)
+        try:
+            assert publisher.session is subscriber.session
+            assert SESSIONS.holders(publisher.session) == 2
+            listener = Collector()
+            await subscriber.register_listener(TOPIC, listener)
+            await publisher.send(UMessageBuilder.publish(TOPIC).build())
+            message = await asyncio.wait_for(listener.received.get(), 1)
+            assert message.attributes.source == TOPIC
+        finally:
+            publisher.close()
+            assert SESSIONS.holders(subscriber.session) == 1
+            subscriber.close()
+        assert SESSIONS.holders(subscriber.session) == 0
+
+    def test_own_session(self):
+        first = UPTransportZenoh.new(create_config(), PUBLISHER)
+        second = UPTransportZenoh.new(create_config(), SUBSCRIBER)
+        assert first.session is not second.session
+        assert first.session_registry is None
+        first.close()
+        second.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
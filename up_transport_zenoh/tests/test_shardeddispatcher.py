@@ -0,0 +1,169 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import random
+import threading
+import time
+import unittest
+
+import pytest
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.umessage_pb2 import UMessage
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.shardeddispatcher import ShardedDispatcher
+from up_transport_zenoh.tests.testutils import METHOD, SOURCE, NestedServer, create_config
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+NESTED_METHOD = UUri(authority_name="vehicle1", ue_id=0x20, ue_version_major=1, resource_id=4)
+
+
+def message_from(ue_id: int, payload: bytes) -> UMessage:
+    umsg = UMessageBuilder.publish(UUri(authority_name="vehicle1", ue_id=ue_id, resource_id=0x8001)).build()
+    umsg.payload = payload
+    return umsg
+
+
+class RecordingListener(UListener):
+    def __init__(self, delay: float = 0.0, blocking: bool = False):
+        self.delay = delay
+        self.blocking = blocking
+        self.received = {}
+        self.threads = {}
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        ue_id = umsg.attributes.source.ue_id
+        # Recorded when started, the coroutines of a worker then run concurrently
+        self.received.setdefault(ue_id, []).append(umsg.payload)
+        self.threads.setdefault(ue_id, set()).add(threading.current_thread())
+        if self.blocking:
+            time.sleep(self.delay)
+        else:
+            await asyncio.sleep(random.uniform(0, self.delay))
+
+
+async def wait_all(futures):
+    await asyncio.gather(*[asyncio.wrap_future(future) for future in futures])
+
+
+class TestShardedDispatcher(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.dispatcher = ShardedDispatcher(4)
+
+    async def asyncTearDown(self):
+        self.dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_order_per_source(self):
+        listener = RecordingListener(delay=0.01)
+        futures = [
+            self.dispatcher.dispatch(listener, message_from(ue_id, b"%d" % index))
+            for index in range(10)
+            for ue_id in range(1, 9)
+        ]
+        await wait_all(futures)
+        for ue_id in range(1, 9):
+            assert listener.received[ue_id] == [b"%d" % index for index in range(10)]
+            # A source sticks to its worker
+            assert len(listener.threads[ue_id]) == 1
+
+    @pytest.mark.asyncio
+    async def test_sources_in_parallel(self):
+        dispatcher = ShardedDispatcher(2, shard_key=lambda message: message.attributes.source.ue_id)
+        listener = RecordingListener(delay=0.2, blocking=True)
+        start = time.monotonic()
+        futures = [dispatcher.dispatch(listener, message_from(ue_id, b"")) for ue_id in (1, 2, 1, 2)]
+        await wait_all(futures)
+        elapsed = time.monotonic() - start
+        dispatcher.close()
+        # Two workers run two blocking listeners each, side by side
+        assert elapsed < 0.7
+        assert listener.threads[1] != listener.threads[2]
+
+    @pytest.mark.asyncio
+    async def test_custom_shard_key(self):
+        dispatcher = ShardedDispatcher(3, shard_key=lambda message: 0)
+        listener = RecordingListener()
+        await wait_all([dispatcher.dispatch(listener, message_from(ue_id, b"")) for ue_id in range(1, 9)])
+        dispatcher.close()
+        assert len(set.union(*listener.threads.values())) == 1
+
+    @pytest.mark.asyncio
+    async def test_failing_shard_key(self):
+        def shard_key(message):
+            raise ValueError("no key")
+
+        dispatcher = ShardedDispatcher(2, shard_key=shard_key)
+        assert dispatcher.dispatch(RecordingListener(), message_from(1, b"")) is None
+        dispatcher.close()
+
+    def test_invalid_workers(self):
+        with pytest.raises(ValueError):
+            ShardedDispatcher(0)
+        assert ShardedDispatcher().num_workers >= 1
+
+
+class EchoServer(UListener):
+    def __init__(self, transport):
+        self.transport = transport
+        self.threads = set()
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        self.threads.add(threading.current_thread())
+        response = UMessageBuilder.response_for_request(umsg.attributes).build()
+        response.payload = umsg.payload
+        await self.transport.send(response)
+
+
+class TestShardedTransport(unittest.IsolatedAsyncioTestCase):
+    @pytest.mark.asyncio
+    async def test_request_listener(self):
+        dispatcher = ShardedDispatcher(2)
+        transport = UPTransportZenoh.new(create_config(), SOURCE, dispatcher=dispatcher)
+        server = EchoServer(transport)
+        await transport.register_listener(UriFactory.ANY, server, METHOD)
+
+        for index in range(3):
+            request = UMessageBuilder.request(SOURCE, METHOD, 1000).build()
+            request.payload = b"%d" % index
+            assert (await transport.invoke(request)).payload == b"%d" % index
+        # All the requests come from the same source
+        assert len(server.threads) == 1
+        assert threading.current_thread() not in server.threads
+        transport.close()
+        dispatcher.close()
+
+    @pytest.mark.asyncio
+    async def test_nested_rpc(self):
+        # The nested request comes from the same source, so it's handled by the worker of the first one
+        dispatcher = ShardedDispatcher(1)
+        transport = UPTransportZenoh.new(create_config(), SOURCE, dispatcher=dispatcher)
+        try:
+            await transport.register_listener(UriFactory.ANY, EchoServer(transport), NESTED_METHOD)
+            await transport.register_listener(UriFactory.ANY, NestedServer(transport, NESTED_METHOD), METHOD)
+            request = UMessageBuilder.request(SOURCE, METHOD, 2000).build()
+            request.payload = b"ping"
+            start = time.monotonic()
+            assert (await transport.invoke(request)).payload == b"ping"
+            assert time.monotonic() - start < 1
+        finally:
+            transport.close()
+            dispatcher.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
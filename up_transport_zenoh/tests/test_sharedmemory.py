@@ -0,0 +1,47 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import json
+import unittest
+
+import pytest
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+
+from up_transport_zenoh.tests.testutils import SOURCE, TOPIC, Collector, create_config
+from up_transport_zenoh.uptransportzenoh import SHARED_MEMORY_CONFIG_KEY, UPTransportZenoh
+
+
+class TestSharedMemory(unittest.IsolatedAsyncioTestCase):
+    @pytest.mark.asyncio
+    async def test_large_payload(self):
+        config = create_config()
+        with UPTransportZenoh.new(config, SOURCE, shared_memory=True) as transport:
+            assert json.loads(config.get_json(SHARED_MEMORY_CONFIG_KEY)) is True
+            listener = Collector()
+            await transport.register_listener(TOPIC, listener)
+            message = UMessageBuilder.publish(TOPIC).build()
+            message.payload = bytes(range(256)) * 4096
+            await transport.send(message)
+            received = await asyncio.wait_for(listener.received.get(), 2)
+            assert received.payload == message.payload
+
+    def test_disabled_by_default(self):
+        config = create_config()
+        with UPTransportZenoh.new(config, SOURCE):
+            assert json.loads(config.get_json(SHARED_MEMORY_CONFIG_KEY)) is False
+
+
+if __name__ == "__main__":
+    unittest.main()
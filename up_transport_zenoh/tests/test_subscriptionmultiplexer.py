@@ -0,0 +1,144 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+
+import pytest
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.umessage_pb2 import UMessage
+
+from up_transport_zenoh.metrics import ATTACHMENT_DECODE, InMemoryMetrics
+from up_transport_zenoh.subscriptionmultiplexer import SubscriptionMultiplexer
+from up_transport_zenoh.tests.testutils import SOURCE, TOPIC, Collector, create_config
+from up_transport_zenoh.ubufferlistener import UBufferListener
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+from up_transport_zenoh.zenohutils import ZenohUtils
+
+
+class QueueBufferListener(UBufferListener):
+    def __init__(self):
+        self.received = asyncio.Queue()
+        self.loop = asyncio.get_running_loop()
+
+    async def on_receive_buffer(self, umsg: UMessage, payload: memoryview) -> None:
+        # Runs on a dispatcher loop
+        self.loop.call_soon_threadsafe(self.received.put_nowait, bytes(payload))
+
+
+class TestSubscriptionMultiplexer(unittest.TestCase):
+    def test_reference_counting(self):
+        declare = MagicMock()
+        multiplexer = SubscriptionMultiplexer(declare, MagicMock())
+        first, second = Collector(), Collector()
+
+        assert multiplexer.add("up/key", first)
+        assert multiplexer.add("up/key", second)
+        assert not multiplexer.add("up/key", first)
+        declare.assert_called_once()
+        assert multiplexer.listeners("up/key") == (first, second)
+
+        assert multiplexer.remove("up/key", first)
+        assert not multiplexer.remove("up/key", first)
+        declare.return_value.undeclare.assert_not_called()
+        assert multiplexer.remove("up/key", second)
+        declare.return_value.undeclare.assert_called_once()
+        assert len(multiplexer) == 0
+
+    def test_bulk(self):
+        declare = MagicMock()
+        multiplexer = SubscriptionMultiplexer(declare, MagicMock())
+        first, second = Collector(), Collector()
+        multiplexer.add("up/a", first)
+
+        results = multiplexer.add_many([("up/a", second), ("up/b", first), ("up/b", second), ("up/a", first)])
+        assert results == [True, True, True, False]
+        # up/a was declared by add, up/b once for both its listeners
+        assert declare.call_count == 2
+        assert multiplexer.listeners("up/b") == (first, second)
+
+        assert multiplexer.remove_many([("up/b", first), ("up/b", second), ("up/b", second)]) == [True, True, False]
+        declare.return_value.undeclare.assert_called_once()
+        assert len(multiplexer) == 1
+
+    def test_bulk_declare_failure(self):
+        error = RuntimeError("declare failed")
+        multiplexer = SubscriptionMultiplexer(MagicMock(side_effect=[MagicMock(), error]), MagicMock())
+        listener = Collector()
+        assert multiplexer.add_many([("up/a", listener), ("up/b", listener)]) == [True, error]
+        assert len(multiplexer) == 1
+
+    def test_callback_sees_current_listeners(self):
+        declare = MagicMock()
+        on_sample = MagicMock()
+        multiplexer = SubscriptionMultiplexer(declare, on_sample)
+        first, second = Collector(), Collector()
+        multiplexer.add("up/key", first)
+        callback = declare.call_args.args[1]
+        multiplexer.add("up/key", second)
+
+        callback("sample")
+        on_sample.assert_called_once_with((first, second), "sample")
+
+
+class TestSharedSubscriber(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.metrics = InMemoryMetrics()
+        ZenohUtils.set_metrics(self.metrics)
+        self.transport = UPTransportZenoh.new(create_config(), SOURCE)
+
+    async def asyncTearDown(self):
+        ZenohUtils.set_metrics(None)
+        self.transport.close()
+
+    @pytest.mark.asyncio
+    async def test_fan_out(self):
+        listeners = [Collector(), Collector(), QueueBufferListener()]
+        for listener in listeners:
+            await self.transport.register_listener(TOPIC, listener)
+        assert len(self.transport.subscriptions) == 1
+
+        message = UMessageBuilder.publish(TOPIC).build()
+        message.payload = b"speed"
+        await self.transport.send(message)
+        first = await asyncio.wait_for(listeners[0].received.get(), 2)
+        second = await asyncio.wait_for(listeners[1].received.get(), 2)
+        payload = await asyncio.wait_for(listeners[2].received.get(), 2)
+
+        # Decoded once, the listeners share the message
+        assert self.metrics.histograms[ATTACHMENT_DECODE].count == 1
+        assert first is second
+        assert first.payload == b"speed"
+        assert payload == b"speed"
+
+    @pytest.mark.asyncio
+    async def test_unregister(self):
+        first, second = Collector(), Collector()
+        await self.transport.register_listener(TOPIC, first)
+        await self.transport.register_listener(TOPIC, second)
+
+        assert (await self.transport.unregister_listener(TOPIC, first)).code == UCode.OK
+        await self.transport.send(UMessageBuilder.publish(TOPIC).build())
+        await asyncio.wait_for(second.received.get(), 2)
+        assert first.received.empty()
+
+        assert (await self.transport.unregister_listener(TOPIC, second)).code == UCode.OK
+        assert len(self.transport.subscriptions) == 0
+        assert (await self.transport.unregister_listener(TOPIC, second)).code == UCode.NOT_FOUND
+
+
+if __name__ == "__main__":
+    unittest.main()
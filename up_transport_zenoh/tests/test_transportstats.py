@@ -0,0 +1,133 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import json
+import unittest
+
+import pytest
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.uri.factory.uri_factory import UriFactory
+from uprotocol.v1.umessage_pb2 import UMessage
+from uprotocol.v1.uri_pb2 import UUri
+
+from up_transport_zenoh.tests.testutils import SOURCE, TOPIC, create_config
+from up_transport_zenoh.transportstats import RATE_WINDOW, RateCounter, TransportStats, admin_key
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+from up_transport_zenoh.zenohutils import ZenohUtils
+
+METHOD = UUri(authority_name="vehicle1", ue_id=0x18, ue_version_major=1, resource_id=3)
+
+
+def with_payload(message: UMessage, payload: bytes) -> UMessage:
+    message.payload = payload
+    return message
+
+
+class Server(UListener):
+    def __init__(self, transport: UPTransportZenoh):
+        self.transport = transport
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        if umsg.attributes.sink.resource_id == METHOD.resource_id:
+            await self.transport.send(
+                with_payload(UMessageBuilder.response_for_request(umsg.attributes).build(), b"pong")
+            )
+
+
+class TestTransportStats(unittest.IsolatedAsyncioTestCase):
+    def test_rates(self):
+        counter = RateCounter(now=0)
+        for _ in range(3):
+            counter.add(10, now=0.5)
+        assert counter.snapshot(now=0.9)["messages_per_s"] == 0
+        counter.add(10, now=1.2)
+        assert counter.snapshot(now=1.5) == {
+            "messages": 4,
+            "bytes": 40,
+            "messages_per_s": 3 / RATE_WINDOW,
+            "bytes_per_s": 30 / RATE_WINDOW,
+        }
+        assert counter.snapshot(now=2.1)["messages_per_s"] == 1 / RATE_WINDOW
+        # Quiet for a whole window
+        assert counter.snapshot(now=4.0)["messages_per_s"] == 0
+
+    def test_max_keys(self):
+        stats = TransportStats(max_keys=2)
+        stats.message_sent("a", 1)
+        stats.message_received("b", 2)
+        stats.message_sent("a", 1)
+        stats.message_sent("c", 3)
+        keys = stats.keys()
+        assert list(keys) == ["a", "c"]
+        assert keys["a"]["sent"]["messages"] == 2
+        assert keys["a"]["received"]["messages"] == 0
+
+    @pytest.mark.asyncio
+    async def test_admin_query(self):
+        transport = UPTransportZenoh.new(create_config(), SOURCE, introspection=True)
+        server = Server(transport)
+        try:
+            await transport.register_listener(TOPIC, server)
+            await transport.register_listener(UriFactory.ANY, server, METHOD)
+            await asyncio.sleep(0.1)
+            for _ in range(3):
+                await transport.send(with_payload(UMessageBuilder.publish(TOPIC).build(), b"12345"))
+            response = await transport.invoke(
+                with_payload(UMessageBuilder.request(SOURCE, METHOD, 1000).build(), b"ping")
+            )
+            assert response.payload == b"pong"
+            # A sample without attachment can't be decoded
+            transport.session.put(ZenohUtils.to_zenoh_key_string("vehicle1", TOPIC), b"garbage")
+            await asyncio.sleep(0.1)
+
+            replies = transport.session.get("up/vehicle1/@transport/**", timeout=1)
+            snapshots = [json.loads(bytes(reply.ok.payload)) for reply in replies]
+            assert len(snapshots) == 1
+            snapshot = snapshots[0]
+            assert snapshot["instance"] == transport.replier_id
+            assert len(snapshot["subscribers"]) == 1
+            assert list(snapshot["subscribers"].values()) == [1]
+            assert list(snapshot["queryables"].values()) == [1]
+            assert snapshot["pending_queries"]["size"] == 0
+            assert sum(snapshot["pending_queries"]["ages"].values()) == 0
+            assert snapshot["pending_queries"]["held"]["count"] == 1
+            assert snapshot["decode_failures"] == 1
+
+            topic_key = ZenohUtils.to_zenoh_key_string("vehicle1", TOPIC)
+            assert snapshot["keys"][topic_key]["sent"]["messages"] == 3
+            assert snapshot["keys"][topic_key]["sent"]["bytes"] == 15
+            assert snapshot["keys"][topic_key]["received"]["messages"] == 3
+            request_key = ZenohUtils.to_zenoh_key_string("vehicle1", SOURCE, METHOD)
+            assert snapshot["keys"][request_key]["sent"]["messages"] == 2
+            assert snapshot["keys"][request_key]["received"]["messages"] == 1
+        finally:
+            transport.close()
+
+    @pytest.mark.asyncio
+    async def test_disabled_by_default(self):
+        transport = UPTransportZenoh.new(create_config(), SOURCE)
+        try:
+            assert transport.stats is None
+            assert transport.admin_queryable is None
+            assert "keys" not in transport.introspect()
+            replies = list(transport.session.get(admin_key(SOURCE, transport.replier_id), timeout=0.2))
+            assert replies == []
+        finally:
+            transport.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
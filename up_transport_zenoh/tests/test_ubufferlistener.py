@@ -0,0 +1,89 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+import unittest
+
+import pytest
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.v1.umessage_pb2 import UMessage
+
+from up_transport_zenoh.tests.testutils import SOURCE, TOPIC, Collector, create_config
+from up_transport_zenoh.ubufferlistener import UBufferListener
+from up_transport_zenoh.uptransportzenoh import UPTransportZenoh
+
+
+class ViewListener(UBufferListener):
+    def __init__(self):
+        self.received = asyncio.Queue()
+        self.loop = asyncio.get_running_loop()
+
+    async def on_receive_buffer(self, umsg: UMessage, payload: memoryview) -> None:
+        self.view = payload
+        # Runs on a dispatcher loop
+        self.loop.call_soon_threadsafe(self.received.put_nowait, (umsg, payload.readonly, bytes(payload)))
+
+
+class TestUBufferListener(unittest.IsolatedAsyncioTestCase):
+    @pytest.mark.asyncio
+    async def test_payload_view(self):
+        transport = UPTransportZenoh.new(create_config(), SOURCE)
+        listener = ViewListener()
+        await transport.register_listener(TOPIC, listener)
+
+        message = UMessageBuilder.publish(TOPIC).build()
+        message.payload = b"\x00" * 1024 * 1024
+        await transport.send(message)
+
+        umsg, readonly, payload = await asyncio.wait_for(listener.received.get(), 2)
+        assert umsg.attributes == message.attributes
+        assert umsg.payload == b""
+        assert readonly
+        assert payload == message.payload
+
+        # The view is released once the listener returned
+        await asyncio.sleep(0.05)
+        with pytest.raises(ValueError):
+            len(listener.view)
+
+        transport.close()
+
+    @pytest.mark.asyncio
+    async def test_with_regular_listener(self):
+        transport = UPTransportZenoh.new(create_config(), SOURCE)
+        listener = ViewListener()
+        collector = Collector()
+        # The buffer listener is handed the message first, it already carries the payload of the other one
+        await transport.register_listener(TOPIC, listener)
+        await transport.register_listener(TOPIC, collector)
+
+        message = UMessageBuilder.publish(TOPIC).build()
+        message.payload = b"shared"
+        await transport.send(message)
+
+        umsg, _, payload = await asyncio.wait_for(listener.received.get(), 2)
+        assert umsg.payload == payload == b"shared"
+        assert (await collector.get(2)).payload == b"shared"
+        transport.close()
+
+    @pytest.mark.asyncio
+    async def test_message_with_payload(self):
+        listener = ViewListener()
+        await listener.on_receive(UMessage(payload=b"abc"))
+        _, _, payload = await asyncio.wait_for(listener.received.get(), 1)
+        assert payload == b"abc"
+
+
+if __name__ == "__main__":
+    unittest.main()
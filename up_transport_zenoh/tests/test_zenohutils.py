@@ -15,9 +15,15 @@ SPDX-License-Identifier: Apache-2.0
 import unittest
 
 import pytest
+from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
 from uprotocol.uri.serializer.uriserializer import UriSerializer
+from uprotocol.v1.ucode_pb2 import UCode
+from uprotocol.v1.umessage_pb2 import UMessage
+from uprotocol.v1.uri_pb2 import UUri
+from zenoh import ZBytes
 
-from up_transport_zenoh.zenohutils import MessageFlag, ZenohUtils
+from up_transport_zenoh.zenohutils import DEFAULT_KEY_CACHE_SIZE, MessageFlag, ZenohUtils
 
 
 class TestZenohUtils(unittest.IsolatedAsyncioTestCase):
@@ -48,6 +54,50 @@ class TestZenohUtils(unittest.IsolatedAsyncioTestCase):
                 print("result2 ", result_key2)
                 assert result_key2 == expected_zenoh_key
 
+    @pytest.mark.asyncio
+    async def test_to_zenoh_key_string_cache(self):
+        ZenohUtils.clear_key_cache()
+        src = UriSerializer().deserialize("//192.168.1.100/10AB/3/80CD")
+        sink = UriSerializer().deserialize("//192.168.1.101/20EF/4/0")
+        expected_zenoh_key = "up/192.168.1.100/10AB/3/80CD/192.168.1.101/20EF/4/0"
+        for _ in range(3):
+            assert ZenohUtils.to_zenoh_key_string("host", src, sink) == expected_zenoh_key
+        assert ZenohUtils.to_zenoh_key_string("host", src, UUri()) == "up/192.168.1.100/10AB/3/80CD/{}/{}/{}/{}"
+        assert ZenohUtils.to_zenoh_key_string("host", src, None) == "up/192.168.1.100/10AB/3/80CD/{}/{}/{}/{}"
+        # The default authority is part of the cache key
+        local = UriSerializer().deserialize("/10AB/3/80CD")
+        assert ZenohUtils.to_zenoh_key_string("host1", local) == "up/host1/10AB/3/80CD/{}/{}/{}/{}"
+        assert ZenohUtils.to_zenoh_key_string("host2", local) == "up/host2/10AB/3/80CD/{}/{}/{}/{}"
+        assert ZenohUtils.key_cache_info() == (3, 4, DEFAULT_KEY_CACHE_SIZE, 4)
+
+        ZenohUtils.set_key_cache_size(2)
+        assert ZenohUtils.key_cache_info().currsize == 2
+        ZenohUtils.set_key_cache_size(DEFAULT_KEY_CACHE_SIZE)
+        ZenohUtils.clear_key_cache()
+
+    @pytest.mark.asyncio
+    async def test_attachment_to_uattributes(self):
+        source = UriSerializer().deserialize("//192.168.1.100/10AB/3/80CD")
+        attributes = UMessageBuilder.publish(source).with_token("t" * 300).build().attributes
+        attachment = ZBytes(ZenohUtils.uattributes_to_attachment(attributes))
+
+        assert ZenohUtils.attachment_to_uattributes(attachment) == attributes
+        assert ZenohUtils.attachment_to_uattributes(bytes(attachment)) == attributes
+        message = UMessage()
+        assert ZenohUtils.attachment_to_uattributes(attachment, message.attributes) is message.attributes
+        assert message.attributes == attributes
+
+        invalid_attachments = [
+            ZBytes(b""),
+            ZBytes([(2).to_bytes(1, byteorder='little'), attributes.SerializeToString()]),
+            ZBytes([(1).to_bytes(1, byteorder='little')]),
+            ZBytes(bytes(attachment)[:-1]),
+        ]
+        for invalid_attachment in invalid_attachments:
+            with pytest.raises(UStatusError) as error:
+                ZenohUtils.attachment_to_uattributes(invalid_attachment)
+            assert error.value.get_code() == UCode.INVALID_ARGUMENT
+
     @pytest.mark.asyncio
     async def test_get_listener_message_type(self):
         test_cases = [
@@ -0,0 +1,103 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import asyncio
+from typing import List
+
+import zenoh
+from uprotocol.communication.calloptions import CallOptions
+from uprotocol.communication.inmemoryrpcclient import InMemoryRpcClient
+from uprotocol.communication.upayload import UPayload
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
+from uprotocol.transport.ulistener import UListener
+from uprotocol.v1.uattributes_pb2 import UPayloadFormat
+from uprotocol.v1.umessage_pb2 import UMessage
+from uprotocol.v1.uri_pb2 import UUri
+
+SOURCE = UUri(authority_name="vehicle1", ue_id=0x18, ue_version_major=1)
+TOPIC = UUri(authority_name="vehicle1", ue_id=0x18, ue_version_major=1, resource_id=0x8001)
+METHOD = UUri(authority_name="vehicle1", ue_id=0x20, ue_version_major=1, resource_id=3)
+
+
+def create_config() -> zenoh.Config:
+    config = zenoh.Config()
+    config.insert_json5("scouting/multicast/enabled", "false")
+    return config
+
+
+class Collector(UListener):
+    """
+    Queues the received messages for the test. Listeners may run on a dispatcher thread, so the messages are
+    handed to the loop the collector was created on.
+    """
+
+    def __init__(self):
+        self.received = asyncio.Queue()
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        if self._loop is None or self._loop is asyncio.get_running_loop():
+            self.received.put_nowait(umsg)
+        else:
+            self._loop.call_soon_threadsafe(self.received.put_nowait, umsg)
+
+    async def get(self, timeout: float = 1) -> UMessage:
+        return await asyncio.wait_for(self.received.get(), timeout)
+
+    async def payloads(self, count: int, timeout: float = 1) -> List[bytes]:
+        return [(await self.get(timeout)).payload for _ in range(count)]
+
+
+class EchoServer(UListener):
+    """
+    Answers every request with its own payload.
+    """
+
+    def __init__(self, transport):
+        self.transport = transport
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        response = UMessageBuilder.response_for_request(umsg.attributes).build()
+        response.payload = umsg.payload
+        await self.transport.send(response)
+
+
+class NestedServer(UListener):
+    """
+    Answers every request with the response of a request to another method, sent from the listener.
+    """
+
+    def __init__(self, transport, method: UUri):
+        self.transport = transport
+        self.method = method
+        self.client = InMemoryRpcClient(transport)
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        payload = UPayload.pack_from_data_and_format(umsg.payload, UPayloadFormat.UPAYLOAD_FORMAT_RAW)
+        nested = await self.client.invoke_method(self.method, payload, CallOptions(1000))
+        response = UMessageBuilder.response_for_request(umsg.attributes).build()
+        response.payload = nested.data
+        await self.transport.send(response)
+
+
+class SilentServer(UListener):
+    """
+    Never answers.
+    """
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        pass
@@ -0,0 +1,145 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional
+
+from uprotocol.v1.uri_pb2 import UUri
+
+# Maximum number of keys with their own counters, the least recently used key is dropped beyond it
+DEFAULT_MAX_TRACKED_KEYS: int = 1024
+
+# The rates are the counts of the last complete window, in seconds
+RATE_WINDOW: float = 1.0
+
+# Verbatim chunk of the admin keys: the wildcards of the uProtocol key expressions never match it, so the
+# subscribers and request queryables of the transports don't see the admin queries
+ADMIN_KEY_CHUNK: str = "@transport"
+
+
+def admin_key(source: UUri, instance: str) -> str:
+    """
+    :param source: The source UUri of a transport.
+    :param instance: The id of the transport, tells apart the transports of the same uEntity.
+    :return: The key of the admin queryable of the transport. Query ``up/<authority>/@transport/**`` to get the
+             snapshots of every transport of an authority.
+    """
+    return f"up/{source.authority_name}/{ADMIN_KEY_CHUNK}/{source.ue_id:X}/{source.ue_version_major:X}/{instance}"
+
+
+class RateCounter:
+    """
+    Counts the messages and bytes of one direction of a key, in total and per :data:`RATE_WINDOW`.
+    """
+
+    __slots__ = ("messages", "bytes", "_window_start", "_window_messages", "_window_bytes", "_rate")
+
+    def __init__(self, now: float):
+        self.messages = 0
+        self.bytes = 0
+        self._window_start = now
+        self._window_messages = 0
+        self._window_bytes = 0
+        # Messages and bytes of the last complete window
+        self._rate = (0, 0)
+
+    def add(self, size: int, now: float) -> None:
+        self._roll(now)
+        self.messages += 1
+        self.bytes += size
+        self._window_messages += 1
+        self._window_bytes += size
+
+    def snapshot(self, now: float) -> Dict[str, float]:
+        self._roll(now)
+        messages, size = self._rate
+        return {
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "messages_per_s": messages / RATE_WINDOW,
+            "bytes_per_s": size / RATE_WINDOW,
+        }
+
+    def _roll(self, now: float) -> None:
+        elapsed = now - self._window_start
+        if elapsed < RATE_WINDOW:
+            return
+        # A window without messages in between means the key went quiet
+        self._rate = (self._window_messages, self._window_bytes) if elapsed < 2 * RATE_WINDOW else (0, 0)
+        self._window_start = now - elapsed % RATE_WINDOW
+        self._window_messages = 0
+        self._window_bytes = 0
+
+
+class KeyStats:
+    __slots__ = ("sent", "received")
+
+    def __init__(self, now: float):
+        self.sent = RateCounter(now)
+        self.received = RateCounter(now)
+
+
+class TransportStats:
+    """
+    Counters of a transport, updated as messages go through it so that a snapshot costs the same however busy
+    the transport is: per zenoh key, the messages and bytes sent and received and their rates, and the messages
+    that couldn't be decoded.
+
+    :param max_keys: The maximum number of keys counted. The least recently used key is dropped beyond it.
+    """
+
+    def __init__(self, max_keys: int = DEFAULT_MAX_TRACKED_KEYS):
+        self.max_keys = max_keys
+        self.started = time.monotonic()
+        self.decode_failures = 0
+        self._keys: "OrderedDict[str, KeyStats]" = OrderedDict()
+        self._lock = Lock()
+
+    def message_sent(self, zenoh_key: str, size: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._key(zenoh_key, now).sent.add(size, now)
+
+    def message_received(self, zenoh_key: str, size: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._key(zenoh_key, now).received.add(size, now)
+
+    def decode_failed(self) -> None:
+        with self._lock:
+            self.decode_failures += 1
+
+    def keys(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        :return: The counters and rates sent and received of each key.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: {"sent": stats.sent.snapshot(now), "received": stats.received.snapshot(now)}
+                for key, stats in self._keys.items()
+            }
+
+    def _key(self, zenoh_key: str, now: float) -> KeyStats:
+        # Called with the lock held
+        stats: Optional[KeyStats] = self._keys.get(zenoh_key)
+        if stats is None:
+            stats = self._keys[zenoh_key] = KeyStats(now)
+            if len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+        else:
+            self._keys.move_to_end(zenoh_key)
+        return stats
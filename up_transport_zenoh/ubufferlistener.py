@@ -0,0 +1,48 @@
+"""
+SPDX-FileCopyrightText: 2024 Contributors to the Eclipse Foundation
+
+See the NOTICE file(s) distributed with this work for additional
+information regarding copyright ownership.
+
+This program and the accompanying materials are made available under the
+terms of the Apache License Version 2.0 which is available at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+SPDX-License-Identifier: Apache-2.0
+"""
+
+from abc import abstractmethod
+
+from uprotocol.transport.ulistener import UListener
+from uprotocol.v1.umessage_pb2 import UMessage
+
+
+class UBufferListener(UListener):
+    """
+    Listener that receives the payload as a read-only ``memoryview`` instead of a copy stored in
+    ``UMessage.payload``. Setting a protobuf bytes field copies the payload, and so does every read of it, which
+    dominates the allocations for large payloads.
+
+    Lifetime: the view is only valid until the ``on_receive_buffer`` coroutine completes, after which the
+    transport releases it. A listener that needs the payload later must copy it, e.g. with ``bytes(payload)``.
+    """
+
+    async def on_receive(self, umsg: UMessage) -> None:
+        # Messages that already carry their payload, e.g. from another transport
+        payload = memoryview(umsg.payload)
+        try:
+            await self.on_receive_buffer(umsg, payload)
+        finally:
+            payload.release()
+
+    @abstractmethod
+    async def on_receive_buffer(self, umsg: UMessage, payload: memoryview) -> None:
+        """
+        Handle a received message.
+
+        :param umsg: The received message, with its attributes. Its payload is empty, unless a regular listener
+                     received the same message, in which case it holds a copy of the payload.
+        :param payload: Read-only view of the payload, valid until this coroutine completes.
+        """
+        pass
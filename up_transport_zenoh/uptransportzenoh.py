@@ -13,54 +13,273 @@ SPDX-License-Identifier: Apache-2.0
 """
 
 import asyncio
+import json
 import logging
-import threading
+import os
+import time
+from functools import partial
 from threading import Lock
-from typing import Dict, Tuple
+from typing import AsyncIterable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 import zenoh
 from uprotocol.communication.ustatuserror import UStatusError
+from uprotocol.transport.builder.umessagebuilder import UMessageBuilder
 from uprotocol.transport.ulistener import UListener
 from uprotocol.transport.utransport import UTransport
 from uprotocol.transport.validator.uattributesvalidator import Validators
 from uprotocol.uri.factory.uri_factory import UriFactory
-from uprotocol.v1.uattributes_pb2 import UAttributes, UMessageType
+from uprotocol.uri.serializer.uriserializer import UriSerializer
+from uprotocol.v1.uattributes_pb2 import UAttributes, UMessageType, UPriority
 from uprotocol.v1.ucode_pb2 import UCode
 from uprotocol.v1.umessage_pb2 import UMessage
 from uprotocol.v1.uri_pb2 import UUri
 from uprotocol.v1.ustatus_pb2 import UStatus
-from zenoh import Config, Query, Queryable, Sample, Session, Subscriber
-from zenoh.zenoh import KeyExpr
+from zenoh import Config, Query, Queryable, Reply, Sample, Session, Subscriber, ZBytes
 
-from up_transport_zenoh.zenohutils import MessageFlag, ZenohUtils
+from up_transport_zenoh.lastvaluecache import LAST_VALUE_QUERY_TIMEOUT, LastValueCache, last_value_key
+from up_transport_zenoh.listenerdispatcher import ListenerDispatcher
+from up_transport_zenoh.messagestream import DEFAULT_STREAM_CAPACITY, MessageStream, ResponseStream
+from up_transport_zenoh.metrics import MESSAGES_RECEIVED, MESSAGES_SENT, ZENOH_PUT, ZENOH_REPLY, TransportMetrics
+from up_transport_zenoh.payloadcodec import PayloadCompression, decompress_payload
+from up_transport_zenoh.pendingquerytable import DEFAULT_MAX_PENDING_QUERIES, PendingQueryTable
+from up_transport_zenoh.preparedpublisher import PreparedPublisher
+from up_transport_zenoh.qospolicy import QosPolicy
+from up_transport_zenoh.responsecache import ResponseCache
+from up_transport_zenoh.responselistenerindex import ResponseListenerIndex
+from up_transport_zenoh.rpcengine import QUERY_TIMEOUT_GRACE, RpcEngine
+from up_transport_zenoh.rpcpolicy import REPLIER_PARAMETER, RpcPolicies, RpcPolicy
+from up_transport_zenoh.sessionregistry import SESSIONS, SessionRegistry
+from up_transport_zenoh.subscriptionmultiplexer import SubscriptionMultiplexer
+from up_transport_zenoh.transportstats import TransportStats, admin_key
+from up_transport_zenoh.ubufferlistener import UBufferListener
+from up_transport_zenoh.zenohutils import MessageFlag, StreamFlag, ZenohUtils
 
-# Configure the logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+# zenoh configuration switch of the shared-memory transport
+SHARED_MEMORY_CONFIG_KEY: str = "transport/shared_memory/enabled"
+
+# A (source_filter, listener) or (source_filter, listener, sink_filter) entry of the bulk registrations
+ListenerEntry = Union[Tuple[UUri, UListener], Tuple[UUri, UListener, UUri]]
+
+# The message type a filter is registered and unregistered as when it matches several, as register_listener
+# and unregister_listener do
+_REGISTER_ORDER = (MessageFlag.REQUEST, MessageFlag.RESPONSE, MessageFlag.PUBLISH | MessageFlag.NOTIFICATION)
+_UNREGISTER_ORDER = (MessageFlag.PUBLISH | MessageFlag.NOTIFICATION, MessageFlag.REQUEST, MessageFlag.RESPONSE)
+
+# The validators are stateless, create them once instead of per message
+_PUBLISH_VALIDATOR = Validators.PUBLISH.validator()
+_NOTIFICATION_VALIDATOR = Validators.NOTIFICATION.validator()
+_REQUEST_VALIDATOR = Validators.REQUEST.validator()
+_RESPONSE_VALIDATOR = Validators.RESPONSE.validator()
+
+_CLOSED_MESSAGE = "The transport is closed"
+
+# Default time aclose() waits for the in-flight requests, in seconds
+DEFAULT_DRAIN_TIMEOUT: float = 5.0
+DRAIN_POLL_INTERVAL: float = 0.01
 
 
 class UPTransportZenoh(UTransport):
     def get_source(self) -> UUri:
         return self.source
 
+    def _check_open(self) -> None:
+        if self._closed:
+            raise UStatusError.from_code_message(code=UCode.FAILED_PRECONDITION, message=_CLOSED_MESSAGE)
+
     def close(self) -> None:
-        pass
+        """
+        Release everything held by the transport, without waiting: the zenoh subscribers and queryables are
+        undeclared, the pending RPC requests complete with ``CANCELLED``, the requests received but not answered
+        yet are dropped, the owned dispatcher is stopped and the session is closed. Calling it again does nothing.
+
+        Use :meth:`aclose` from a coroutine to let the in-flight requests finish first.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._undeclare_all()
+        self._release()
+
+    async def aclose(self, drain_timeout: float = DEFAULT_DRAIN_TIMEOUT) -> None:
+        """
+        Close the transport gracefully: stop receiving messages and requests, wait up to ``drain_timeout`` seconds
+        for the pending RPC requests to get their response and for the received requests to be answered, then
+        release everything like :meth:`close`.
+
+        :param drain_timeout: The maximum time to wait for the in-flight requests, in seconds.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._undeclare_all()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + drain_timeout
+        while (self.rpc_engine.pending_count or len(self.query_map)) and loop.time() < deadline:
+            await asyncio.sleep(DRAIN_POLL_INTERVAL)
+        self._release()
+
+    def __enter__(self) -> "UPTransportZenoh":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
 
-    def __init__(self, session: Session, source: UUri):
+    async def __aenter__(self) -> "UPTransportZenoh":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    def _undeclare_all(self) -> None:
+        if self.admin_queryable is not None:
+            _undeclare(self.admin_queryable)
+            self.admin_queryable = None
+        self.subscriptions.close()
+        if self.last_values is not None:
+            self.last_values.close()
+        for stream in list(self._streams):
+            stream.close()
+        with self.queryable_lock:
+            queryables = list(self.queryable_map.values())
+            self.queryable_map.clear()
+        for queryable in queryables:
+            _undeclare(queryable)
+
+    def _release(self) -> None:
+        self.rpc_engine.close()
+        # Held queries keep the session from closing
+        self.query_map.close()
+        if self._owns_dispatcher:
+            self.dispatcher.close()
+        if self.session_registry is not None:
+            self.session_registry.release(self.session)
+            return
+        try:
+            self.session.close()
+        except Exception as e:
+            logging.debug(f"Unable to close the Zenoh session: {e}")
+
+    def __init__(
+        self,
+        session: Session,
+        source: UUri,
+        dispatcher: Optional[ListenerDispatcher] = None,
+        qos_policy: QosPolicy = QosPolicy.DEFAULT,
+        metrics: Optional[TransportMetrics] = None,
+        max_pending_queries: int = DEFAULT_MAX_PENDING_QUERIES,
+        compression: Optional[PayloadCompression] = None,
+        session_registry: Optional[SessionRegistry] = None,
+        last_value_depth: int = 0,
+        response_cache: Optional[ResponseCache] = None,
+        rpc_policies: Optional[RpcPolicies] = None,
+        introspection: bool = False,
+    ):
+        """
+        :param session: The zenoh session, closed with the transport.
+        :param source: The source UUri of the uEntity using the transport.
+        :param dispatcher: Decides which event loops the listeners run on. By default, listeners run on a loop
+                           owned by the transport, in a thread of its own. Pass ``ListenerDispatcher.owned(n)``
+                           to spread them over ``n`` loops, ``ListenerDispatcher(attach=True)`` to attach them to
+                           the application loop they were registered from, or ``ListenerDispatcher(loop)`` to pin
+                           them to a given loop. The response listeners run on the loop the request was sent
+                           from. A dispatcher passed in is not closed by :meth:`close`.
+        :param qos_policy: Maps the message priorities to zenoh congestion control and express mode, see
+                           ``QosPolicy.LOW_LATENCY`` and ``QosPolicy.HIGH_THROUGHPUT``.
+        :param metrics: Optional hook timing the zenoh operations, the listeners and the RPC requests of the
+                        transport. The dispatcher created by default reports to it as well, a dispatcher passed
+                        in takes its own. Key resolution and attachment coding are instrumented process-wide with
+                        ``ZenohUtils.set_metrics``.
+        :param max_pending_queries: The maximum number of received requests waiting for their response. Beyond
+                                    it the oldest request is dropped, as are the requests whose ttl expired, see
+                                    :class:`PendingQueryTable`.
+        :param compression: Optional compression of the payloads sent, above a size threshold. Received payloads
+                            are decompressed whatever this setting, see :class:`PayloadCompression`.
+        :param session_registry: The registry the session was acquired from: the transport releases the session
+                                 to it instead of closing it, see :class:`SessionRegistry`.
+        :param last_value_depth: Keep the last ``last_value_depth`` messages published on each topic, so that
+                                 the subscribers registered with ``last_value=True`` get them right away, see
+                                 :class:`LastValueCache`. 0 disables the cache.
+        :param response_cache: Optional cache of the responses of idempotent RPC methods, which also coalesces
+                               the identical requests in flight, see :class:`ResponseCache`.
+        :param rpc_policies: Optional per-method policies of the RPC requests sent: zenoh target, replier
+                             selection and hedging, see :class:`RpcPolicy`.
+        :param introspection: Count the messages of each key and serve a snapshot of the transport, see
+                              :meth:`introspect`, through a zenoh queryable on :func:`admin_key`.
+        """
         self.session = session
-        self.subscriber_map: Dict[Tuple[str, UListener], Subscriber] = {}
+        self.session_registry = session_registry
+        # One zenoh subscriber per key expression, shared by the listeners of that key
+        self.subscriptions = SubscriptionMultiplexer(self._declare_subscriber, self._on_sample)
         self.queryable_map: Dict[Tuple[str, UListener], Queryable] = {}
-        self.query_map: Dict[str, Query] = {}
+        self.query_map = PendingQueryTable(max_pending_queries, metrics=metrics, track_held_time=introspection)
+        # Replaced, never mutated, under rpc_callback_lock so that readers can use it without locking
         self.rpc_callback_map: Dict[str, UListener] = {}
+        self.rpc_callback_index = ResponseListenerIndex()
         self.source = source
         self.authority_name = source.authority_name
         self.rpc_callback_lock = Lock()
         self.queryable_lock = Lock()
-        self.subscriber_lock = Lock()
+        self._owns_dispatcher = dispatcher is None
+        self.dispatcher = dispatcher if dispatcher is not None else ListenerDispatcher(metrics=metrics)
+        self.qos_policy = qos_policy
+        self.metrics = metrics
+        self.compression = compression
+        self.last_values = LastValueCache(last_value_depth, session.declare_queryable) if last_value_depth else None
+        self.rpc_engine = RpcEngine(self.dispatcher, metrics=metrics, response_cache=response_cache)
+        self.rpc_policies = rpc_policies
+        # Identifies the replies of this transport to the clients selecting their server, and its admin key
+        self.replier_id = os.urandom(8).hex()
+        self._streams: Set[MessageStream] = set()
+        self._closed = False
+        self.stats = TransportStats() if introspection else None
+        self.admin_queryable: Optional[Queryable] = None
+        if introspection:
+            try:
+                self.admin_queryable = session.declare_queryable(
+                    admin_key(source, self.replier_id), self._on_admin_query
+                )
+            except Exception as e:
+                logging.debug(f"Unable to declare the admin queryable: {e}")
 
     @classmethod
-    def new(cls, config: Config, source: UUri):
+    def new(
+        cls,
+        config: Config,
+        source: UUri,
+        dispatcher: Optional[ListenerDispatcher] = None,
+        qos_policy: QosPolicy = QosPolicy.DEFAULT,
+        metrics: Optional[TransportMetrics] = None,
+        max_pending_queries: int = DEFAULT_MAX_PENDING_QUERIES,
+        compression: Optional[PayloadCompression] = None,
+        shared_memory: bool = False,
+        share_session: bool = False,
+        last_value_depth: int = 0,
+        response_cache: Optional[ResponseCache] = None,
+        rpc_policies: Optional[RpcPolicies] = None,
+        introspection: bool = False,
+    ):
+        """
+        Open a zenoh session and create a transport on it. The other arguments are those of the constructor.
+
+        :param config: The zenoh configuration of the session.
+        :param shared_memory: Enable the zenoh shared-memory transport: peers on the same host that enable it
+                              too exchange the payloads through shared memory rather than over the link, while
+                              remote peers keep using the network. Sets ``transport/shared_memory/enabled`` in
+                              ``config``.
+        :param share_session: Share the session with the other transports of the process created with the same
+                              configuration, e.g. one per uEntity, rather than opening one. The session is closed
+                              with the last of them, see :data:`SESSIONS`.
+        """
+        if shared_memory:
+            try:
+                config.insert_json5(SHARED_MEMORY_CONFIG_KEY, "true")
+            except Exception as e:
+                msg = f"Unable to enable the Zenoh shared-memory transport: {e}"
+                logging.error(msg)
+                raise UStatusError.from_code_message(code=UCode.UNIMPLEMENTED, message=msg)
+        session_registry = SESSIONS if share_session else None
         try:
-            session = zenoh.open(config)
+            session = session_registry.acquire(config) if session_registry is not None else zenoh.open(config)
         except Exception:
             msg = "Unable to open Zenoh session"
             logging.error(msg)
@@ -69,11 +288,21 @@ class UPTransportZenoh(UTransport):
         return cls(
             session=session,
             source=source,
+            dispatcher=dispatcher,
+            qos_policy=qos_policy,
+            metrics=metrics,
+            max_pending_queries=max_pending_queries,
+            compression=compression,
+            session_registry=session_registry,
+            last_value_depth=last_value_depth,
+            response_cache=response_cache,
+            rpc_policies=rpc_policies,
+            introspection=introspection,
         )
 
     def send_publish_notification(self, zenoh_key: str, payload: bytes, attributes: UAttributes) -> UStatus:
         # Transform UAttributes to user attachment in Zenoh
-        attachment = ZenohUtils.uattributes_to_attachment(attributes)
+        payload, attachment = self._encode(payload, attributes)
         if not attachment:
             msg = "Unable to transform UAttributes to attachment"
             logging.debug(f"ERROR: {msg}")
@@ -87,15 +316,35 @@ class UPTransportZenoh(UTransport):
             return UStatus(code=UCode.INVALID_ARGUMENT, message=msg)
 
         try:
-            # Simulate sending data
-            logging.debug(f"Sending data to Zenoh with key: {zenoh_key}")
-            logging.debug(f"Data: {payload}")
-            logging.debug(f"Priority: {priority}")
-            logging.debug(f"Attachment: {attachment}")
+            # Formatting the payload costs even when debug logging is off
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug(f"Sending data to Zenoh with key: {zenoh_key}")
+                logging.debug(f"Data: {payload}")
+                logging.debug(f"Priority: {priority}")
+                logging.debug(f"Attachment: {attachment}")
 
-            self.session.put(key_expr=zenoh_key, payload=payload, attachment=attachment, priority=priority)
+            qos = self.qos_policy.for_priority(attributes.priority)
+            metrics = self.metrics
+            if metrics is not None:
+                start = time.perf_counter()
+            self.session.put(
+                key_expr=zenoh_key,
+                payload=payload,
+                attachment=attachment,
+                priority=priority,
+                congestion_control=qos.congestion_control,
+                express=qos.express,
+            )
+            if metrics is not None:
+                metrics.record(ZENOH_PUT, time.perf_counter() - start)
+                metrics.increment(MESSAGES_SENT)
+            if self.last_values is not None and attributes.type == UMessageType.UMESSAGE_TYPE_PUBLISH:
+                self.last_values.put(zenoh_key, payload, attachment)
+            if self.stats is not None:
+                self.stats.message_sent(zenoh_key, len(payload))
             msg = "Successfully sent data to Zenoh"
-            logging.debug(f"SUCCESS:{msg}")
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug(f"SUCCESS:{msg}")
             return UStatus(code=UCode.OK, message=msg)
         except Exception as e:
             msg = f"Unable to send with Zenoh: {e}"
@@ -104,97 +353,80 @@ class UPTransportZenoh(UTransport):
 
     def send_request(self, zenoh_key: str, payload: bytes, attributes: UAttributes) -> UStatus:
         # Transform UAttributes to user attachment in Zenoh
-        attachment = ZenohUtils.uattributes_to_attachment(attributes)
+        payload, attachment = self._encode(payload, attributes)
         if attachment is None:
             msg = "Unable to transform UAttributes to attachment"
             logging.debug(msg)
             return UStatus(code=UCode.INVALID_ARGUMENT, message=msg)
-        resp_callback = None
-        for saved_zenoh_key, listener in self.rpc_callback_map.items():
-            keyexpr_zenohkey = KeyExpr(zenoh_key)
-            keyexpr_savedkey = KeyExpr(saved_zenoh_key)
-
-            if keyexpr_zenohkey.intersects(keyexpr_savedkey):
-                resp_callback = self.rpc_callback_map.get(saved_zenoh_key)
-                break
+        resp_callback = self.rpc_callback_index.lookup(zenoh_key)
         if resp_callback is None:
             msg = "Unable to get callback"
             logging.debug(msg)
             return UStatus(code=UCode.INTERNAL, message=msg)
 
-        def handle_response(reply: Query.reply) -> None:
-            try:
-                sample = reply.ok
-                # Get UAttribute from the attachment
-                attachment = sample.attachment
-                if attachment is None:
-                    msg = "Unable to get the attachment"
-                    logging.debug(msg)
-                    return UStatus(code=UCode.INTERNAL, message=msg)
-
-                u_attribute = ZenohUtils.attachment_to_uattributes(attachment)
-                if u_attribute is None:
-                    msg = "Transform attachment to UAttributes failed"
-                    logging.debug(msg)
-                    return UStatus(code=UCode.INTERNAL, message=msg)
-                # Create UMessage
-                msg = UMessage(attributes=u_attribute, payload=bytes(sample.payload))
-                asyncio.run(resp_callback.on_receive(msg))
-            except Exception:
-                msg = f"Error while parsing Zenoh reply: {reply.error}"
-                logging.debug(msg)
-                return UStatus(code=UCode.INTERNAL, message=msg)
-
-        # Send query
-        ttl = attributes.ttl / 1000 if attributes.ttl is not None else 1000
-
-        # Send the query
-        replies = self.session.get(
-            selector=zenoh_key,
-            target=zenoh.QueryTarget.BEST_MATCHING,
-            attachment=attachment,
-            payload=payload,
-            timeout=ttl,
-        )
-
-        def get_response():
-            try:
-                for reply in replies:
-                    if reply.ok:
-                        handle_response(reply)
-                        break
-            except Exception:
-                pass
-
-        thread = threading.Thread(target=get_response)
-        # Start the thread
-        thread.start()
+        try:
+            self.rpc_engine.send_request(
+                self.session,
+                zenoh_key,
+                payload,
+                attachment,
+                attributes,
+                resp_callback,
+                qos=self.qos_policy.for_priority(attributes.priority),
+                policy=self._rpc_policy(attributes.sink),
+            )
+        except UStatusError as error:
+            return error.get_status()
+        if self.stats is not None:
+            self.stats.message_sent(zenoh_key, len(payload))
 
         msg = "Successfully sent rpc request to Zenoh"
-        logging.debug(f"SUCCESS:{msg}")
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug(f"SUCCESS:{msg}")
         return UStatus(code=UCode.OK, message=msg)
 
-    def send_response(self, payload: bytes, attributes: UAttributes) -> UStatus:
-        # Transform attributes to user attachment in Zenoh
-        attachment = ZenohUtils.uattributes_to_attachment(attributes)
-        if attachment is None:
-            msg = "Unable to transform UAttributes to attachment"
-            logging.debug(msg)
-            return UStatus(code=UCode.INVALID_ARGUMENT, message=msg)
+    def _rpc_policy(self, method: UUri) -> RpcPolicy:
+        return self.rpc_policies.for_method(method) if self.rpc_policies is not None else RpcPolicy.DEFAULT
 
+    def send_response(self, payload: bytes, attributes: UAttributes) -> UStatus:
         # Find out the corresponding query from dictionary
         reqid = attributes.reqid
 
-        query = self.query_map.pop(reqid.SerializeToString(), None)
+        query = self.query_map.pop(reqid.SerializeToString())
         if not query:
-            msg = "Query doesn't exist"
+            msg = "Query doesn't exist or expired"
             logging.debug(msg)
             return UStatus(code=UCode.INTERNAL, message=msg)  # Send back the query
 
+        # Transform attributes to user attachment in Zenoh, identifying this server if the client asked for it
+        replier = self.replier_id if _requested_replier(query) is not None else None
+        payload, attachment = self._encode(payload, attributes, replier=replier)
+        if attachment is None:
+            msg = "Unable to transform UAttributes to attachment"
+            logging.debug(msg)
+            return UStatus(code=UCode.INVALID_ARGUMENT, message=msg)
+
         try:
-            query.reply(query.key_expr, payload, attachment=attachment)
+            qos = self.qos_policy.for_priority(attributes.priority)
+            metrics = self.metrics
+            if metrics is not None:
+                start = time.perf_counter()
+            query.reply(
+                query.key_expr,
+                payload,
+                attachment=attachment,
+                priority=ZenohUtils.map_zenoh_priority(attributes.priority),
+                congestion_control=qos.congestion_control,
+                express=qos.express,
+            )
+            if metrics is not None:
+                metrics.record(ZENOH_REPLY, time.perf_counter() - start)
+                metrics.increment(MESSAGES_SENT)
+            if self.stats is not None:
+                self.stats.message_sent(str(query.key_expr), len(payload))
             msg = "Successfully sent rpc response to Zenoh"
-            logging.debug(f"SUCCESS:{msg}")
+            if logging.root.isEnabledFor(logging.DEBUG):
+                logging.debug(f"SUCCESS:{msg}")
             return UStatus(code=UCode.OK, message=msg)
 
         except Exception as e:
@@ -202,32 +434,127 @@ class UPTransportZenoh(UTransport):
             logging.debug(msg)
             return UStatus(code=UCode.INTERNAL, message=msg)
 
+    def introspect(self) -> dict:
+        """
+        Take a snapshot of the transport: its registrations, its pending requests, and the counters of the
+        transports created with ``introspection=True``. Built from the registration maps and from counters kept
+        up to date as messages go through, it is cheap enough to be polled every second.
+
+        :return: A JSON-serializable dict.
+        """
+        with self.queryable_lock:
+            queryables = [zenoh_key for zenoh_key, _ in self.queryable_map]
+        queryable_counts: Dict[str, int] = {}
+        for zenoh_key in queryables:
+            queryable_counts[zenoh_key] = queryable_counts.get(zenoh_key, 0) + 1
+        pending = self.query_map.stats()
+        snapshot = {
+            "source": UriSerializer.serialize(self.source),
+            "instance": self.replier_id,
+            "subscribers": self.subscriptions.listener_counts(),
+            "queryables": queryable_counts,
+            "rpc_callbacks": sorted(self.rpc_callback_map),
+            "pending_queries": pending._asdict(),
+            "pending_requests": self.rpc_engine.pending_count,
+        }
+        stats = self.stats
+        if stats is not None:
+            snapshot["uptime"] = time.monotonic() - stats.started
+            snapshot["decode_failures"] = stats.decode_failures
+            snapshot["keys"] = stats.keys()
+        return snapshot
+
+    def _on_admin_query(self, query: Query) -> None:
+        try:
+            query.reply(query.key_expr, json.dumps(self.introspect()).encode())
+        except Exception as e:
+            logging.debug(f"Unable to reply to the admin query: {e}")
+
+    def _dispatch_message(self, listeners: Tuple[UListener, ...], message: UMessage, data: bytes) -> None:
+        """
+        Hand a received message to its listeners. The payload is copied out of zenoh once, and all the listeners
+        receive the same UMessage, which they must not modify. The message is complete before the first listener
+        gets it: it carries the payload whenever a listener other than a ``UBufferListener`` needs it.
+        """
+        if self.metrics is not None:
+            self.metrics.increment(MESSAGES_RECEIVED)
+        # Set before any listener gets the message: the listeners may run on other threads right away
+        if data and any(not isinstance(listener, UBufferListener) for listener in listeners):
+            message.payload = data
+        for listener in listeners:
+            if isinstance(listener, UBufferListener):
+                # Hand out a view of the payload instead of copying it into the message
+                view = memoryview(data)
+                future = self.dispatcher.submit(listener, listener.on_receive_buffer(message, view), message)
+                if future is None:
+                    view.release()
+                else:
+                    future.add_done_callback(lambda _, view=view: view.release())
+                continue
+            self.dispatcher.dispatch(listener, message)
+
+    def _declare_subscriber(self, zenoh_key: str, callback) -> Subscriber:
+        return self.session.declare_subscriber(zenoh_key, callback, reliability=self.qos_policy.reliability)
+
+    def _encode(
+        self,
+        payload: bytes,
+        attributes: UAttributes,
+        stream: Optional[StreamFlag] = None,
+        replier: Optional[str] = None,
+    ) -> Tuple[bytes, list]:
+        # Compress the payload if enabled, and transform UAttributes to user attachment in Zenoh
+        codec = None
+        if self.compression is not None:
+            payload, codec = self.compression.compress(payload)
+        return payload, ZenohUtils.uattributes_to_attachment(attributes, codec, stream, replier)
+
+    def _decode(self, attachment: Optional[ZBytes], payload: Optional[ZBytes]) -> Optional[Tuple[UMessage, bytes]]:
+        # Get the UAttribute from Zenoh user attachment
+        if not attachment:
+            logging.debug("Unable to get attachment")
+            if self.stats is not None:
+                self.stats.decode_failed()
+            return None
+        message = UMessage()
+        try:
+            codec = ZenohUtils.decode_attachment(attachment, message.attributes).codec
+            data = decompress_payload(bytes(payload) if payload else b'', codec)
+        except UStatusError as error:
+            logging.debug(error.get_message())
+            if self.stats is not None:
+                self.stats.decode_failed()
+            return None
+        return message, data
+
+    def _on_sample(self, listeners: Tuple[UListener, ...], sample: Sample) -> None:
+        decoded = self._decode(sample.attachment, sample.payload)
+        if decoded is not None:
+            if self.stats is not None:
+                self.stats.message_received(str(sample.key_expr), len(decoded[1]))
+            self._dispatch_message(listeners, *decoded)
+
+    def _accept_query(self, query: Query) -> Optional[Tuple[UMessage, bytes]]:
+        # A client that selected another instance of the method sent the query to every instance
+        replier = _requested_replier(query)
+        if replier and replier != self.replier_id:
+            return None
+        # Decode the request and keep its query until the response is sent
+        decoded = self._decode(query.attachment, query.payload)
+        if decoded is None:
+            return None
+        if self.stats is not None:
+            self.stats.message_received(str(query.key_expr), len(decoded[1]))
+        attributes = decoded[0].attributes
+        if not self.query_map.put(attributes.id.SerializeToString(), query, self.rpc_engine.get_ttl_ms(attributes)):
+            return None
+        return decoded
+
     def register_publish_notification_listener(self, zenoh_key: str, listener: UListener) -> UStatus:
-        def callback(sample: Sample) -> None:
-            # Get the UAttribute from Zenoh user attachment
-            attachment = sample.attachment
-            if attachment is None:
-                msg = "Unable to get attachment"
-                logging.debug(msg)
-                return UStatus(code=UCode.INTERNAL, message=msg)
-            try:
-                u_attribute = ZenohUtils.attachment_to_uattributes(attachment)
-            except UStatusError as error:
-                logging.debug(error.get_message())
-                return UStatus(code=error.get_code(), message=error.get_message())
-            if u_attribute is None:
-                msg = "Unable to decode attributes"
-                logging.debug(msg)
-                return UStatus(code=UCode.INTERNAL, message=msg)
-            message = UMessage(attributes=u_attribute, payload=bytes(sample.payload))
-            asyncio.run(listener.on_receive(message))
-
-        # Create Zenoh subscriber
+        # Share the Zenoh subscriber of the key, declaring it for the first listener
         try:
-            subscriber = self.session.declare_subscriber(zenoh_key, callback)
-            if subscriber:
-                with self.subscriber_lock:
-                    self.subscriber_map[(zenoh_key, listener)] = subscriber
+            self.dispatcher.bind(listener)
+            self.subscriptions.add(zenoh_key, listener)
         except Exception:
             msg = "Unable to register callback with Zenoh"
             logging.debug(msg)
@@ -237,33 +564,23 @@ class UPTransportZenoh(UTransport):
         logging.debug(msg)
         return UStatus(code=UCode.OK, message=msg)
 
-    def register_request_listener(self, zenoh_key: str, listener: UListener) -> UStatus:
+    def _request_callback(self, listener: UListener) -> Callable[[Query], None]:
         def callback(query: Query) -> None:
-            nonlocal self, listener, zenoh_key
-            attachment = query.attachment
-            if not attachment:
-                msg = "Unable to get attachment"
-                logging.debug(msg)
-                return UStatus(code=UCode.INTERNAL, message=msg)
+            decoded = self._accept_query(query)
+            if decoded is not None:
+                self._dispatch_message((listener,), *decoded)
 
-            try:
-                u_attribute = ZenohUtils.attachment_to_uattributes(attachment)
-            except UStatusError as error:
-                logging.debug(error.get_message())
-                return UStatus(code=error.get_code(), message=error.get_message())
-            if u_attribute is None:
-                msg = "Unable to decode attributes"
-                logging.debug(msg)
-                return UStatus(code=UCode.INTERNAL, message=msg)
-
-            message = UMessage(attributes=u_attribute, payload=bytes(query.payload) if query.payload else None)
-            self.query_map[u_attribute.id.SerializeToString()] = query
-            asyncio.run(listener.on_receive(message))
+        return callback
 
+    def register_request_listener(self, zenoh_key: str, listener: UListener) -> UStatus:
         try:
+            self.dispatcher.bind(listener)
             with self.queryable_lock:
-                queryable = self.session.declare_queryable(zenoh_key, callback)
+                queryable = self.session.declare_queryable(zenoh_key, self._request_callback(listener))
+                previous = self.queryable_map.get((zenoh_key, listener))
                 self.queryable_map[(zenoh_key, listener)] = queryable
+            if previous is not None:
+                _undeclare(previous)
 
         except Exception:
             msg = "Unable to register callback with Zenoh"
@@ -273,41 +590,393 @@ class UPTransportZenoh(UTransport):
         return UStatus(code=UCode.OK, message="Successfully register callback with Zenoh")
 
     def register_response_listener(self, zenoh_key: str, listener: UListener) -> UStatus:
+        self.dispatcher.bind(listener)
         with self.rpc_callback_lock:
-            self.rpc_callback_map[zenoh_key] = listener
+            rpc_callback_map = dict(self.rpc_callback_map)
+            rpc_callback_map[zenoh_key] = listener
+            self.rpc_callback_index.rebuild(rpc_callback_map)
+            self.rpc_callback_map = rpc_callback_map
             return UStatus(code=UCode.OK, message="Successfully register response callback with Zenoh")
 
     async def send(self, message: UMessage) -> UStatus:
         attributes = message.attributes
         source = attributes.source
         sink = attributes.sink
-        zenoh_key = ZenohUtils.to_zenoh_key_string(self.authority_name, source, sink)
         if not source:
             return UStatus(code=UCode.INVALID_ARGUMENT, message="attributes.source shouldn't be empty")
         payload = message.payload or b''
+        # Only the responses to the requests received before closing can still be sent, while draining
+        if self._closed and attributes.type != UMessageType.UMESSAGE_TYPE_RESPONSE:
+            return _closed_status()
         # Check the type of UAttributes (Publish / Notification / Request / Response)
+        # Responses reply to the stored query, so only the other types need a zenoh key
         msg_type = attributes.type
         if msg_type == UMessageType.UMESSAGE_TYPE_PUBLISH:
-            Validators.PUBLISH.validator().validate(attributes)
+            _PUBLISH_VALIDATOR.validate(attributes)
+            zenoh_key = ZenohUtils.to_zenoh_key_string(self.authority_name, source, sink)
             return self.send_publish_notification(zenoh_key, payload, attributes)
         elif msg_type == UMessageType.UMESSAGE_TYPE_NOTIFICATION:
-            Validators.NOTIFICATION.validator().validate(attributes)
+            _NOTIFICATION_VALIDATOR.validate(attributes)
+            zenoh_key = ZenohUtils.to_zenoh_key_string(self.authority_name, source, sink)
             return self.send_publish_notification(zenoh_key, payload, attributes)
 
         elif msg_type == UMessageType.UMESSAGE_TYPE_REQUEST:
-            Validators.REQUEST.validator().validate(attributes)
+            _REQUEST_VALIDATOR.validate(attributes)
+            zenoh_key = ZenohUtils.to_zenoh_key_string(self.authority_name, source, sink)
             return self.send_request(zenoh_key, payload, attributes)
 
         elif msg_type == UMessageType.UMESSAGE_TYPE_RESPONSE:
-            Validators.RESPONSE.validator().validate(attributes)
+            _RESPONSE_VALIDATOR.validate(attributes)
             return self.send_response(payload, attributes)
 
         else:
             return UStatus(code=UCode.INVALID_ARGUMENT, message="Wrong Message type in UAttributes")
 
+    def declare_publisher(
+        self, source: UUri, sink: Optional[UUri] = None, priority: UPriority = UPriority.UPRIORITY_CS1
+    ) -> PreparedPublisher:
+        """
+        Declare a handle publishing messages with a fixed source, sink and priority, for topics published at high
+        rates. The zenoh key, priority and static attributes are resolved once instead of on every send.
+
+        :param source: The source (topic) of the messages.
+        :param sink: Optional sink, which makes the messages notifications.
+        :param priority: The priority of the messages.
+        :return: The publisher handle, to be closed when no longer needed.
+        :raises UStatusError: If the attributes are invalid or the zenoh publisher couldn't be declared.
+        """
+        self._check_open()
+        zenoh_key = ZenohUtils.to_zenoh_key_string(self.authority_name, source, sink)
+        try:
+            qos = self.qos_policy.for_priority(priority)
+            publisher = self.session.declare_publisher(
+                zenoh_key,
+                priority=ZenohUtils.map_zenoh_priority(priority),
+                congestion_control=qos.congestion_control,
+                express=qos.express,
+            )
+        except Exception as e:
+            msg = f"Unable to declare Zenoh publisher: {e}"
+            logging.debug(msg)
+            raise UStatusError.from_code_message(code=UCode.INTERNAL, message=msg)
+
+        try:
+            return PreparedPublisher(
+                publisher,
+                source,
+                sink,
+                priority,
+                metrics=self.metrics,
+                compression=self.compression,
+                last_values=self.last_values,
+            )
+        except UStatusError:
+            publisher.undeclare()
+            raise
+
+    def subscribe(
+        self,
+        source_filter: UUri,
+        sink_filter: UUri = UriFactory.ANY,
+        capacity: int = DEFAULT_STREAM_CAPACITY,
+        keep_latest: bool = True,
+    ) -> MessageStream:
+        """
+        Subscribe to publish or notification messages as an async iterator, instead of a listener::
+
+            async with transport.subscribe(topic) as stream:
+                async for message in stream:
+                    ...
+
+        The messages are buffered by zenoh until the stream reads them. When ``capacity`` messages are buffered,
+        the oldest buffered message is dropped to make room.
+
+        With ``keep_latest=False`` no message is dropped: zenoh waits for the stream to make room instead, on the
+        thread delivering the message. That blocks the receive path of the whole session, every subscription
+        and reply, not only this stream, and a publisher on the same session blocks in ``send`` along with the
+        event loop it runs on. A consumer on that loop then never runs: only use it with a consumer that keeps
+        up, on another loop than the publishers of the session.
+
+        :param source_filter: The source of the messages.
+        :param sink_filter: The sink of the notifications, ``UriFactory.ANY`` for publish messages.
+        :param capacity: The maximum number of buffered messages.
+        :param keep_latest: Drop the oldest messages when the buffer is full. Otherwise block the session until
+                            the stream makes room.
+        :return: The stream, closed by the caller or with the transport.
+        :raises UStatusError: If the filters don't match publish or notification messages, or the subscriber
+                              couldn't be declared.
+        """
+        self._check_open()
+        flag = ZenohUtils.get_listener_message_type(source_filter, sink_filter)
+        if not flag & (MessageFlag.PUBLISH | MessageFlag.NOTIFICATION):
+            raise UStatusError.from_code_message(
+                code=UCode.INVALID_ARGUMENT, message="The filters don't match publish or notification messages"
+            )
+        zenoh_key = ZenohUtils.to_zenoh_key_string(self.authority_name, source_filter, sink_filter)
+        handler = zenoh.handlers.RingChannel(capacity) if keep_latest else zenoh.handlers.FifoChannel(capacity)
+        try:
+            subscriber = self.session.declare_subscriber(zenoh_key, handler, reliability=self.qos_policy.reliability)
+        except Exception as e:
+            msg = f"Unable to declare Zenoh subscriber: {e}"
+            logging.debug(msg)
+            raise UStatusError.from_code_message(code=UCode.INTERNAL, message=msg)
+        return self._open_stream(subscriber, self._sample_to_message)
+
+    def requests(
+        self, method: UUri, source_filter: UUri = UriFactory.ANY, capacity: int = DEFAULT_STREAM_CAPACITY
+    ) -> MessageStream:
+        """
+        Receive the RPC requests of a method as an async iterator, instead of a request listener. The requests
+        are answered with :meth:`send` as usual::
+
+            async for request in transport.requests(method):
+                await transport.send(UMessageBuilder.response_for_request(request.attributes).build())
+
+        :param method: The method served.
+        :param source_filter: The clients served, all by default.
+        :param capacity: The maximum number of requests buffered by zenoh until the stream reads them. While the
+                         buffer is full, zenoh waits for room, blocking the receive path of the session.
+        :return: The stream, closed by the caller or with the transport.
+        :raises UStatusError: If the filters don't match requests, or the queryable couldn't be declared.
+        """
+        self._check_open()
+        flag = ZenohUtils.get_listener_message_type(source_filter, method)
+        if not flag & MessageFlag.REQUEST:
+            raise UStatusError.from_code_message(
+                code=UCode.INVALID_ARGUMENT, message="The filters don't match requests"
+            )
+        zenoh_key = ZenohUtils.to_zenoh_key_string(self.authority_name, source_filter, method)
+        try:
+            queryable = self.session.declare_queryable(zenoh_key, zenoh.handlers.FifoChannel(capacity))
+        except Exception as e:
+            msg = f"Unable to declare Zenoh queryable: {e}"
+            logging.debug(msg)
+            raise UStatusError.from_code_message(code=UCode.INTERNAL, message=msg)
+        return self._open_stream(queryable, self._query_to_message)
+
+    def _open_stream(self, receiver, decode) -> MessageStream:
+        stream = MessageStream(receiver, decode, on_close=self._streams.discard)
+        self._streams.add(stream)
+        return stream
+
+    def _sample_to_message(self, sample: Sample) -> Optional[UMessage]:
+        return self._to_message(self._decode(sample.attachment, sample.payload))
+
+    def _query_to_message(self, query: Query) -> Optional[UMessage]:
+        return self._to_message(self._accept_query(query))
+
+    def _to_message(self, decoded: Optional[Tuple[UMessage, bytes]]) -> Optional[UMessage]:
+        if decoded is None:
+            return None
+        if self.metrics is not None:
+            self.metrics.increment(MESSAGES_RECEIVED)
+        message, data = decoded
+        if data:
+            message.payload = data
+        return message
+
+    async def invoke(self, request: UMessage) -> UMessage:
+        """
+        Send an RPC request and wait for its response, without registering a response listener.
+
+        :param request: The request message.
+        :return: The response message.
+        :raises UStatusError: If the request couldn't be sent, or its response carries an error commstatus, e.g.
+                              ``DEADLINE_EXCEEDED`` once the request ttl expired.
+        """
+        self._check_open()
+        attributes = request.attributes
+        if attributes.type != UMessageType.UMESSAGE_TYPE_REQUEST:
+            raise UStatusError.from_code_message(code=UCode.INVALID_ARGUMENT, message="Message is not a request")
+        _REQUEST_VALIDATOR.validate(attributes)
+
+        payload, attachment = self._encode(request.payload or b'', attributes)
+        if attachment is None:
+            raise UStatusError.from_code_message(
+                code=UCode.INVALID_ARGUMENT, message="Unable to transform UAttributes to attachment"
+            )
+        zenoh_key = ZenohUtils.to_zenoh_key_string(self.authority_name, attributes.source, attributes.sink)
+        future = self.rpc_engine.send_request(
+            self.session,
+            zenoh_key,
+            payload,
+            attachment,
+            attributes,
+            qos=self.qos_policy.for_priority(attributes.priority),
+            policy=self._rpc_policy(attributes.sink),
+        )
+        if self.stats is not None:
+            self.stats.message_sent(zenoh_key, len(payload))
+
+        response = await asyncio.wrap_future(future)
+        code = response.attributes.commstatus
+        if code != UCode.OK:
+            raise UStatusError.from_code_message(code=code, message=f"Communication error [{UCode.Name(code)}]")
+        return response
+
+    def invoke_stream(self, request: UMessage, capacity: int = DEFAULT_STREAM_CAPACITY) -> ResponseStream:
+        """
+        Send an RPC request whose response is streamed by the server, see :meth:`send_response_stream`, and
+        iterate over its chunks::
+
+            async for chunk in transport.invoke_stream(request):
+                output.write(chunk.payload)
+
+        At most ``capacity`` chunks are buffered. Beyond that, zenoh waits for the consumer on the thread receiving
+        for this transport's session: until the stream makes room, every other subscription, request and reply of
+        the session stalls too, not only this stream. Keep reading the stream, or close it, and size ``capacity``
+        for the slowest consumer. The ttl of the request bounds the whole stream. A server answering with a single
+        response ends the stream after it.
+
+        :param request: The request message.
+        :param capacity: The maximum number of chunks buffered before the session's receive path blocks.
+        :return: The stream of response chunks.
+        :raises UStatusError: If the request couldn't be sent.
+        """
+        self._check_open()
+        attributes = request.attributes
+        if attributes.type != UMessageType.UMESSAGE_TYPE_REQUEST:
+            raise UStatusError.from_code_message(code=UCode.INVALID_ARGUMENT, message="Message is not a request")
+        _REQUEST_VALIDATOR.validate(attributes)
+
+        payload, attachment = self._encode(request.payload or b'', attributes)
+        zenoh_key = ZenohUtils.to_zenoh_key_string(self.authority_name, attributes.source, attributes.sink)
+        qos = self.qos_policy.for_priority(attributes.priority)
+        try:
+            replies = self.session.get(
+                zenoh_key,
+                zenoh.handlers.FifoChannel(capacity),
+                target=zenoh.QueryTarget.BEST_MATCHING,
+                # Every chunk has the same key expression, don't keep the latest only
+                consolidation=zenoh.ConsolidationMode.NONE,
+                priority=ZenohUtils.map_zenoh_priority(attributes.priority),
+                congestion_control=qos.congestion_control,
+                express=qos.express,
+                attachment=attachment,
+                payload=payload,
+                timeout=self.rpc_engine.get_ttl_ms(attributes) / 1000 + QUERY_TIMEOUT_GRACE,
+            )
+        except Exception as e:
+            msg = f"Unable to send rpc request with Zenoh: {e}"
+            logging.debug(msg)
+            raise UStatusError.from_code_message(code=UCode.INTERNAL, message=msg)
+        stream = ResponseStream(replies, self._reply_to_chunk, on_close=self._streams.discard)
+        self._streams.add(stream)
+        return stream
+
+    async def send_response_stream(
+        self, request: UAttributes, chunks: Union[Iterable[bytes], AsyncIterable[bytes]]
+    ) -> UStatus:
+        """
+        Answer a request with a stream of chunks instead of a single response, each sent as a reply to the
+        query of the request, so that large results are never held in memory as a whole. The attachment of
+        the last chunk marks the end of the stream; a stream without chunks is sent as one empty last chunk.
+
+        The chunks are sent with the congestion control ``BLOCK`` and from a worker thread: when the client
+        lags behind, sending waits for it without blocking the event loop. If ``chunks`` raises, the stream ends
+        with an ``INTERNAL`` commstatus.
+
+        :param request: The attributes of the request being answered.
+        :param chunks: The payloads of the chunks, from a regular or an async iterable.
+        :return: The status of the response.
+        """
+        query = self.query_map.pop(request.id.SerializeToString())
+        if not query:
+            msg = "Query doesn't exist or expired"
+            logging.debug(msg)
+            return UStatus(code=UCode.INTERNAL, message=msg)
+
+        loop = asyncio.get_running_loop()
+        priority = ZenohUtils.map_zenoh_priority(request.priority)
+        replier = self.replier_id if _requested_replier(query) is not None else None
+
+        async def reply(payload: bytes, stream: StreamFlag, code: UCode = UCode.OK) -> None:
+            attributes = UMessageBuilder.response_for_request(request).build().attributes
+            if code != UCode.OK:
+                attributes.commstatus = code
+            payload, attachment = self._encode(payload, attributes, stream, replier)
+            send = partial(
+                query.reply,
+                query.key_expr,
+                payload,
+                attachment=attachment,
+                priority=priority,
+                congestion_control=zenoh.CongestionControl.BLOCK,
+            )
+            metrics = self.metrics
+            if metrics is not None:
+                start = time.perf_counter()
+            await loop.run_in_executor(None, send)
+            if metrics is not None:
+                metrics.record(ZENOH_REPLY, time.perf_counter() - start)
+                metrics.increment(MESSAGES_SENT)
+
+        status = UStatus(code=UCode.OK, message="Successfully sent rpc response stream to Zenoh")
+        code = UCode.OK
+        iterator = _iterate(chunks)
+        # Hold each chunk back until the next one shows whether it is the last
+        previous = None
+        try:
+            while True:
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                except Exception as e:
+                    msg = f"Unable to produce the response stream: {e}"
+                    logging.debug(msg)
+                    status = UStatus(code=UCode.INTERNAL, message=msg)
+                    code = UCode.INTERNAL
+                    previous = None
+                    break
+                if previous is not None:
+                    await reply(previous, StreamFlag.CHUNK)
+                previous = chunk
+            await reply(previous if previous is not None else b'', StreamFlag.END, code)
+        except Exception as e:
+            msg = f"Unable to reply with Zenoh: {e}"
+            logging.debug(msg)
+            return UStatus(code=UCode.INTERNAL, message=msg)
+        return status
+
+    def _reply_to_chunk(self, reply: Reply) -> Optional[Tuple[UMessage, bool]]:
+        sample = reply.ok
+        if sample is None:
+            logging.debug(f"Error while parsing Zenoh reply: {reply.err}")
+            return None
+        if not sample.attachment:
+            logging.debug("Unable to get attachment")
+            return None
+        message = UMessage()
+        try:
+            info = ZenohUtils.decode_attachment(sample.attachment, message.attributes)
+            payload = decompress_payload(bytes(sample.payload) if sample.payload else b'', info.codec)
+        except UStatusError as error:
+            logging.debug(error.get_message())
+            return None
+        if self.metrics is not None:
+            self.metrics.increment(MESSAGES_RECEIVED)
+        if payload:
+            message.payload = payload
+        return message, info.stream != StreamFlag.CHUNK
+
     async def register_listener(
-        self, source_filter: UUri, listener: UListener, sink_filter: UUri = UriFactory.ANY
+        self, source_filter: UUri, listener: UListener, sink_filter: UUri = UriFactory.ANY, last_value: bool = False
     ) -> UStatus:
+        """
+        Register a listener for the messages matching a source and sink filter.
+
+        :param source_filter: The source filter.
+        :param listener: The listener.
+        :param sink_filter: The sink filter.
+        :param last_value: For publish filters, also hand the listener the last messages published on the
+                           matching topics by the transports that cache them, see ``last_value_depth``. They
+                           arrive within a round trip, possibly after and older than a message published
+                           meanwhile: compare their ids, time-ordered UUIDs, if it matters.
+        :return: The status of the registration.
+        """
+        if self._closed:
+            return _closed_status()
         flag = ZenohUtils.get_listener_message_type(source_filter, sink_filter)
 
         # RPC request
@@ -326,7 +995,32 @@ class UPTransportZenoh(UTransport):
         if flag & (MessageFlag.PUBLISH | MessageFlag.NOTIFICATION):
             # Get Zenoh key
             zenoh_key = ZenohUtils.to_zenoh_key_string(self.authority_name, source_filter, sink_filter)
-            return self.register_publish_notification_listener(zenoh_key, listener)
+            status = self.register_publish_notification_listener(zenoh_key, listener)
+            if last_value and flag & MessageFlag.PUBLISH and status.code == UCode.OK:
+                self._fetch_last_values(zenoh_key, listener)
+            return status
+
+    def _fetch_last_values(self, zenoh_key: str, listener: UListener) -> None:
+        # Every cache replies with its samples of the matching topics, handed to this listener only
+        def on_reply(reply: Reply) -> None:
+            sample = reply.ok
+            if sample is None:
+                logging.debug(f"Error while fetching the last values: {reply.err}")
+                return
+            decoded = self._decode(sample.attachment, sample.payload)
+            if decoded is not None:
+                self._dispatch_message((listener,), *decoded)
+
+        try:
+            self.session.get(
+                last_value_key(zenoh_key),
+                on_reply,
+                target=zenoh.QueryTarget.ALL,
+                consolidation=zenoh.ConsolidationMode.NONE,
+                timeout=LAST_VALUE_QUERY_TIMEOUT,
+            )
+        except Exception as e:
+            logging.debug(f"Unable to fetch the last values of {zenoh_key}: {e}")
 
     async def unregister_listener(
         self, source_filter: UUri, listener: UListener, sink_filter: UUri = UriFactory.ANY
@@ -350,27 +1044,226 @@ class UPTransportZenoh(UTransport):
             else:
                 return UStatus(code=UCode.INVALID_ARGUMENT, message="Sink should not be None in Response")
 
+    async def register_listeners(self, entries: Iterable[ListenerEntry]) -> List[UStatus]:
+        """
+        Register listeners in bulk, e.g. the thousands of filters of a gateway at startup. Equivalent to calling
+        :meth:`register_listener` for each entry, but the filters are classified and their keys resolved in one
+        pass, the listeners of identical keys are merged before declaring the zenoh subscribers, the response
+        listeners are indexed once, and each lock is taken once. The zenoh declarations are made on a worker
+        thread, leaving the event loop free meanwhile.
+
+        :param entries: ``(source_filter, listener)`` or ``(source_filter, listener, sink_filter)`` tuples.
+        :return: The status of each entry, in order.
+        """
+        entries = list(entries)
+        if self._closed:
+            return [_closed_status() for _ in entries]
+        statuses: List[Optional[UStatus]] = [None] * len(entries)
+        resolved = self._resolve_entries(entries, _REGISTER_ORDER, statuses)
+        for _, _, _, listener in resolved:
+            self.dispatcher.bind(listener)
+        await asyncio.get_running_loop().run_in_executor(None, self._register_resolved, resolved, statuses)
+        return statuses
+
+    async def unregister_listeners(self, entries: Iterable[ListenerEntry]) -> List[UStatus]:
+        """
+        Unregister listeners in bulk, the counterpart of :meth:`register_listeners`.
+
+        :param entries: ``(source_filter, listener)`` or ``(source_filter, listener, sink_filter)`` tuples.
+        :return: The status of each entry, in order.
+        """
+        entries = list(entries)
+        statuses: List[Optional[UStatus]] = [None] * len(entries)
+        resolved = self._resolve_entries(entries, _UNREGISTER_ORDER, statuses)
+        await asyncio.get_running_loop().run_in_executor(None, self._unregister_resolved, resolved, statuses)
+        return statuses
+
+    def _resolve_entries(
+        self, entries: List[ListenerEntry], order: Tuple[MessageFlag, ...], statuses: List[Optional[UStatus]]
+    ) -> List[Tuple[int, MessageFlag, str, UListener]]:
+        # Classify the filters and resolve their keys, recording the status of the invalid ones
+        resolved = []
+        for index, entry in enumerate(entries):
+            source_filter, listener = entry[0], entry[1]
+            sink_filter = entry[2] if len(entry) > 2 else UriFactory.ANY
+            try:
+                flag = ZenohUtils.get_listener_message_type(source_filter, sink_filter)
+            except UStatusError as error:
+                statuses[index] = error.get_status()
+                continue
+            for kind in order:
+                if not flag & kind:
+                    continue
+                if kind == MessageFlag.RESPONSE:
+                    if sink_filter is None:
+                        statuses[index] = UStatus(
+                            code=UCode.INVALID_ARGUMENT, message="Sink should not be None in Response"
+                        )
+                        break
+                    zenoh_key = ZenohUtils.to_zenoh_key_string(self.authority_name, sink_filter, source_filter)
+                else:
+                    zenoh_key = ZenohUtils.to_zenoh_key_string(self.authority_name, source_filter, sink_filter)
+                resolved.append((index, kind, zenoh_key, listener))
+                break
+        return resolved
+
+    def _register_resolved(
+        self, resolved: List[Tuple[int, MessageFlag, str, UListener]], statuses: List[Optional[UStatus]]
+    ) -> None:
+        subscriptions = []
+        requests: Dict[Tuple[str, UListener], List[int]] = {}
+        responses = []
+        for index, kind, zenoh_key, listener in resolved:
+            if kind == MessageFlag.REQUEST:
+                requests.setdefault((zenoh_key, listener), []).append(index)
+            elif kind == MessageFlag.RESPONSE:
+                responses.append((index, zenoh_key, listener))
+            else:
+                subscriptions.append((index, zenoh_key, listener))
+
+        # Publish & Notification: one subscriber per key
+        results = self.subscriptions.add_many((zenoh_key, listener) for _, zenoh_key, listener in subscriptions)
+        for (index, _, _), result in zip(subscriptions, results):
+            if isinstance(result, Exception):
+                statuses[index] = UStatus(code=UCode.INTERNAL, message="Unable to register callback with Zenoh")
+            else:
+                statuses[index] = UStatus(code=UCode.OK, message="Successfully register callback with Zenoh")
+
+        # RPC request: one queryable per key and listener
+        replaced = []
+        with self.queryable_lock:
+            for (zenoh_key, listener), indexes in requests.items():
+                try:
+                    queryable = self.session.declare_queryable(zenoh_key, self._request_callback(listener))
+                except Exception:
+                    status = UStatus(code=UCode.INTERNAL, message="Unable to register callback with Zenoh")
+                else:
+                    previous = self.queryable_map.get((zenoh_key, listener))
+                    if previous is not None:
+                        replaced.append(previous)
+                    self.queryable_map[(zenoh_key, listener)] = queryable
+                    status = UStatus(code=UCode.OK, message="Successfully register callback with Zenoh")
+                for index in indexes:
+                    statuses[index] = status
+        for queryable in replaced:
+            _undeclare(queryable)
+
+        # RPC response: the index is rebuilt once
+        if responses:
+            with self.rpc_callback_lock:
+                rpc_callback_map = dict(self.rpc_callback_map)
+                for index, zenoh_key, listener in responses:
+                    rpc_callback_map[zenoh_key] = listener
+                    statuses[index] = UStatus(
+                        code=UCode.OK, message="Successfully register response callback with Zenoh"
+                    )
+                self.rpc_callback_index.rebuild(rpc_callback_map)
+                self.rpc_callback_map = rpc_callback_map
+
+    def _unregister_resolved(
+        self, resolved: List[Tuple[int, MessageFlag, str, UListener]], statuses: List[Optional[UStatus]]
+    ) -> None:
+        subscriptions = []
+        requests = []
+        responses = []
+        for index, kind, zenoh_key, listener in resolved:
+            if kind == MessageFlag.REQUEST:
+                requests.append((index, zenoh_key, listener))
+            elif kind == MessageFlag.RESPONSE:
+                responses.append((index, zenoh_key))
+            else:
+                subscriptions.append((index, zenoh_key, listener))
+
+        # Publish & Notification: the subscribers are undeclared with their last listener
+        results = self.subscriptions.remove_many((zenoh_key, listener) for _, zenoh_key, listener in subscriptions)
+        for (index, zenoh_key, _), removed in zip(subscriptions, results):
+            if removed:
+                statuses[index] = UStatus(code=UCode.OK, message="Listener removed successfully")
+            else:
+                statuses[index] = UStatus(code=UCode.NOT_FOUND, message=f"Listener not registered for : {zenoh_key}")
+
+        # RPC request
+        removed_queryables = []
+        with self.queryable_lock:
+            for index, zenoh_key, listener in requests:
+                queryable = self.queryable_map.pop((zenoh_key, listener), None)
+                if queryable is None:
+                    msg = f"RPC request listener doesn't exist for : {zenoh_key}"
+                    statuses[index] = UStatus(code=UCode.NOT_FOUND, message=msg)
+                    continue
+                removed_queryables.append(queryable)
+                statuses[index] = UStatus(code=UCode.OK, message="Listener removed successfully")
+        for queryable in removed_queryables:
+            _undeclare(queryable)
+
+        # RPC response: the index is rebuilt once
+        if responses:
+            with self.rpc_callback_lock:
+                rpc_callback_map = dict(self.rpc_callback_map)
+                for index, zenoh_key in responses:
+                    if rpc_callback_map.pop(zenoh_key, None) is None:
+                        msg = f"RPC response callback doesn't exist for : {zenoh_key}"
+                        statuses[index] = UStatus(code=UCode.NOT_FOUND, message=msg)
+                    else:
+                        statuses[index] = UStatus(code=UCode.OK)
+                self.rpc_callback_index.rebuild(rpc_callback_map)
+                self.rpc_callback_map = rpc_callback_map
+
     def _remove_response_listener(self, zenoh_key: str) -> UStatus:
         with self.rpc_callback_lock:
-            if self.rpc_callback_map.pop(zenoh_key, None) is None:
+            rpc_callback_map = dict(self.rpc_callback_map)
+            if rpc_callback_map.pop(zenoh_key, None) is None:
                 msg = f"RPC response callback doesn't exist for : {zenoh_key}"
                 logging.error(msg)
                 return UStatus(code=UCode.NOT_FOUND, message=msg)
+            self.rpc_callback_index.rebuild(rpc_callback_map)
+            self.rpc_callback_map = rpc_callback_map
         return UStatus(code=UCode.OK)
 
     def _remove_publish_listener(self, zenoh_key: str, listener: UListener) -> UStatus:
-        with self.subscriber_lock:
-            if self.subscriber_map.pop((zenoh_key, listener), None) is None:
-                msg = f"Listener not registered for : {zenoh_key}"
-                logging.error(msg)
-                return UStatus(code=UCode.NOT_FOUND, message=msg)
+        # The Zenoh subscriber is undeclared with the last listener of the key
+        if not self.subscriptions.remove(zenoh_key, listener):
+            msg = f"Listener not registered for : {zenoh_key}"
+            logging.error(msg)
+            return UStatus(code=UCode.NOT_FOUND, message=msg)
 
         return UStatus(code=UCode.OK, message="Listener removed successfully")
 
     def _remove_request_listener(self, zenoh_key: str, listener: UListener) -> UStatus:
         with self.queryable_lock:
-            if self.queryable_map.pop((zenoh_key, listener), None) is None:
-                msg = f"RPC request listener doesn't exist for : {zenoh_key}"
-                logging.error(msg)
-                return UStatus(code=UCode.NOT_FOUND, message=msg)
+            queryable = self.queryable_map.pop((zenoh_key, listener), None)
+        if queryable is None:
+            msg = f"RPC request listener doesn't exist for : {zenoh_key}"
+            logging.error(msg)
+            return UStatus(code=UCode.NOT_FOUND, message=msg)
+        # Stop the callbacks now rather than when the queryable is garbage collected
+        _undeclare(queryable)
         return UStatus(code=UCode.OK, message="Listener removed successfully")
+
+
+def _closed_status() -> UStatus:
+    return UStatus(code=UCode.FAILED_PRECONDITION, message=_CLOSED_MESSAGE)
+
+
+async def _iterate(chunks: Union[Iterable[bytes], AsyncIterable[bytes]]):
+    if isinstance(chunks, AsyncIterable):
+        async for chunk in chunks:
+            yield chunk
+    else:
+        for chunk in chunks:
+            yield chunk
+
+
+def _requested_replier(query: Query) -> Optional[str]:
+    # The server the client selected, "" if it asked every server to identify itself, None if it didn't ask
+    try:
+        return query.parameters.get(REPLIER_PARAMETER)
+    except Exception:
+        return None
+
+
+def _undeclare(queryable: Queryable) -> None:
+    try:
+        queryable.undeclare()
+    except Exception as e:
+        logging.debug(f"Unable to undeclare the queryable: {e}")
@@ -13,8 +13,10 @@ SPDX-License-Identifier: Apache-2.0
 """
 
 import logging
-from enum import IntFlag
-from typing import Union
+import time
+from collections import namedtuple
+from enum import IntEnum, IntFlag
+from typing import Optional, Tuple, Union
 
 from uprotocol.communication.ustatuserror import UStatusError
 from uprotocol.uri.factory.uri_factory import UriFactory
@@ -27,10 +29,36 @@ from uprotocol.v1.uri_pb2 import UUri
 from uprotocol.v1.ustatus_pb2 import UStatus
 from zenoh import Priority, ZBytes
 
+from up_transport_zenoh.lrucache import LruCache
+from up_transport_zenoh.metrics import (
+    ATTACHMENT_DECODE,
+    ATTACHMENT_DECODE_ERRORS,
+    ATTACHMENT_ENCODE,
+    KEY_RESOLUTION,
+    TransportMetrics,
+)
+
 UATTRIBUTE_VERSION: int = 1
 
-# Configure the logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+DEFAULT_KEY_CACHE_SIZE: int = 1024
+
+KeyCacheInfo = namedtuple("KeyCacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+AttachmentInfo = namedtuple("AttachmentInfo", ["uattributes", "codec", "stream", "replier"])
+
+# Fields of an empty UUri, which is translated to "{}/{}/{}/{}"
+_EMPTY_URI_FIELDS: Tuple[str, int, int, int] = ("", 0, 0, 0)
+
+_PRIORITY_MAPPING = {
+    UPriority.UPRIORITY_CS0: Priority.BACKGROUND,
+    UPriority.UPRIORITY_CS1: Priority.DATA_LOW,
+    UPriority.UPRIORITY_CS2: Priority.DATA,
+    UPriority.UPRIORITY_CS3: Priority.DATA_HIGH,
+    UPriority.UPRIORITY_CS4: Priority.INTERACTIVE_LOW,
+    UPriority.UPRIORITY_CS5: Priority.INTERACTIVE_HIGH,
+    UPriority.UPRIORITY_CS6: Priority.REAL_TIME,
+    UPriority.UPRIORITY_UNSPECIFIED: Priority.DATA_LOW,
+}
 
 
 class MessageFlag(IntFlag):
@@ -40,7 +68,28 @@ class MessageFlag(IntFlag):
     RESPONSE = 8
 
 
+class StreamFlag(IntEnum):
+    # A chunk of a streamed response, more follow
+    CHUNK = 1
+    # The last chunk of a streamed response
+    END = 2
+
+
 class ZenohUtils:
+    # (authority_name, source fields, sink fields) -> zenoh key
+    _key_cache = LruCache(DEFAULT_KEY_CACHE_SIZE)
+    # Shared by every transport of the process, see set_metrics
+    metrics: Optional[TransportMetrics] = None
+
+    @staticmethod
+    def set_metrics(metrics: Optional[TransportMetrics]) -> None:
+        """
+        Install the hook timing key resolution and attachment encoding and decoding, or remove it with None.
+
+        :param metrics: The metrics hook.
+        """
+        ZenohUtils.metrics = metrics
+
     @staticmethod
     def uri_to_zenoh_key(authority_name: str, uri: UUri) -> str:
         authority = authority_name if not uri.authority_name else uri.authority_name
@@ -69,26 +118,78 @@ class ZenohUtils:
 
     @staticmethod
     def to_zenoh_key_string(authority_name: str, src_uri: UUri, dst_uri: UUri = None) -> str:
-        src = ZenohUtils.uri_to_zenoh_key(authority_name, src_uri)
-        dst = ZenohUtils.uri_to_zenoh_key(authority_name, dst_uri) if dst_uri and dst_uri != UUri() else "{}/{}/{}/{}"
-        return f"up/{src}/{dst}"
+        metrics = ZenohUtils.metrics
+        if metrics is not None:
+            start = time.perf_counter()
+        src_fields = (src_uri.authority_name, src_uri.ue_id, src_uri.ue_version_major, src_uri.resource_id)
+        dst_fields = (
+            (dst_uri.authority_name, dst_uri.ue_id, dst_uri.ue_version_major, dst_uri.resource_id)
+            if dst_uri is not None
+            else _EMPTY_URI_FIELDS
+        )
+        cache_key = (authority_name, src_fields, dst_fields)
+        zenoh_key = ZenohUtils._key_cache.get(cache_key, None)
+        if zenoh_key is None:
+            src = ZenohUtils.uri_to_zenoh_key(authority_name, src_uri)
+            dst = (
+                ZenohUtils.uri_to_zenoh_key(authority_name, dst_uri)
+                if dst_fields != _EMPTY_URI_FIELDS
+                else "{}/{}/{}/{}"
+            )
+            zenoh_key = f"up/{src}/{dst}"
+            ZenohUtils._key_cache.put(cache_key, zenoh_key)
+        if metrics is not None:
+            metrics.record(KEY_RESOLUTION, time.perf_counter() - start)
+        return zenoh_key
+
+    @staticmethod
+    def set_key_cache_size(maxsize: int) -> None:
+        """
+        Bound the number of zenoh keys memoized by :meth:`to_zenoh_key_string`. 0 disables the cache.
+
+        :param maxsize: The maximum number of cached keys.
+        """
+        ZenohUtils._key_cache.resize(maxsize)
+
+    @staticmethod
+    def key_cache_info() -> KeyCacheInfo:
+        """
+        :return: The hits, misses, maximum size and current size of the zenoh key cache.
+        """
+        cache = ZenohUtils._key_cache
+        return KeyCacheInfo(cache.hits, cache.misses, cache.maxsize, len(cache))
+
+    @staticmethod
+    def clear_key_cache() -> None:
+        ZenohUtils._key_cache.clear()
 
     @staticmethod
     def map_zenoh_priority(upriority: UPriority) -> Priority:
-        mapping = {
-            UPriority.UPRIORITY_CS0: Priority.BACKGROUND,
-            UPriority.UPRIORITY_CS1: Priority.DATA_LOW,
-            UPriority.UPRIORITY_CS2: Priority.DATA,
-            UPriority.UPRIORITY_CS3: Priority.DATA_HIGH,
-            UPriority.UPRIORITY_CS4: Priority.INTERACTIVE_LOW,
-            UPriority.UPRIORITY_CS5: Priority.INTERACTIVE_HIGH,
-            UPriority.UPRIORITY_CS6: Priority.REAL_TIME,
-            UPriority.UPRIORITY_UNSPECIFIED: Priority.DATA_LOW,
-        }
-        return mapping[upriority]
+        return _PRIORITY_MAPPING[upriority]
 
     @staticmethod
-    def uattributes_to_attachment(uattributes: UAttributes):
+    def uattributes_to_attachment(
+        uattributes: UAttributes,
+        codec: Optional[str] = None,
+        stream: Optional[StreamFlag] = None,
+        replier: Optional[str] = None,
+    ):
+        """
+        Encode the UAttributes as an attachment: the version and the serialized UAttributes, followed by the
+        name of the payload codec when the payload is compressed (empty if not), then the stream flag of the
+        chunks of a streamed response (empty if not), then the id of the server replying to a request that asked
+        for it. Decoders that predate the optional elements ignore them.
+
+        :param uattributes: The UAttributes of the message.
+        :param codec: The name of the codec the payload is compressed with, if any.
+        :param stream: The stream flag, for the chunks of a streamed response.
+        :param replier: The id of the replying server, see ``RpcPolicy``.
+        :return: The elements of the attachment.
+        """
+        metrics = ZenohUtils.metrics
+        if metrics is not None:
+            start = time.perf_counter()
+
         # Convert the version number to bytes (assuming 1 as in the Rust example)
         version_bytes = UATTRIBUTE_VERSION.to_bytes(1, byteorder='little')
 
@@ -97,46 +198,58 @@ class ZenohUtils:
 
         # Combine version bytes and uattributes bytes into one list of bytes
         attachment_bytes = [version_bytes, uattributes_bytes]
-
+        if replier is not None:
+            attachment_bytes.append(codec.encode() if codec is not None else b'')
+            attachment_bytes.append(stream.to_bytes(1, byteorder='little') if stream is not None else b'')
+            attachment_bytes.append(replier.encode())
+        elif stream is not None:
+            attachment_bytes.append(codec.encode() if codec is not None else b'')
+            attachment_bytes.append(stream.to_bytes(1, byteorder='little'))
+        elif codec is not None:
+            attachment_bytes.append(codec.encode())
+
+        if metrics is not None:
+            metrics.record(ATTACHMENT_ENCODE, time.perf_counter() - start)
         # Convert the combined bytes to ZBytes
         return attachment_bytes
 
     @staticmethod
-    def attachment_to_uattributes(attachment: ZBytes) -> UAttributes:
-        try:
-            # Convert ZBytes to a list of bytes
-            attachment_bytes = attachment.deserialize(list)
-
-            # Ensure there is at least one byte for the version
-            if len(attachment_bytes) < 1:
-                msg = "Unable to get the UAttributes version"
-                logging.debug(msg)
-                raise UStatusError.from_code_message(code=UCode.INVALID_ARGUMENT, message=msg)
-
-            # Check the version
-            version = int.from_bytes(bytes(attachment_bytes[0]), byteorder='big')
-            if version != UATTRIBUTE_VERSION:
-                msg = f"UAttributes version is {version} (should be {UATTRIBUTE_VERSION})"
-                logging.debug(msg)
-                raise UStatusError.from_code_message(code=UCode.INVALID_ARGUMENT, message=msg)
+    def attachment_to_uattributes(attachment: Union[ZBytes, bytes], uattributes: UAttributes = None) -> UAttributes:
+        """
+        Decode the UAttributes carried by an attachment.
 
-            # Get the attributes from the remaining bytes
-            uattributes_data = bytes(attachment_bytes[1])
-            if not uattributes_data:
-                msg = "Unable to get the UAttributes"
-                logging.debug(msg)
-                raise UStatusError.from_code_message(code=UCode.INVALID_ARGUMENT, message=msg)
+        The attachment is copied out of zenoh once and its elements are located in that buffer, without building
+        the intermediate list of elements.
 
-            # Parse the UAttributes from the bytes
-            uattributes = UAttributes()
-            uattributes.ParseFromString(uattributes_data)
+        :param attachment: The zenoh attachment, or its bytes.
+        :param uattributes: Optional UAttributes to parse into, e.g. the attributes of the UMessage being built,
+                            which saves copying the decoded attributes into the message.
+        :return: The decoded UAttributes.
+        """
+        return ZenohUtils.decode_attachment(attachment, uattributes)[0]
 
-            return uattributes
+    @staticmethod
+    def decode_attachment(attachment: Union[ZBytes, bytes], uattributes: UAttributes = None) -> AttachmentInfo:
+        """
+        Decode the UAttributes, the payload codec, the stream flag and the replier id carried by an attachment.
 
-        except Exception as e:
-            msg = f"Failed to convert Attachment to UAttributes: {str(e)}"
-            logging.debug(msg)
-            raise UStatusError.from_code_message(code=UCode.INVALID_ARGUMENT, message=msg)
+        :param attachment: The zenoh attachment, or its bytes.
+        :param uattributes: Optional UAttributes to parse into.
+        :return: The decoded UAttributes, the name of the codec the payload is compressed with or None, the
+                 stream flag or None if the message isn't part of a streamed response, and the id of the server
+                 that replied or None.
+        """
+        metrics = ZenohUtils.metrics
+        if metrics is None:
+            return _decode_attachment(attachment, uattributes)
+        start = time.perf_counter()
+        try:
+            return _decode_attachment(attachment, uattributes)
+        except UStatusError:
+            metrics.increment(ATTACHMENT_DECODE_ERRORS)
+            raise
+        finally:
+            metrics.record(ATTACHMENT_DECODE, time.perf_counter() - start)
 
     @staticmethod
     def get_listener_message_type(source_uuri: UUri, sink_uuri: UUri = None) -> Union[MessageFlag, UStatusError]:
@@ -219,3 +332,77 @@ class ZenohUtils:
             )
         else:
             return flag
+
+
+def _decode_attachment(attachment: Union[ZBytes, bytes], uattributes: Optional[UAttributes]) -> AttachmentInfo:
+    try:
+        buffer = bytes(attachment)
+
+        # Ensure there is at least one byte for the version
+        start, end = _read_attachment_element(buffer, 0)
+        if start == end:
+            msg = "Unable to get the UAttributes version"
+            logging.debug(msg)
+            raise UStatusError.from_code_message(code=UCode.INVALID_ARGUMENT, message=msg)
+
+        # Check the version
+        version = buffer[start] if end - start == 1 else int.from_bytes(buffer[start:end], byteorder='big')
+        if version != UATTRIBUTE_VERSION:
+            msg = f"UAttributes version is {version} (should be {UATTRIBUTE_VERSION})"
+            logging.debug(msg)
+            raise UStatusError.from_code_message(code=UCode.INVALID_ARGUMENT, message=msg)
+
+        # Get the attributes from the remaining bytes
+        start, end = _read_attachment_element(buffer, end)
+        if start == end:
+            msg = "Unable to get the UAttributes"
+            logging.debug(msg)
+            raise UStatusError.from_code_message(code=UCode.INVALID_ARGUMENT, message=msg)
+        uattributes_data = buffer[start:end]
+
+        # Parse the UAttributes from the bytes
+        if uattributes is None:
+            uattributes = UAttributes()
+        uattributes.ParseFromString(uattributes_data)
+
+        # The optional payload codec
+        start, end = _read_attachment_element(buffer, end)
+        codec = buffer[start:end].decode() if start != end else None
+
+        # The optional stream flag
+        start, end = _read_attachment_element(buffer, end)
+        stream = StreamFlag(buffer[start]) if start != end else None
+
+        # The optional replier id
+        start, end = _read_attachment_element(buffer, end)
+        replier = buffer[start:end].decode() if start != end else None
+
+        return AttachmentInfo(uattributes, codec, stream, replier)
+
+    except Exception as e:
+        msg = f"Failed to convert Attachment to UAttributes: {str(e)}"
+        logging.debug(msg)
+        raise UStatusError.from_code_message(code=UCode.INVALID_ARGUMENT, message=msg)
+
+
+def _read_attachment_element(buffer: bytes, offset: int) -> Tuple[int, int]:
+    """
+    Locate one element of an attachment serialized by zenoh from a list: a LEB128 length followed by the bytes.
+
+    :return: The start and end offsets of the element, both equal to ``offset`` past the end of the buffer.
+    """
+    if offset >= len(buffer):
+        return offset, offset
+    byte = buffer[offset]
+    offset += 1
+    length = byte & 0x7F
+    shift = 7
+    while byte >= 0x80:
+        byte = buffer[offset]
+        offset += 1
+        length |= (byte & 0x7F) << shift
+        shift += 7
+    end = offset + length
+    if end > len(buffer):
+        raise ValueError("Attachment element exceeds the attachment size")
+    return offset, end